@@ -0,0 +1,84 @@
+"""generate_latex / 高速レンダラーのベンチマーク
+
+使い方: python bench_latex.py [発表数 ...]
+既定では 50 / 500 / 5000 件の発表を持つプログラムで計測する。
+"""
+import sys
+import time
+
+from latex_templates import escape_latex
+from pdf_generator import FastProgramRenderer, Presentation, ScheduleData, Session, generate_latex
+
+DEFAULT_SIZES = [50, 500, 5000]
+PRESENTATIONS_PER_SESSION = 10
+REPEAT = 5
+
+
+def build_schedule(presentation_count: int) -> ScheduleData:
+    """休憩を挟みつつ10件ずつのセッションに分けたプログラムを作る"""
+    presentations = [
+        Presentation(
+            id=i,
+            student_number=20000 + i,
+            student_name=f"学生_{i}",
+            laboratory_id=i % 4 + 1,
+            theme=f"深層学習を用いた研究 #{i} & 50% の評価 {{改良版}}",
+            years_id=0,
+        )
+        for i in range(presentation_count)
+    ]
+
+    sessions = []
+    for start in range(0, presentation_count, PRESENTATIONS_PER_SESSION):
+        sessions.append(
+            Session(
+                type="session",
+                startTime="9:00",
+                endTime="10:00",
+                chair="座長_A",
+                timekeeper="計時_B",
+                presentations=presentations[start:start + PRESENTATIONS_PER_SESSION],
+            )
+        )
+        sessions.append(Session(type="break", startTime="10:00", endTime="10:10"))
+
+    return ScheduleData(
+        courseName="情報システム工学コース",
+        eventName="卒業研究発表会",
+        eventTheme="ベンチマーク",
+        dateTime="2026年2月1日",
+        venue="A棟 101",
+        sessions=sessions,
+    )
+
+
+def best_of(func, repeat: int = REPEAT) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    fast_renderer = FastProgramRenderer()
+
+    print(f"{'presentations':>14} {'generate_latex':>16} {'escape_latex':>14} {'fast renderer':>15}")
+    for size in sizes:
+        data = build_schedule(size)
+        fields = [p.theme for s in data.sessions for p in (s.presentations or [])]
+
+        latex_seconds = best_of(lambda: generate_latex(data))
+        escape_seconds = best_of(lambda: [escape_latex(field) for field in fields])
+        fast_seconds = best_of(lambda: fast_renderer.render(data))
+
+        print(
+            f"{size:>14} {latex_seconds * 1000:>13.2f} ms {escape_seconds * 1000:>11.2f} ms"
+            f" {fast_seconds * 1000:>12.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
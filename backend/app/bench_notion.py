@@ -0,0 +1,86 @@
+"""Notion 取得処理のベンチマーク（fake_notion.py などの NOTION_API_BASE_URL に対して実行する）
+
+使い方:
+    python fake_notion.py --port 8100 --latency-ms 150 &
+    NOTION_API_BASE_URL=http://127.0.0.1:8100/v1 NOTION_TOKEN=dummy python bench_notion.py [ルートDBのID]
+
+ルートDBのIDを省略すると、fake_notion の /_fake/info から取得する。
+研究室ツリーのクロール（reflesh 相当）・研究室ごとの全タスク取得・学生1人分のタスク取得について、
+所要時間・リクエスト数・件数/秒を表示する。DB には書き込まない。
+"""
+import asyncio
+import sys
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from notion_api import CrawlProgress, crawl_notion_tree, fetch_student_directory, fetch_tasks_by_student
+from notion_http import NOTION_API_BASE_URL, close_notion_client
+
+
+def _fake_admin_url(path: str) -> str:
+    return f"{NOTION_API_BASE_URL.rsplit('/v1', 1)[0]}/_fake/{path}"
+
+
+async def _fake_requests(client: httpx.AsyncClient) -> Optional[int]:
+    """fake_notion のリクエスト数（本物の Notion に対しては None）"""
+    try:
+        res = await client.get(_fake_admin_url("stats"))
+        return res.json()["requests"] if res.status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
+
+async def _measure(admin: httpx.AsyncClient, label: str, items_label: str, coro) -> Any:
+    before = await _fake_requests(admin)
+    started = time.perf_counter()
+    result, items = await coro
+    elapsed = time.perf_counter() - started
+    after = await _fake_requests(admin)
+    requests = "-" if before is None or after is None else str(after - before)
+    rate = items / elapsed if elapsed else 0
+    print(f"{label:<28} {elapsed:>8.2f} s {requests:>9} {items:>8} {items_label:<8} {rate:>10.1f} /s")
+    return result
+
+
+async def main(root_database_id: Optional[str]) -> None:
+    async with httpx.AsyncClient(timeout=10) as admin:
+        if not root_database_id:
+            root_database_id = (await admin.get(_fake_admin_url("info"))).json()["root_database_id"]
+
+        print(f"{'':<28} {'time':>10} {'requests':>9} {'items':>17} {'throughput':>12}")
+
+        async def crawl():
+            entries = await crawl_notion_tree(root_database_id, CrawlProgress(root_database_id))
+            return entries, len(entries)
+
+        entries = await _measure(admin, "crawl (reflesh)", "pages", crawl())
+
+        async def fetch_all_tasks():
+            directories: Dict[str, Any] = {}
+            count = 0
+            for entry in entries:
+                students, resolver = await fetch_student_directory(entry["student_page_id"])
+                directories[entry["thesis_page_id"]] = (students, resolver)
+                tasks = await fetch_tasks_by_student(entry["task_page_id"], resolver=resolver)
+                count += sum(len(items) for items in tasks.values())
+            return directories, count
+
+        directories = await _measure(admin, "tasks (all labs)", "tasks", fetch_all_tasks())
+
+        async def fetch_single_student():
+            entry = entries[0]
+            students, resolver = directories[entry["thesis_page_id"]]
+            name = students[0]["student_name"]
+            tasks = await fetch_tasks_by_student(entry["task_page_id"], name, resolver)
+            return tasks, len(tasks.get(name, []))
+
+        if entries:
+            await _measure(admin, "tasks (one student)", "tasks", fetch_single_student())
+
+    await close_notion_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else None))
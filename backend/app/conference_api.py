@@ -1,25 +1,42 @@
 import io
-import urllib.parse
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
-from fastapi.responses import Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field, validator
-from sqlalchemy import func, select
+from sqlalchemy import JSON, and_, func, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db_session
+from database import AsyncSessionLocal, get_db_session
+from downloads import quote_filename
+from jobs import Job, error_message, get_job, start_job
 from models.paper import AbstractSubmission, ProgramRecord, SubmissionThread
 from pdf_generator import (
+    DEFAULT_PROGRAM_RENDERER,
+    PROGRAM_RENDERERS,
     Presentation,
     ScheduleData,
     Session as ScheduleSession,
-    compile_latex_to_pdf,
-    generate_latex,
+    render_program_pdf_async,
 )
 from pypdf import PdfReader, PdfWriter
+from singleflight import SingleFlight
+from submission_events import (
+    PROGRAM_CREATED,
+    PROGRAM_FAILED,
+    SUBMISSION_CREATED,
+    SUBMISSION_DELETED,
+    SUBMISSION_UPDATED,
+    THREAD_DELETED,
+    notify_submission_event,
+    submission_event_hub,
+)
 
 
 conference_router = APIRouter(prefix="/conference", tags=["conference"])
@@ -44,15 +61,6 @@ def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
         raise HTTPException(status_code=400, detail=f"Invalid datetime format: {value}") from exc
 
 
-def _quote_filename(filename: str) -> str:
-    try:
-        ascii_filename = filename.encode("ascii").decode("ascii")
-        return f'attachment; filename="{ascii_filename}"'
-    except UnicodeEncodeError:
-        quoted = urllib.parse.quote(filename)
-        return f"attachment; filename*=UTF-8''{quoted}"
-
-
 class ThreadCreateRequest(BaseModel):
     name: str = Field(..., max_length=200)
     description: Optional[str] = None
@@ -77,6 +85,9 @@ class ThreadResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     submission_count: int = 0
+    abstract_count: int = 0
+    paper_count: int = 0
+    presentation_count: int = 0
 
 
 class SubmissionResponse(BaseModel):
@@ -100,6 +111,54 @@ class ThreadDetailResponse(ThreadResponse):
     submissions: List[SubmissionResponse] = Field(default_factory=list)
 
 
+class FileStatus(BaseModel):
+    submitted: bool
+    size: Optional[int] = None
+    submitted_at: Optional[datetime] = None
+    late: bool = False  # 締切後に提出された
+    overdue: bool = False  # 未提出のまま締切を過ぎた
+
+
+class StudentStatus(BaseModel):
+    submission_id: UUID
+    student_number: str
+    student_name: str
+    title: str
+    submitted_at: datetime
+    abstract: FileStatus
+    paper: FileStatus
+    presentation: FileStatus
+
+
+class FileKindSummary(BaseModel):
+    submitted: int = 0
+    total_size: int = 0
+    late: int = 0
+    overdue: int = 0
+
+
+class LaboratoryStatus(BaseModel):
+    laboratory: str
+    laboratory_id: int
+    student_count: int = 0
+    abstract: FileKindSummary = Field(default_factory=FileKindSummary)
+    paper: FileKindSummary = Field(default_factory=FileKindSummary)
+    presentation: FileKindSummary = Field(default_factory=FileKindSummary)
+    students: List[StudentStatus] = Field(default_factory=list)
+
+
+class ThreadStatusResponse(BaseModel):
+    thread_id: UUID
+    name: str
+    abstract_deadline: Optional[datetime]
+    paper_deadline: Optional[datetime]
+    presentation_deadline: Optional[datetime]
+    has_abstract: bool
+    has_paper: bool
+    has_presentation: bool
+    laboratories: List[LaboratoryStatus]
+
+
 class ProgramSessionInput(BaseModel):
     type: str
     startTime: str
@@ -125,6 +184,7 @@ class ProgramCreateRequest(BaseModel):
     sessions: List[ProgramSessionInput]
     title: Optional[str] = None
     description: Optional[str] = None
+    renderer: str = DEFAULT_PROGRAM_RENDERER
 
     @validator("presentationDurationMinutes")
     def validate_duration(cls, value: int) -> int:
@@ -132,6 +192,12 @@ class ProgramCreateRequest(BaseModel):
             raise ValueError("presentationDurationMinutes must be positive")
         return value
 
+    @validator("renderer")
+    def validate_renderer(cls, value: str) -> str:
+        if value not in PROGRAM_RENDERERS:
+            raise ValueError(f"renderer must be one of {', '.join(PROGRAM_RENDERERS)}")
+        return value
+
 
 class ProgramResponse(BaseModel):
     id: UUID
@@ -145,7 +211,7 @@ class ProgramResponse(BaseModel):
     updated_at: datetime
 
 
-def _thread_to_response(thread: SubmissionThread, submission_count: int) -> ThreadResponse:
+def _thread_to_response(thread: SubmissionThread) -> ThreadResponse:
     return ThreadResponse(
         id=thread.id,
         name=thread.name,
@@ -158,10 +224,61 @@ def _thread_to_response(thread: SubmissionThread, submission_count: int) -> Thre
         has_presentation=thread.has_presentation,
         created_at=thread.created_at,
         updated_at=thread.updated_at,
-        submission_count=submission_count,
+        submission_count=thread.submission_count or 0,
+        abstract_count=thread.abstract_count or 0,
+        paper_count=thread.paper_count or 0,
+        presentation_count=thread.presentation_count or 0,
+    )
+
+
+# 提出物の種類ごとの (カウンタ列, ファイル名の列)
+SUBMISSION_FILE_KINDS = {
+    "abstract": ("abstract_count", "pdf_filename"),
+    "paper": ("paper_count", "paper_filename"),
+    "presentation": ("presentation_count", "presentation_filename"),
+}
+
+
+def _submitted_kinds(submission: AbstractSubmission) -> set:
+    return {kind for kind, (_, filename_column) in SUBMISSION_FILE_KINDS.items() if getattr(submission, filename_column)}
+
+
+async def _adjust_submission_counts(
+    session: AsyncSession,
+    thread_id: UUID,
+    submissions: int = 0,
+    kinds: Optional[Dict[str, int]] = None,
+) -> None:
+    """スレッドの提出数カウンタを増減する（呼び出し元のトランザクション内で行い、コミットは呼び出し元で）"""
+    values = {}
+    for kind, delta in (kinds or {}).items():
+        if delta:
+            counter_column = SUBMISSION_FILE_KINDS[kind][0]
+            values[counter_column] = getattr(SubmissionThread, counter_column) + delta
+    if submissions:
+        values["submission_count"] = SubmissionThread.submission_count + submissions
+    if not values:
+        return
+    await session.execute(
+        update(SubmissionThread)
+        .where(SubmissionThread.id == thread_id)
+        # カウンタの更新ではスレッドの更新日時を変えない
+        .values(updated_at=SubmissionThread.updated_at, **values)
+        .execution_options(synchronize_session=False)
     )
 
 
+async def _lock_submission(session: AsyncSession, thread_id: UUID, student_number: str) -> Optional[AbstractSubmission]:
+    """スレッド・学生番号の提出を行ロック（FOR UPDATE）して取得する。コミットまでロックは続く"""
+    result = await session.execute(
+        select(AbstractSubmission)
+        .where(AbstractSubmission.thread_id == thread_id, AbstractSubmission.student_number == student_number)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
 def _submission_to_response(submission: AbstractSubmission) -> SubmissionResponse:
     return SubmissionResponse(
         id=submission.id,
@@ -210,20 +327,15 @@ async def create_thread(
     session.add(thread)
     await session.commit()
     await session.refresh(thread)
-    return _thread_to_response(thread, submission_count=0)
+    return _thread_to_response(thread)
 
 
 @conference_router.get("/threads", response_model=List[ThreadResponse])
 async def list_threads(session: AsyncSession = Depends(get_db_session)) -> List[ThreadResponse]:
-    stmt = (
-        select(SubmissionThread, func.count(AbstractSubmission.id))
-        .outerjoin(AbstractSubmission, SubmissionThread.id == AbstractSubmission.thread_id)
-        .group_by(SubmissionThread.id)
-        .order_by(SubmissionThread.created_at.desc())
-    )
+    # 提出数はスレッドのカウンタ列を読むだけにする（abstract_submissions は結合しない）
+    stmt = select(SubmissionThread).order_by(SubmissionThread.created_at.desc())
     result = await session.execute(stmt)
-    threads = result.all()
-    return [_thread_to_response(thread, count) for thread, count in threads]
+    return [_thread_to_response(thread) for thread in result.scalars().all()]
 
 
 @conference_router.get("/threads/{thread_id}", response_model=ThreadDetailResponse)
@@ -244,7 +356,7 @@ async def get_thread(
     submissions_result = await session.execute(submissions_stmt)
     submissions = submissions_result.scalars().all()
 
-    base_response = _thread_to_response(thread, len(submissions))
+    base_response = _thread_to_response(thread)
     return ThreadDetailResponse(
         **base_response.dict(),
         submissions=[_submission_to_response(sub) for sub in submissions],
@@ -262,10 +374,28 @@ async def delete_thread(
         raise HTTPException(status_code=404, detail="指定された提出スレッドが見つかりません。")
 
     await session.delete(thread)
+    await notify_submission_event(session, THREAD_DELETED, thread_id)
     await session.commit()
     return Response(status_code=204)
 
 
+@conference_router.get("/threads/{thread_id}/events")
+async def stream_thread_events(thread_id: UUID) -> StreamingResponse:
+    # 提出の作成・更新・削除を Server-Sent Events で配信する。
+    # ストリーム中に DB 接続を持ち続けないよう、存在確認だけ専用のセッションで行う
+    async with AsyncSessionLocal() as session:
+        exists = await session.scalar(select(SubmissionThread.id).where(SubmissionThread.id == thread_id))
+    if not exists:
+        raise HTTPException(status_code=404, detail="指定された提出スレッドが見つかりません。")
+
+    submission_event_hub.ensure_capacity()
+    return StreamingResponse(
+        submission_event_hub.stream(thread_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @conference_router.post(
     "/threads/{thread_id}/submissions",
     response_model=SubmissionResponse,
@@ -290,38 +420,11 @@ async def create_submission(
     if laboratory not in LABORATORY_CHOICES:
         raise HTTPException(status_code=400, detail="無効な研究室が選択されました。")
 
-    # 2. Check Existing Submission (Upsert Logic)
-    stmt = select(AbstractSubmission).where(
-        AbstractSubmission.thread_id == thread_id,
-        AbstractSubmission.student_number == student_number.strip()
-    )
-    existing_result = await session.execute(stmt)
-    submission = existing_result.scalars().first()
-
-    is_new = False
-    if not submission:
-        is_new = True
-        submission = AbstractSubmission(
-            thread_id=thread_id,
-            student_number=student_number.strip(),
-            student_name=student_name.strip(),
-            laboratory=laboratory,
-            laboratory_id=LABORATORY_CHOICES[laboratory],
-            title=title.strip(),
-            # Initialize fields to ensure they are not null if DB requires it, 
-            # though our schema allows nulls for files.
-            # We set non-file fields here.
-        )
-    else:
-        # Update metadata
-        submission.student_name = student_name.strip()
-        submission.laboratory = laboratory
-        submission.laboratory_id = LABORATORY_CHOICES[laboratory]
-        submission.title = title.strip()
-        # Update timestamp
-        submission.submitted_at = datetime.now()
+    # 2. Process Files
+    # アップロードの読み込みと検証は、提出の行をロックする前に済ませる
+    uploaded_at = datetime.now(timezone.utc)
+    file_values: Dict[str, Any] = {}
 
-    # 3. Process Files
     # Helper to validate and read
     async def process_file(file_obj: UploadFile, allowed_exts: List[str], type_name: str, deadline: Optional[datetime]):
         if deadline and datetime.now(deadline.tzinfo) > deadline:
@@ -340,37 +443,84 @@ async def create_submission(
         if not thread.has_abstract:
              raise HTTPException(status_code=400, detail="このスレッドでは抄録の提出は受け付けていません。")
         data = await process_file(abstract_file, [".pdf"], "抄録", thread.abstract_deadline)
-        submission.pdf_filename = abstract_file.filename
-        submission.pdf_content_type = abstract_file.content_type or "application/pdf"
-        submission.pdf_size = len(data)
-        submission.pdf_data = data
-    elif is_new and thread.has_abstract:
-        # Allow partial submission, do not raise error
-        pass
+        file_values.update(
+            pdf_filename=abstract_file.filename,
+            pdf_content_type=abstract_file.content_type or "application/pdf",
+            pdf_size=len(data),
+            pdf_data=data,
+            pdf_submitted_at=uploaded_at,
+        )
 
     # Paper
     if paper_file:
         if not thread.has_paper:
              raise HTTPException(status_code=400, detail="このスレッドでは論文の提出は受け付けていません。")
         data = await process_file(paper_file, [".pdf"], "論文", thread.paper_deadline)
-        submission.paper_filename = paper_file.filename
-        submission.paper_content_type = paper_file.content_type or "application/pdf"
-        submission.paper_size = len(data)
-        submission.paper_data = data
+        file_values.update(
+            paper_filename=paper_file.filename,
+            paper_content_type=paper_file.content_type or "application/pdf",
+            paper_size=len(data),
+            paper_data=data,
+            paper_submitted_at=uploaded_at,
+        )
 
     # Presentation
     if presentation_file:
         if not thread.has_presentation:
              raise HTTPException(status_code=400, detail="このスレッドでは発表資料の提出は受け付けていません。")
         data = await process_file(presentation_file, [".pdf", ".pptx"], "発表資料", thread.presentation_deadline)
-        submission.presentation_filename = presentation_file.filename
-        submission.presentation_content_type = presentation_file.content_type or "application/octet-stream"
-        submission.presentation_size = len(data)
-        submission.presentation_data = data
+        file_values.update(
+            presentation_filename=presentation_file.filename,
+            presentation_content_type=presentation_file.content_type or "application/octet-stream",
+            presentation_size=len(data),
+            presentation_data=data,
+            presentation_submitted_at=uploaded_at,
+        )
 
+    # 3. Check Existing Submission (Upsert Logic)
+    # 同じ学生の同時提出でカウンタの増減を二重に数えないよう、既存の行はロックしてから差分を取る
+    student_number = student_number.strip()
+    submission = await _lock_submission(session, thread_id, student_number)
+    is_new = submission is None
     if is_new:
-        session.add(submission)
-    
+        submission = AbstractSubmission(
+            thread_id=thread_id,
+            student_number=student_number,
+            student_name=student_name.strip(),
+            laboratory=laboratory,
+            laboratory_id=LABORATORY_CHOICES[laboratory],
+            title=title.strip(),
+            **file_values,
+        )
+        try:
+            async with session.begin_nested():
+                session.add(submission)
+        except IntegrityError:
+            # 同じ学生の提出が同時に作られた。その行をロックして更新として扱う
+            is_new = False
+            submission = await _lock_submission(session, thread_id, student_number)
+
+    submitted_before = set() if is_new else _submitted_kinds(submission)
+    if not is_new:
+        # Update metadata
+        submission.student_name = student_name.strip()
+        submission.laboratory = laboratory
+        submission.laboratory_id = LABORATORY_CHOICES[laboratory]
+        submission.title = title.strip()
+        # Update timestamp
+        submission.submitted_at = datetime.now()
+        for key, value in file_values.items():
+            setattr(submission, key, value)
+
+    # 提出数カウンタを同じトランザクションで更新する（ファイルの差し替えでは増やさない）
+    await _adjust_submission_counts(
+        session,
+        thread_id,
+        submissions=1 if is_new else 0,
+        kinds={kind: 1 for kind in _submitted_kinds(submission) - submitted_before},
+    )
+    await notify_submission_event(session, SUBMISSION_CREATED if is_new else SUBMISSION_UPDATED, thread_id, submission)
+
     await session.commit()
     await session.refresh(submission)
     return _submission_to_response(submission)
@@ -397,6 +547,118 @@ async def list_submissions(
     return [_submission_to_response(submission) for submission in submissions_result.scalars().all()]
 
 
+# 提出物の種類ごとの (列名の接頭辞, 受付フラグ, 締切)
+_STATUS_FILE_KINDS = {
+    "abstract": ("pdf", SubmissionThread.has_abstract, SubmissionThread.abstract_deadline),
+    "paper": ("paper", SubmissionThread.has_paper, SubmissionThread.paper_deadline),
+    "presentation": ("presentation", SubmissionThread.has_presentation, SubmissionThread.presentation_deadline),
+}
+
+
+@conference_router.get("/threads/{thread_id}/status", response_model=ThreadStatusResponse)
+async def get_thread_status(
+    thread_id: UUID,
+    session: AsyncSession = Depends(get_db_session),
+) -> ThreadStatusResponse:
+    # 研究室ごと・学生ごとの提出状況を1つのクエリで集計する（ファイル本体の列は読まない）
+    student_fields = [
+        "submission_id", AbstractSubmission.id,
+        "student_number", AbstractSubmission.student_number,
+        "student_name", AbstractSubmission.student_name,
+        "title", AbstractSubmission.title,
+        "submitted_at", AbstractSubmission.submitted_at,
+    ]
+    lab_columns = []
+    for kind, (prefix, accepted, deadline) in _STATUS_FILE_KINDS.items():
+        filename = getattr(AbstractSubmission, f"{prefix}_filename")
+        size = getattr(AbstractSubmission, f"{prefix}_size")
+        submitted_at = getattr(AbstractSubmission, f"{prefix}_submitted_at")
+        late = func.coalesce(submitted_at > deadline, False)
+        overdue = and_(filename.is_(None), func.coalesce(accepted, False), func.coalesce(deadline < func.now(), False))
+        student_fields += [
+            kind,
+            func.json_build_object(
+                "submitted", filename.is_not(None),
+                "size", size,
+                "submitted_at", submitted_at,
+                "late", late,
+                "overdue", overdue,
+            ),
+        ]
+        lab_columns += [
+            func.count(filename).label(f"{kind}_submitted"),
+            func.coalesce(func.sum(size), 0).label(f"{kind}_total_size"),
+            func.count().filter(late).label(f"{kind}_late"),
+            func.count().filter(overdue).label(f"{kind}_overdue"),
+        ]
+
+    stmt = (
+        select(
+            SubmissionThread.id,
+            SubmissionThread.name,
+            SubmissionThread.abstract_deadline,
+            SubmissionThread.paper_deadline,
+            SubmissionThread.presentation_deadline,
+            SubmissionThread.has_abstract,
+            SubmissionThread.has_paper,
+            SubmissionThread.has_presentation,
+            AbstractSubmission.laboratory_id,
+            AbstractSubmission.laboratory,
+            func.count(AbstractSubmission.id).label("student_count"),
+            *lab_columns,
+            func.json_agg(
+                aggregate_order_by(func.json_build_object(*student_fields), AbstractSubmission.student_number),
+                type_=JSON,
+            ).filter(AbstractSubmission.id.is_not(None)).label("students"),
+        )
+        .select_from(SubmissionThread)
+        .outerjoin(AbstractSubmission, AbstractSubmission.thread_id == SubmissionThread.id)
+        .where(SubmissionThread.id == thread_id)
+        .group_by(SubmissionThread.id, AbstractSubmission.laboratory_id, AbstractSubmission.laboratory)
+        .order_by(AbstractSubmission.laboratory_id.asc().nulls_last())
+    )
+    rows = (await session.execute(stmt)).mappings().all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="指定された提出スレッドが見つかりません。")
+
+    laboratories = {
+        (name, lab_id): LaboratoryStatus(laboratory=name, laboratory_id=lab_id)
+        for name, lab_id in LABORATORY_CHOICES.items()
+    }
+    for row in rows:
+        # 提出が1件もないスレッドでは研究室が NULL の行だけが返る
+        if row["laboratory_id"] is None:
+            continue
+        laboratories[(row["laboratory"], row["laboratory_id"])] = LaboratoryStatus(
+            laboratory=row["laboratory"],
+            laboratory_id=row["laboratory_id"],
+            student_count=row["student_count"],
+            students=row["students"] or [],
+            **{
+                kind: FileKindSummary(
+                    submitted=row[f"{kind}_submitted"],
+                    total_size=row[f"{kind}_total_size"],
+                    late=row[f"{kind}_late"],
+                    overdue=row[f"{kind}_overdue"],
+                )
+                for kind in _STATUS_FILE_KINDS
+            },
+        )
+
+    thread = rows[0]
+    return ThreadStatusResponse(
+        thread_id=thread["id"],
+        name=thread["name"],
+        abstract_deadline=thread["abstract_deadline"],
+        paper_deadline=thread["paper_deadline"],
+        presentation_deadline=thread["presentation_deadline"],
+        has_abstract=bool(thread["has_abstract"]),
+        has_paper=bool(thread["has_paper"]),
+        has_presentation=bool(thread["has_presentation"]),
+        laboratories=sorted(laboratories.values(), key=lambda lab: (lab.laboratory_id, lab.laboratory)),
+    )
+
+
 @conference_router.delete(
     "/threads/{thread_id}/submissions/{submission_id}",
     status_code=204,
@@ -416,6 +678,13 @@ async def delete_submission(
         raise HTTPException(status_code=404, detail="指定された抄録が見つかりません。")
 
     await session.delete(submission)
+    await _adjust_submission_counts(
+        session,
+        thread_id,
+        submissions=-1,
+        kinds={kind: -1 for kind in _submitted_kinds(submission)},
+    )
+    await notify_submission_event(session, SUBMISSION_DELETED, thread_id, submission)
     await session.commit()
     return Response(status_code=204)
 
@@ -459,7 +728,7 @@ async def download_submission(
         raise HTTPException(status_code=404, detail=f"指定されたファイル（{type}）は提出されていません。")
 
     headers = {
-        "Content-Disposition": _quote_filename(filename or f"{submission.id}_{type}.bin"),
+        "Content-Disposition": quote_filename(filename or f"{submission.id}_{type}.bin"),
     }
     return Response(content=data, media_type=content_type or "application/octet-stream", headers=headers)
 
@@ -534,27 +803,35 @@ def _assign_presentations(
     return session_assignments
 
 
-@conference_router.post("/programs", response_model=ProgramResponse)
-async def create_program(
-    payload: ProgramCreateRequest,
-    session: AsyncSession = Depends(get_db_session),
-) -> ProgramResponse:
-    thread_stmt = select(SubmissionThread).where(SubmissionThread.id == payload.thread_id)
-    thread_result = await session.execute(thread_stmt)
-    thread = thread_result.scalars().first()
-    if not thread:
+async def _load_program_submissions(session: AsyncSession, thread_id: UUID) -> List[Any]:
+    """発表順の決定に使う提出のメタデータを読む（ファイル本体の列は読まない）"""
+    thread_exists = await session.scalar(select(SubmissionThread.id).where(SubmissionThread.id == thread_id))
+    if not thread_exists:
         raise HTTPException(status_code=404, detail="指定された提出スレッドが見つかりません。")
 
     submissions_stmt = (
-        select(AbstractSubmission)
-        .where(AbstractSubmission.thread_id == payload.thread_id)
+        select(
+            AbstractSubmission.id,
+            AbstractSubmission.student_number,
+            AbstractSubmission.student_name,
+            AbstractSubmission.laboratory,
+            AbstractSubmission.laboratory_id,
+            AbstractSubmission.title,
+        )
+        .where(AbstractSubmission.thread_id == thread_id)
         .order_by(AbstractSubmission.submitted_at.asc())
     )
     submissions_result = await session.execute(submissions_stmt)
-    submissions = submissions_result.scalars().all()
+    submissions = submissions_result.all()
     if not submissions:
         raise HTTPException(status_code=400, detail="この提出スレッドには抄録が登録されていません。")
+    return submissions
 
+
+def _build_program_schedule(
+    payload: ProgramCreateRequest,
+    submissions: List[Any],
+) -> Tuple[ScheduleData, List[ScheduleSession], List[dict]]:
     session_assignments = _assign_presentations(submissions, payload.sessions, payload.presentationDurationMinutes)
 
     schedule_sessions: List[ScheduleSession] = []
@@ -630,10 +907,16 @@ async def create_program(
         sessions=schedule_sessions,
     )
 
-    latex = generate_latex(schedule_data)
-    pdf_bytes = compile_latex_to_pdf(latex)
+    return schedule_data, schedule_sessions, presentation_order
+
 
-    program_record = ProgramRecord(
+def _build_program_record(
+    payload: ProgramCreateRequest,
+    schedule_sessions: List[ScheduleSession],
+    presentation_order: List[dict],
+    pdf_bytes: bytes,
+) -> ProgramRecord:
+    return ProgramRecord(
         thread_id=payload.thread_id,
         title=payload.title or payload.eventName,
         description=payload.description,
@@ -644,6 +927,7 @@ async def create_program(
             "dateTime": payload.dateTime,
             "venue": payload.venue,
             "presentationDurationMinutes": payload.presentationDurationMinutes,
+            "renderer": payload.renderer,
         },
         sessions=[
             {
@@ -675,12 +959,91 @@ async def create_program(
         pdf_data=pdf_bytes,
     )
 
+
+@conference_router.post("/programs", response_model=ProgramResponse)
+async def create_program(
+    payload: ProgramCreateRequest,
+    session: AsyncSession = Depends(get_db_session),
+) -> ProgramResponse:
+    submissions = await _load_program_submissions(session, payload.thread_id)
+    # TeX の実行中に DB 接続を持ち続けないよう、読み出しのトランザクションをここで終える
+    await session.commit()
+
+    schedule_data, schedule_sessions, presentation_order = _build_program_schedule(payload, submissions)
+    pdf_bytes = await render_program_pdf_async(schedule_data, payload.renderer)
+
+    program_record = _build_program_record(payload, schedule_sessions, presentation_order, pdf_bytes)
     session.add(program_record)
     await session.commit()
     await session.refresh(program_record)
     return _program_to_response(program_record)
 
 
+# program.failed イベントに載せるエラーメッセージの最大文字数
+PROGRAM_FAILED_DETAIL_LENGTH = 300
+
+
+async def _run_program_job(job: Job, payload: ProgramCreateRequest, submissions: List[Any]) -> None:
+    try:
+        job.message = "発表順を決定中"
+        schedule_data, schedule_sessions, presentation_order = _build_program_schedule(payload, submissions)
+
+        job.message = "PDFを生成中"
+        pdf_bytes = await render_program_pdf_async(schedule_data, payload.renderer)
+
+        job.message = "保存中"
+        async with AsyncSessionLocal() as session:
+            program_record = _build_program_record(payload, schedule_sessions, presentation_order, pdf_bytes)
+            session.add(program_record)
+            await session.flush()
+            await notify_submission_event(
+                session, PROGRAM_CREATED, payload.thread_id, program_id=str(program_record.id), job_id=job.id
+            )
+            await session.commit()
+            await session.refresh(program_record)
+    except Exception as e:
+        # スレッドのイベントを購読しているクライアントにも失敗を知らせる。
+        # NOTIFY のペイロードには上限があるので短いメッセージだけを送り、通知に失敗しても元の例外を返す
+        try:
+            async with AsyncSessionLocal() as session:
+                await notify_submission_event(
+                    session,
+                    PROGRAM_FAILED,
+                    payload.thread_id,
+                    job_id=job.id,
+                    detail=error_message(e)[:PROGRAM_FAILED_DETAIL_LENGTH],
+                )
+                await session.commit()
+        except Exception as notify_error:
+            print(f"⚠️ プログラム生成の失敗を通知できませんでした: {notify_error}")
+        raise
+
+    job.result = jsonable_encoder(_program_to_response(program_record))
+    job.advance()
+    job.message = None
+
+
+@conference_router.post("/programs/jobs", status_code=202)
+async def start_program_job(
+    payload: ProgramCreateRequest,
+    session: AsyncSession = Depends(get_db_session),
+):
+    # 存在確認と提出の読み出しだけをリクエスト内で行い、発表順の決定・コンパイル・保存はジョブで行う
+    submissions = await _load_program_submissions(session, payload.thread_id)
+    await session.commit()
+    job = start_job("program", lambda job: _run_program_job(job, payload, submissions), total=1)
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+
+@conference_router.get("/programs/jobs/{job_id}")
+async def get_program_job(job_id: str):
+    # 完了すると result に作成したプログラム（POST /programs と同じ形）が入る
+    job = get_job(job_id)
+    if not job or job.kind != "program":
+        raise HTTPException(status_code=404, detail="指定されたジョブが見つかりません。")
+    return job.to_dict()
+
+
 @conference_router.get("/programs", response_model=List[ProgramResponse])
 async def list_programs(
     thread_id: Optional[UUID] = Query(None),
@@ -732,48 +1095,28 @@ async def download_program_pdf(
         raise HTTPException(status_code=404, detail="指定されたプログラムが見つかりません。")
 
     headers = {
-        "Content-Disposition": _quote_filename(record.pdf_filename or "program.pdf"),
+        "Content-Disposition": quote_filename(record.pdf_filename or "program.pdf"),
     }
     return Response(content=record.pdf_data, media_type=record.pdf_content_type, headers=headers)
 
 
-@conference_router.get("/programs/{program_id}/booklet")
-async def download_program_with_abstracts(
-    program_id: UUID,
-    session: AsyncSession = Depends(get_db_session),
-) -> Response:
-    result = await session.execute(select(ProgramRecord).where(ProgramRecord.id == program_id))
-    program = result.scalars().first()
-    if not program:
-        raise HTTPException(status_code=404, detail="指定されたプログラムが見つかりません。")
+# 同じプログラムの冊子の結合が同時に来たら1回だけ行う
+_booklet_builds = SingleFlight("program_booklet")
 
-    if not program.presentation_order:
-        raise HTTPException(status_code=400, detail="このプログラムには発表順が登録されていません。")
-
-    submission_ids = [UUID(entry["submission_id"]) for entry in program.presentation_order]
-    submissions_stmt = (
-        select(AbstractSubmission)
-        .where(AbstractSubmission.id.in_(submission_ids))
-    )
-    submissions_result = await session.execute(submissions_stmt)
-    submissions_map = {submission.id: submission for submission in submissions_result.scalars().all()}
 
+def _merge_booklet(program_pdf: bytes, abstract_pdfs: List[bytes]) -> bytes:
     writer = PdfWriter()
 
     def append_reader(pdf_reader: PdfReader) -> None:
         for page in pdf_reader.pages:
             writer.add_page(page)
 
-    program_reader = PdfReader(io.BytesIO(program.pdf_data))
+    program_reader = PdfReader(io.BytesIO(program_pdf))
     append_reader(program_reader)
 
-    for entry in program.presentation_order:
-        submission_id = UUID(entry["submission_id"])
-        submission = submissions_map.get(submission_id)
-        if not submission or not submission.pdf_data:
-            continue
+    for pdf_data in abstract_pdfs:
         try:
-            append_reader(PdfReader(io.BytesIO(submission.pdf_data)))
+            append_reader(PdfReader(io.BytesIO(pdf_data)))
         except Exception:
             # Ignore PDF errors
             continue
@@ -781,9 +1124,44 @@ async def download_program_with_abstracts(
     output_buffer = io.BytesIO()
     writer.write(output_buffer)
     writer.close()
-    combined_bytes = output_buffer.getvalue()
+    return output_buffer.getvalue()
+
+
+async def _build_booklet(program_id: UUID) -> Tuple[str, bytes]:
+    # 複数のリクエストで共有するため、専用のセッションで読み出す
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(ProgramRecord).where(ProgramRecord.id == program_id))
+        program = result.scalars().first()
+        if not program:
+            raise HTTPException(status_code=404, detail="指定されたプログラムが見つかりません。")
+
+        if not program.presentation_order:
+            raise HTTPException(status_code=400, detail="このプログラムには発表順が登録されていません。")
+
+        submission_ids = [UUID(entry["submission_id"]) for entry in program.presentation_order]
+        submissions_stmt = (
+            select(AbstractSubmission)
+            .where(AbstractSubmission.id.in_(submission_ids))
+        )
+        submissions_result = await session.execute(submissions_stmt)
+        submissions_map = {submission.id: submission for submission in submissions_result.scalars().all()}
+
+        abstract_pdfs = []
+        for submission_id in submission_ids:
+            submission = submissions_map.get(submission_id)
+            if submission and submission.pdf_data:
+                abstract_pdfs.append(submission.pdf_data)
+        title = program.title
+        program_pdf = program.pdf_data
+
+    return title, await run_in_threadpool(_merge_booklet, program_pdf, abstract_pdfs)
+
+
+@conference_router.get("/programs/{program_id}/booklet")
+async def download_program_with_abstracts(program_id: UUID) -> Response:
+    title, combined_bytes = await _booklet_builds.do(program_id, lambda: _build_booklet(program_id))
 
     headers = {
-        "Content-Disposition": _quote_filename(f"{program.title}-booklet.pdf"),
+        "Content-Disposition": quote_filename(f"{title}-booklet.pdf"),
     }
     return Response(content=combined_bytes, media_type="application/pdf", headers=headers)
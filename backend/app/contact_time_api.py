@@ -0,0 +1,271 @@
+# contact_time_api.py
+"""コンタクトタイム記録用紙をサーバー側で生成するAPI
+
+Notion からの取得・集計・LaTeX 生成・コンパイルまでを1リクエストで行う。
+Notion に接続できないときは、同期済みのミラーから生成する。
+"""
+import asyncio
+import io
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from pypdf import PdfReader, PdfWriter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db_session
+from downloads import quote_filename
+from jobs import Job, get_job, start_job
+from latex_compiler import LatexCompileError, compile_latex_async
+from latex_templates import render_contact_time_latex
+from models.notion import Notion
+from notion_api import JST, fetch_student_directory, fetch_tasks_by_student, parse_notion_timestamp
+from notion_http import NotionAPIError
+from notion_sync import get_notion_entry, load_mirrored_student
+from singleflight import SingleFlight
+
+
+contact_time_router = APIRouter(tags=["contact-time"])
+
+
+def _format_date(value: Optional[datetime]) -> str:
+    if not value:
+        return ""
+    value = value.astimezone(JST)
+    return f"{value.month}月 {value.day}日"
+
+
+def _format_time(value: Optional[datetime]) -> str:
+    if not value:
+        return ""
+    value = value.astimezone(JST)
+    return f"{value.hour:02d}:{value.minute:02d}"
+
+
+def _minutes(value: Any) -> int:
+    """Notion の数値プロパティ（未入力は "Unknown"）を分に変換する"""
+    return int(value) if isinstance(value, (int, float)) else 0
+
+
+def build_contact_time_rows(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """タスク一覧を記録用紙の行に整形する（開始時刻・要約のないタスクは除外し、日時順に並べる）"""
+    entries = []
+    for task in tasks:
+        if task.get("start_time") == "Unknown" or task.get("summary") == "Unknown":
+            continue
+        start = parse_notion_timestamp(task.get("start_time"))
+        end = parse_notion_timestamp(task.get("end_time"))
+        entries.append((task.get("start_time") or "", {
+            "date": _format_date(start),
+            "start_time": _format_time(start),
+            "end_time": _format_time(end),
+            "excluded": _minutes(task.get("excluded_time")),
+            "duration": _minutes(task.get("working_time")),
+            "content": task.get("summary") or "",
+        }))
+    entries.sort(key=lambda entry: entry[0])
+    return [row for _, row in entries]
+
+
+def render_student_contact_time(
+    laboratory_name: str,
+    year: int,
+    student: Dict[str, Any],
+    tasks: List[Dict[str, Any]],
+) -> str:
+    """学生1人分の記録用紙のLaTeXを生成する"""
+    rows = build_contact_time_rows(tasks)
+    current_total = sum(row["duration"] for row in rows)
+    # Notion 上の総コンタクトタイムがあればそれを総計とし、なければ今回の合計を総計とする
+    grand_total = student.get("total_contact_time")
+    if not isinstance(grand_total, (int, float)):
+        grand_total = current_total
+
+    return render_contact_time_latex(
+        year=year,
+        laboratory_name=laboratory_name,
+        student_number=student.get("student_number", ""),
+        student_name=student["student_name"],
+        rows=rows,
+        current_total=current_total,
+        grand_total=int(grand_total),
+    )
+
+
+# 同じ研究室（・学生）の Notion 取得が同時に来たら1回だけ取りに行く
+_notion_fetches = SingleFlight("contact_time_notion")
+
+
+async def fetch_contact_time_source(
+    entry: Notion,
+    student_name: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+    """
+    学生一覧と学生名ごとのタスクを Notion から取得する（student_name を指定するとその学生のタスクだけ）。
+    戻り値は同時に呼んだほかのリクエストと共有されるので書き換えないこと。
+    """
+    async def fetch() -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+        students, resolver = await fetch_student_directory(str(entry.student_page_id))
+        if student_name and not any(s["student_name"] == student_name for s in students):
+            return students, {}
+        return students, await fetch_tasks_by_student(str(entry.task_page_id), student_name, resolver)
+
+    return await _notion_fetches.do((str(entry.task_page_id), student_name), fetch)
+
+
+@contact_time_router.get("/contact-time")
+async def generate_contact_time_pdf(
+    laboratory_name: str = Query(..., description="研究室名"),
+    year: int = Query(..., description="年度"),
+    student_name: str = Query(..., description="学生名"),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """学生1人分のコンタクトタイム記録用紙（PDF）を生成する"""
+    entry = await get_notion_entry(db, laboratory_name, year)
+
+    synced_at = None
+    try:
+        students, student_tasks = await fetch_contact_time_source(entry, student_name)
+        student = next((s for s in students if s["student_name"] == student_name), None)
+        tasks = student_tasks.get(student_name, [])
+    except NotionAPIError as e:
+        # Notion 側の障害時は同期済みのミラーで代替する（ミラーにもなければ元のエラーを返す）
+        if not e.unavailable:
+            raise
+        student, tasks, synced_at = await load_mirrored_student(db, laboratory_name, year, student_name)
+        if synced_at is None:
+            raise
+
+    if not student:
+        raise HTTPException(status_code=404, detail=f"{student_name} さんの学生データが見つかりませんでした。")
+    if not tasks:
+        raise HTTPException(status_code=404, detail=f"{student_name} さんのコンタクトタイム記録が見つかりませんでした。")
+
+    latex = render_student_contact_time(laboratory_name, year, student, tasks)
+    try:
+        result = await compile_latex_async(latex, template="contact_time")
+    except LatexCompileError as e:
+        raise HTTPException(status_code=500, detail=e.to_detail())
+
+    headers = {
+        "Content-Disposition": quote_filename(f"contact_time_{student_name}.pdf"),
+        "Server-Timing": result.server_timing(),
+        "X-Data-Source": "mirror" if synced_at else "notion",
+    }
+    if synced_at:
+        headers["X-Data-Synced-At"] = synced_at.isoformat()
+    return Response(content=result.pdf, media_type="application/pdf", headers=headers)
+
+
+# =====================================================
+# 研究室単位の一括生成
+# =====================================================
+class ContactTimeBatchRequest(BaseModel):
+    laboratory_name: str
+    year: int
+    format: Literal["zip", "merged"] = "zip"
+    student_names: Optional[List[str]] = None
+
+
+def _build_zip(documents: List[tuple]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for filename, pdf in documents:
+            archive.writestr(filename, pdf)
+    return buffer.getvalue()
+
+
+def _merge_pdfs(documents: List[tuple]) -> bytes:
+    writer = PdfWriter()
+    for _, pdf in documents:
+        for page in PdfReader(io.BytesIO(pdf)).pages:
+            writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    writer.close()
+    return output.getvalue()
+
+
+async def _run_contact_time_batch(job: Job, payload: ContactTimeBatchRequest, entry: Notion) -> None:
+    # 学生DBとタスクDBは研究室につき1回だけ取得する
+    job.message = "Notionからデータを取得中"
+    students, tasks_by_student = await fetch_contact_time_source(entry)
+    if payload.student_names:
+        wanted = set(payload.student_names)
+        students = [s for s in students if s["student_name"] in wanted]
+
+    job.total = len(students)
+    job.message = "PDFを生成中"
+
+    async def render(student: Dict[str, Any]) -> Optional[tuple]:
+        name = student["student_name"]
+        tasks = tasks_by_student.get(name, [])
+        if not tasks:
+            job.advance(False, {"student_name": name, "detail": "コンタクトタイム記録がありません"})
+            return None
+        latex = render_student_contact_time(payload.laboratory_name, payload.year, student, tasks)
+        try:
+            result = await compile_latex_async(latex, template="contact_time")
+        except LatexCompileError as e:
+            job.advance(False, {"student_name": name, "detail": e.to_detail()})
+            return None
+        job.advance()
+        return (f"contact_time_{student.get('student_number', '')}_{name}.pdf", result.pdf)
+
+    # コンパイル自体の並列度はコンパイルプールの大きさで抑えられる
+    results = await asyncio.gather(*(render(student) for student in students))
+    documents = [document for document in results if document]
+    if not documents:
+        raise HTTPException(status_code=404, detail="生成できるコンタクトタイム記録がありませんでした。")
+
+    job.message = "ファイルをまとめています"
+    base_name = f"contact_time_{payload.laboratory_name}_{payload.year}"
+    if payload.format == "merged":
+        job.content = await run_in_threadpool(_merge_pdfs, documents)
+        job.media_type = "application/pdf"
+        job.filename = f"{base_name}.pdf"
+    else:
+        job.content = await run_in_threadpool(_build_zip, documents)
+        job.media_type = "application/zip"
+        job.filename = f"{base_name}.zip"
+    job.message = None
+
+
+@contact_time_router.post("/contact-time/batch", status_code=202)
+async def start_contact_time_batch(
+    payload: ContactTimeBatchRequest,
+    db: AsyncSession = Depends(get_db_session),
+):
+    """研究室の学生全員分（または student_names で指定した学生）の記録用紙を一括生成するジョブを開始する"""
+    entry = await get_notion_entry(db, payload.laboratory_name, payload.year)
+    job = start_job("contact_time_batch", lambda job: _run_contact_time_batch(job, payload, entry))
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+
+@contact_time_router.get("/contact-time/batch/{job_id}")
+async def get_contact_time_batch(job_id: str):
+    """一括生成ジョブの進捗を返す"""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="指定されたジョブが見つかりません。")
+    return job.to_dict()
+
+
+@contact_time_router.get("/contact-time/batch/{job_id}/download")
+async def download_contact_time_batch(job_id: str):
+    """一括生成ジョブの結果（ZIP または結合PDF）を返す"""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="指定されたジョブが見つかりません。")
+    if job.content is None:
+        raise HTTPException(status_code=409, detail=job.error or "ジョブがまだ完了していません。")
+    return Response(
+        content=job.content,
+        media_type=job.media_type,
+        headers={"Content-Disposition": quote_filename(job.filename)},
+    )
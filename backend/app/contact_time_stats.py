@@ -0,0 +1,191 @@
+# contact_time_stats.py
+"""ミラー済みのコンタクトタイムの集計API
+
+学生ごとの合計・週ごとの内訳・研究室全体の分布（平均・パーセンタイル）を Postgres 側で集計する。
+欠損は次のように扱う:
+
+- 作業時間（working_time）が未入力のタスクは合計に含めず、件数を missing_working_time として返す
+- 開始日時のないタスクは週ごとの内訳に含めず、件数を undated_tasks として返す
+- 学生DBのどの学生にも紐づかないタスク（「共通」ページを含む）は unassigned にまとめ、分布には含めない
+- タスクが1件もない学生は合計0分として分布に含める
+"""
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import Date, DateTime, and_, case, cast, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db_session
+from models.notion import ContactTime, Student
+from notion_sync import COMMON_STUDENT_NAME, _freshness, _freshness_headers, _unknown, ensure_synced
+
+
+contact_time_stats_router = APIRouter(tags=["notion-sync"])
+
+# 研究室全体の分布として返すパーセンタイル
+PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+
+# GROUPING(student_page_id, week) の値（grouping_id）
+_BY_STUDENT_WEEK = 0
+_BY_STUDENT = 1
+_BY_WEEK = 2
+
+
+def _counts(tasks: int, timed: int, minutes: int) -> Dict[str, int]:
+    return {"minutes": int(minutes), "task_count": tasks, "missing_working_time": tasks - timed}
+
+
+def _percentile_label(fraction: float) -> str:
+    return f"p{round(fraction * 100)}"
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(float(value), 1)
+
+
+async def aggregate_contact_time(db: AsyncSession, laboratory_name: str, year: int) -> Dict[str, Any]:
+    """研究室・年度のコンタクトタイムを集計する（時間はすべて分、週は月曜始まり）"""
+    student_filter = and_(
+        Student.laboratory_name == laboratory_name,
+        Student.year == year,
+        Student.student_name != COMMON_STUDENT_NAME,
+    )
+    students = (
+        await db.execute(
+            select(Student.notion_page_id, Student.student_number, Student.student_name, Student.total_contact_time)
+            .where(student_filter)
+            .order_by(Student.student_number.asc().nulls_last(), Student.student_name)
+        )
+    ).all()
+
+    # 学生・週・作業時間だけのタスク。学生に紐づかないタスクは student_page_id、日付のないタスクは week を NULL にする
+    tasks = (
+        select(
+            case(
+                (ContactTime.student_page_id.in_(select(Student.notion_page_id).where(student_filter)),
+                 ContactTime.student_page_id),
+                else_=None,
+            ).label("student_page_id"),
+            cast(func.date_trunc("week", cast(ContactTime.date, DateTime)), Date).label("week"),
+            ContactTime.working_time,
+        )
+        .where(ContactTime.laboratory_name == laboratory_name, ContactTime.year == year)
+        .cte("tasks")
+    )
+
+    # 学生×週・学生・週 の3通りの集計を1つの GROUP BY で行う
+    grouped = await db.execute(
+        select(
+            tasks.c.student_page_id,
+            tasks.c.week,
+            func.grouping(tasks.c.student_page_id, tasks.c.week).label("grouping_id"),
+            func.count().label("tasks"),
+            func.count(tasks.c.working_time).label("timed"),
+            func.coalesce(func.sum(tasks.c.working_time), 0).label("minutes"),
+        )
+        .group_by(
+            func.grouping_sets(
+                tuple_(tasks.c.student_page_id, tasks.c.week),
+                tuple_(tasks.c.student_page_id),
+                tuple_(tasks.c.week),
+            )
+        )
+        .order_by(tasks.c.week.asc().nulls_last())
+    )
+
+    per_student: Dict[Any, Dict[str, Any]] = {
+        row.notion_page_id: {
+            "student_number": _unknown(row.student_number),
+            "student_name": row.student_name,
+            "total_contact_time": _unknown(row.total_contact_time),
+            **_counts(0, 0, 0),
+            "undated_tasks": 0,
+            "weekly": [],
+        }
+        for row in students
+    }
+    unassigned = {**_counts(0, 0, 0), "undated_tasks": 0}
+    weekly = []
+    undated = 0
+    for row in grouped.all():
+        target = per_student.get(row.student_page_id, unassigned) if row.grouping_id != _BY_WEEK else None
+        if row.grouping_id == _BY_STUDENT:
+            target.update(_counts(row.tasks, row.timed, row.minutes))
+        elif row.grouping_id == _BY_STUDENT_WEEK:
+            if row.week is None:
+                target["undated_tasks"] = row.tasks
+            elif target is not unassigned:
+                target["weekly"].append({"week": row.week.isoformat(), **_counts(row.tasks, row.timed, row.minutes)})
+        elif row.week is None:
+            undated = row.tasks
+        else:
+            weekly.append({"week": row.week.isoformat(), **_counts(row.tasks, row.timed, row.minutes)})
+
+    # 学生ごとの合計（タスクのない学生は0分）の分布
+    totals = (
+        select(func.coalesce(func.sum(ContactTime.working_time), 0).label("minutes"))
+        .select_from(Student)
+        .outerjoin(
+            ContactTime,
+            and_(
+                ContactTime.student_page_id == Student.notion_page_id,
+                ContactTime.laboratory_name == laboratory_name,
+                ContactTime.year == year,
+            ),
+        )
+        .where(student_filter)
+        .group_by(Student.notion_page_id)
+        .subquery()
+    )
+    distribution = (
+        await db.execute(
+            select(
+                func.count().label("students"),
+                func.avg(totals.c.minutes).label("mean"),
+                func.min(totals.c.minutes).label("min"),
+                func.max(totals.c.minutes).label("max"),
+                *(
+                    func.percentile_cont(fraction).within_group(totals.c.minutes).label(_percentile_label(fraction))
+                    for fraction in PERCENTILES
+                ),
+            )
+        )
+    ).one()
+
+    return {
+        "laboratory_name": laboratory_name,
+        "year": year,
+        "students": list(per_student.values()),
+        "weekly": weekly,
+        "undated_tasks": undated,
+        "unassigned": unassigned,
+        "distribution": {
+            "students": distribution.students,
+            "mean": _round(distribution.mean),
+            "min": distribution.min,
+            "max": distribution.max,
+            **{
+                _percentile_label(fraction): _round(getattr(distribution, _percentile_label(fraction)))
+                for fraction in PERCENTILES
+            },
+        },
+    }
+
+
+@contact_time_stats_router.get("/contact_time_stats")
+async def get_contact_time_stats(
+    laboratory_name: str = Query(..., description="研究室名"),
+    year: int = Query(..., description="年度"),
+    refresh: bool = Query(False, description="応答前に Notion と差分同期する"),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """
+    研究室・年度のコンタクトタイムを学生ごと・週ごとに集計し、研究室全体の分布とあわせてミラーから返す
+    """
+    synced_at, stale = await ensure_synced(db, laboratory_name, year, refresh)
+    stats = await aggregate_contact_time(db, laboratory_name, year)
+    return JSONResponse(
+        content={**stats, **_freshness(synced_at, stale)},
+        headers=_freshness_headers(synced_at, stale),
+    )
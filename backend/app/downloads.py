@@ -0,0 +1,13 @@
+# downloads.py
+"""ファイルダウンロード用レスポンスの共通処理"""
+import urllib.parse
+
+
+def quote_filename(filename: str) -> str:
+    """Content-Disposition ヘッダーの値を返す（ASCII 以外のファイル名は RFC 5987 形式にする）"""
+    try:
+        ascii_filename = filename.encode("ascii").decode("ascii")
+        return f'attachment; filename="{ascii_filename}"'
+    except UnicodeEncodeError:
+        quoted = urllib.parse.quote(filename)
+        return f"attachment; filename*=UTF-8''{quoted}"
@@ -0,0 +1,487 @@
+# fake_notion.py
+"""ローカルで動く Notion API の代役（テスト・ベンチマーク用）
+
+notion_api.py が使うエンドポイントだけを実装する:
+  POST /v1/databases/{id}/query   （relation contains / last_edited_time / and / or のフィルター、ページネーション）
+  GET  /v1/databases/{id}
+  GET  /v1/blocks/{id}/children   （ページネーション）
+  GET  /v1/pages/{id}
+
+研究室 → 年度DB → 年度ページ → 共通データベーストグル → 学生DB・卒研作業タスクDB の
+ツリーを指定した規模で生成して返す。遅延・429・5xx を注入でき、本物の Notion への
+リクエストを記録したフィクスチャを再生することもできる。
+
+    python fake_notion.py --port 8100 --labs 5 --students 12 --tasks-per-student 80 --latency-ms 150
+    NOTION_API_BASE_URL=http://localhost:8100/v1 NOTION_TOKEN=dummy python bench_notion.py
+
+    # 本物の Notion へのリクエストを中継しながら記録する / 記録したものだけで応答する
+    NOTION_TOKEN=secret_xxx python fake_notion.py --record fixtures/
+    python fake_notion.py --replay fixtures/
+
+ルートDBのIDは GET /_fake/info で確認できる。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+JST = timezone(timedelta(hours=9), "JST")
+ID_NAMESPACE = uuid.UUID("6f1c2e0a-7b1d-4c55-9a57-1e2f6a1d0c11")
+MAX_PAGE_SIZE = 100
+REAL_NOTION_BASE_URL = "https://api.notion.com/v1"
+
+
+def _id(*parts: Any) -> str:
+    """生成するページ・ブロックのID（同じ設定なら毎回同じになる）"""
+    return str(uuid.uuid5(ID_NAMESPACE, "/".join(str(part) for part in parts)))
+
+
+def _key(page_id: str) -> str:
+    return str(page_id).replace("-", "")
+
+
+def _title(text: str) -> Dict[str, Any]:
+    return {"type": "title", "title": [{"type": "text", "text": {"content": text}, "plain_text": text}]}
+
+
+def _rich_text(text: Optional[str]) -> Dict[str, Any]:
+    items = [{"type": "text", "text": {"content": text}, "plain_text": text}] if text else []
+    return {"type": "rich_text", "rich_text": items}
+
+
+def _iso(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:00.000Z")
+
+
+def _error(status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={"object": "error", "status": status, "code": code, "message": message},
+        headers=headers,
+    )
+
+
+# =====================================================
+# 生成するワークスペース
+# =====================================================
+class FakeWorkspace:
+    """研究室ツリーと学生・タスクを生成して保持する"""
+
+    def __init__(
+        self,
+        labs: int = 3,
+        years: int = 2,
+        students: int = 10,
+        tasks_per_student: int = 50,
+        first_year: int = 2025,
+        seed: int = 0,
+    ):
+        self.random = random.Random(seed)
+        self.root_database_id = _id("root")
+        self.databases: Dict[str, List[Dict[str, Any]]] = {}
+        self.database_titles: Dict[str, str] = {}
+        self.blocks: Dict[str, List[Dict[str, Any]]] = {}
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.base_time = datetime(first_year, 4, 1, tzinfo=JST)
+
+        lab_pages = []
+        for lab in range(labs):
+            lab_page = self._page(_id("lab", lab), {"名前": _title(f"研究室{lab + 1}")})
+            lab_pages.append(lab_page)
+            year_blocks = []
+            for offset in range(years):
+                year = first_year + offset
+                year_db = _id("year-db", lab, year)
+                year_blocks.append(self._child_database(year_db, f"{year}年度"))
+                self._add_database(year_db, f"{year}年度", [
+                    self._build_thesis_page(lab, year, students, tasks_per_student)
+                ])
+            self.blocks[_key(lab_page["id"])] = year_blocks
+        self._add_database(self.root_database_id, "研究室", lab_pages)
+
+    def _page(self, page_id: str, properties: Dict[str, Any], edited: Optional[datetime] = None) -> Dict[str, Any]:
+        page = {
+            "object": "page",
+            "id": page_id,
+            "created_time": _iso(self.base_time),
+            "last_edited_time": _iso(edited or self.base_time),
+            "archived": False,
+            "properties": properties,
+        }
+        self.pages[_key(page_id)] = page
+        return page
+
+    def _child_database(self, database_id: str, title: str) -> Dict[str, Any]:
+        return {"object": "block", "id": database_id, "type": "child_database", "has_children": False,
+                "child_database": {"title": title}}
+
+    def _add_database(self, database_id: str, title: str, pages: List[Dict[str, Any]]) -> None:
+        self.databases[_key(database_id)] = pages
+        self.database_titles[_key(database_id)] = title
+
+    def _build_thesis_page(self, lab: int, year: int, students: int, tasks_per_student: int) -> Dict[str, Any]:
+        thesis = self._page(_id("thesis", lab, year), {
+            "名前": _title(f"{year}年度卒研"),
+            "年度": {"type": "number", "number": year},
+        })
+        toggle_id = _id("toggle", lab, year)
+        self.blocks[_key(thesis["id"])] = [
+            {"object": "block", "id": _id("heading", lab, year), "type": "paragraph", "has_children": False,
+             "paragraph": _rich_text("卒業研究の共有ページ")},
+            {"object": "block", "id": toggle_id, "type": "toggle", "has_children": True,
+             "toggle": {"rich_text": _rich_text("共通データベース")["rich_text"]}},
+        ]
+        student_db = _id("student-db", lab, year)
+        task_db = _id("task-db", lab, year)
+        self.blocks[_key(toggle_id)] = [
+            self._child_database(student_db, "学生"),
+            self._child_database(task_db, "卒研作業タスク"),
+        ]
+
+        student_pages, task_pages = [], []
+        for number in range(students):
+            student_id = _id("student", lab, year, number)
+            tasks = [self._build_task(lab, year, number, student_id, i) for i in range(tasks_per_student)]
+            task_pages.extend(tasks)
+            total = sum(task["properties"]["作業時間(分)"]["formula"]["number"] or 0 for task in tasks)
+            student_pages.append(self._page(student_id, {
+                "Name": _title(f"学生{lab + 1}-{number + 1:02d}"),
+                "学生番号": {"type": "number", "number": (year % 100) * 10000 + lab * 100 + number + 1},
+                "卒研テーマ": _rich_text(f"テーマ {lab + 1}-{number + 1}"),
+                "総コンタクトタイム": {"type": "rollup", "rollup": {"type": "number", "number": total}},
+            }))
+        student_pages.append(self._page(_id("student", lab, year, "common"), {
+            "Name": _title("共通"),
+            "学生番号": {"type": "number", "number": None},
+            "卒研テーマ": _rich_text(None),
+            "総コンタクトタイム": {"type": "rollup", "rollup": {"type": "number", "number": 0}},
+        }))
+        self._add_database(student_db, "学生", student_pages)
+        self._add_database(task_db, "卒研作業タスク", task_pages)
+        return thesis
+
+    def _build_task(self, lab: int, year: int, number: int, student_id: str, index: int) -> Dict[str, Any]:
+        rnd = self.random
+        start = self.base_time + timedelta(days=index * 2 + rnd.randint(0, 1), hours=9 + rnd.randint(0, 6))
+        working = rnd.choice([30, 45, 60, 90, 120, 180])
+        excluded = rnd.choice([0, 0, 0, 10, 15])
+        end = start + timedelta(minutes=working + excluded)
+        # 一部のタスクは入力漏れにする（終了時間がないと作業時間の数式は null になる）
+        has_summary = rnd.random() > 0.03
+        has_end = rnd.random() > 0.03
+        return self._page(_id("task", lab, year, number, index), {
+            "名前": {"type": "relation", "relation": [{"id": student_id}], "has_more": False},
+            "開始時間": {"type": "date", "date": {"start": start.isoformat(), "end": None}},
+            "終了時間": {"type": "date", "date": {"start": end.isoformat(), "end": None} if has_end else None},
+            "作業要約": _rich_text(f"作業 {index + 1}: 実験とまとめ" if has_summary else None),
+            "除外時間(分)": {"type": "number", "number": excluded or None},
+            "作業時間(分)": {"type": "formula", "formula": {"type": "number", "number": working if has_end else None}},
+        }, edited=start)
+
+    def touch(self, count: int) -> List[str]:
+        """ランダムなタスクを count 件だけ今編集されたことにする（差分同期の計測用）"""
+        tasks = [page for pages in self.databases.values() for page in pages if "作業時間(分)" in page["properties"]]
+        touched = self.random.sample(tasks, min(count, len(tasks)))
+        now = _iso(datetime.now(timezone.utc))
+        for page in touched:
+            page["last_edited_time"] = now
+        return [page["id"] for page in touched]
+
+
+# =====================================================
+# フィルター
+# =====================================================
+def _matches(page: Dict[str, Any], filter_json: Optional[Dict[str, Any]]) -> bool:
+    if not filter_json:
+        return True
+    if "or" in filter_json:
+        return any(_matches(page, item) for item in filter_json["or"])
+    if "and" in filter_json:
+        return all(_matches(page, item) for item in filter_json["and"])
+    if filter_json.get("timestamp") == "last_edited_time":
+        condition = filter_json.get("last_edited_time", {})
+        edited = datetime.fromisoformat(page["last_edited_time"].replace("Z", "+00:00"))
+        if "on_or_after" in condition:
+            return edited >= datetime.fromisoformat(condition["on_or_after"].replace("Z", "+00:00"))
+        if "after" in condition:
+            return edited > datetime.fromisoformat(condition["after"].replace("Z", "+00:00"))
+        return True
+    prop = page["properties"].get(filter_json.get("property"), {})
+    if "relation" in filter_json:
+        related = {_key(item["id"]) for item in prop.get("relation", [])}
+        contains = filter_json["relation"].get("contains")
+        return contains is None or _key(contains) in related
+    # 未対応のフィルターは絞り込まない
+    return True
+
+
+def _paginate(results: List[Dict[str, Any]], start_cursor: Optional[str], page_size: Any) -> Dict[str, Any]:
+    size = max(1, min(int(page_size or MAX_PAGE_SIZE), MAX_PAGE_SIZE))
+    offset = int(start_cursor or 0)
+    chunk = results[offset:offset + size]
+    has_more = offset + size < len(results)
+    return {
+        "object": "list",
+        "results": chunk,
+        "has_more": has_more,
+        "next_cursor": str(offset + size) if has_more else None,
+        "type": "page_or_database",
+    }
+
+
+# =====================================================
+# フィクスチャの記録・再生
+# =====================================================
+def fixture_key(method: str, path: str, query: Dict[str, Any], body: Any) -> str:
+    canonical = json.dumps(
+        {"method": method, "path": path, "query": sorted(query.items()), "body": body},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class FixtureStore:
+    """リクエスト（メソッド・パス・クエリ・本文）ごとにレスポンスを JSON ファイルで保存する"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, record: Dict[str, Any]) -> None:
+        with open(self._path(key), "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=1)
+
+
+# =====================================================
+# アプリケーション
+# =====================================================
+class FaultInjector:
+    """遅延・429・5xx の注入と、1秒あたりの上限を超えたときの 429"""
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        rate_limit_ratio: float = 0,
+        error_ratio: float = 0,
+        max_rps: float = 0,
+        retry_after: float = 1,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_ratio = rate_limit_ratio
+        self.error_ratio = error_ratio
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self._window: List[float] = []
+
+    async def before(self) -> Optional[JSONResponse]:
+        delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        now = time.monotonic()
+        if self.max_rps:
+            self._window = [t for t in self._window if now - t < 1]
+            if len(self._window) >= self.max_rps:
+                return self._rate_limited()
+            self._window.append(now)
+        if self.random.random() < self.rate_limit_ratio:
+            return self._rate_limited()
+        if self.random.random() < self.error_ratio:
+            return _error(self.random.choice([500, 502, 503]), "internal_server_error", "Injected error.")
+        return None
+
+    def _rate_limited(self) -> JSONResponse:
+        return _error(429, "rate_limited", "Injected rate limit.", headers={"Retry-After": str(self.retry_after)})
+
+
+def create_app(
+    workspace: Optional[FakeWorkspace] = None,
+    faults: Optional[FaultInjector] = None,
+    record_dir: Optional[str] = None,
+    replay_dir: Optional[str] = None,
+) -> FastAPI:
+    workspace = workspace or FakeWorkspace()
+    faults = faults or FaultInjector()
+    recorder = FixtureStore(record_dir) if record_dir else None
+    replayer = FixtureStore(replay_dir) if replay_dir else None
+    stats: Dict[str, Any] = {"requests": 0, "by_endpoint": {}, "injected": 0}
+    upstream: Dict[str, httpx.AsyncClient] = {}
+
+    app = FastAPI(title="Fake Notion API")
+
+    @app.middleware("http")
+    async def count_and_inject(request: Request, call_next):
+        if not request.url.path.startswith("/v1/"):
+            return await call_next(request)
+        stats["requests"] += 1
+        endpoint = f"{request.method} {request.url.path.split('/')[2]}"
+        stats["by_endpoint"][endpoint] = stats["by_endpoint"].get(endpoint, 0) + 1
+        injected = await faults.before()
+        if injected is not None:
+            stats["injected"] += 1
+            return injected
+
+        if recorder or replayer:
+            raw = await request.body()
+            body = json.loads(raw) if raw else None
+            key = fixture_key(request.method, request.url.path, dict(request.query_params), body)
+            if replayer:
+                record = replayer.load(key)
+                if record is None:
+                    return _error(404, "object_not_found", f"No fixture for {request.method} {request.url.path}")
+                return JSONResponse(status_code=record["status"], content=record["response"])
+            return await _record(request, body, key)
+        return await call_next(request)
+
+    async def _record(request: Request, body: Any, key: str) -> JSONResponse:
+        client = upstream.get("client")
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=REAL_NOTION_BASE_URL,
+                headers={
+                    "Authorization": f"Bearer {os.getenv('NOTION_TOKEN')}",
+                    "Notion-Version": request.headers.get("Notion-Version", "2022-06-28"),
+                },
+                timeout=30,
+            )
+            upstream["client"] = client
+        res = await client.request(
+            request.method,
+            request.url.path[len("/v1"):],
+            params=dict(request.query_params),
+            json=body,
+        )
+        content = res.json()
+        recorder.save(key, {
+            "method": request.method,
+            "path": request.url.path,
+            "query": dict(request.query_params),
+            "body": body,
+            "status": res.status_code,
+            "response": content,
+        })
+        return JSONResponse(status_code=res.status_code, content=content)
+
+    @app.post("/v1/databases/{database_id}/query")
+    async def query_database(database_id: str, request: Request):
+        raw = await request.body()
+        payload = json.loads(raw) if raw else {}
+        pages = workspace.databases.get(_key(database_id))
+        if pages is None:
+            return _error(404, "object_not_found", f"Could not find database with ID: {database_id}.")
+        results = [page for page in pages if _matches(page, payload.get("filter"))]
+        return _paginate(results, payload.get("start_cursor"), payload.get("page_size"))
+
+    @app.get("/v1/databases/{database_id}")
+    async def retrieve_database(database_id: str):
+        title = workspace.database_titles.get(_key(database_id))
+        if title is None:
+            return _error(404, "object_not_found", f"Could not find database with ID: {database_id}.")
+        return {"object": "database", "id": database_id, "title": _title(title)["title"], "properties": {}}
+
+    @app.get("/v1/blocks/{block_id}/children")
+    async def get_block_children(block_id: str, start_cursor: Optional[str] = None, page_size: int = MAX_PAGE_SIZE):
+        blocks = workspace.blocks.get(_key(block_id))
+        if blocks is None:
+            return _error(404, "object_not_found", f"Could not find block with ID: {block_id}.")
+        return {**_paginate(blocks, start_cursor, page_size), "type": "block"}
+
+    @app.get("/v1/pages/{page_id}")
+    async def retrieve_page(page_id: str):
+        page = workspace.pages.get(_key(page_id))
+        if page is None:
+            return _error(404, "object_not_found", f"Could not find page with ID: {page_id}.")
+        return page
+
+    @app.get("/_fake/info")
+    async def info():
+        return {
+            "root_database_id": workspace.root_database_id,
+            "databases": len(workspace.databases),
+            "pages": len(workspace.pages),
+            "mode": "replay" if replayer else "record" if recorder else "generated",
+        }
+
+    @app.get("/_fake/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/_fake/reset")
+    async def reset_stats():
+        stats.update({"requests": 0, "by_endpoint": {}, "injected": 0})
+        return stats
+
+    @app.post("/_fake/touch")
+    async def touch(count: int = 10):
+        return {"touched": workspace.touch(count)}
+
+    @app.on_event("shutdown")
+    async def close_upstream():
+        if "client" in upstream:
+            await upstream["client"].aclose()
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="ローカルの Notion API 代役サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--labs", type=int, default=3)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--students", type=int, default=10, help="研究室・年度あたりの学生数")
+    parser.add_argument("--tasks-per-student", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0, help="全リクエストに加える遅延")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="遅延に加えるランダムな揺らぎの上限")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0, help="429 を返す割合")
+    parser.add_argument("--error-ratio", type=float, default=0, help="5xx を返す割合")
+    parser.add_argument("--max-rps", type=float, default=0, help="1秒あたりこれを超えたら 429（0 で無制限）")
+    parser.add_argument("--retry-after", type=float, default=1, help="429 の Retry-After（秒）")
+    parser.add_argument("--record", metavar="DIR", help="本物の Notion に中継してフィクスチャを記録する")
+    parser.add_argument("--replay", metavar="DIR", help="記録したフィクスチャだけで応答する")
+    args = parser.parse_args()
+
+    fake_app = create_app(
+        workspace=FakeWorkspace(args.labs, args.years, args.students, args.tasks_per_student, seed=args.seed),
+        faults=FaultInjector(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            rate_limit_ratio=args.rate_limit_ratio,
+            error_ratio=args.error_ratio,
+            max_rps=args.max_rps,
+            retry_after=args.retry_after,
+            seed=args.seed,
+        ),
+        record_dir=args.record,
+        replay_dir=args.replay,
+    )
+    uvicorn.run(fake_app, host=args.host, port=args.port)
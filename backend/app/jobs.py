@@ -0,0 +1,130 @@
+# jobs.py
+"""プロセス内のバックグラウンドジョブ管理
+
+時間のかかる処理（一括PDF生成など）を asyncio タスクとして走らせ、
+進捗と結果をジョブIDで参照できるようにする。状態はこのプロセスのメモリにだけ保持する。
+"""
+import asyncio
+import time
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOB_RETENTION_SECONDS = 60 * 60
+MAX_JOBS = 200
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    """1件のジョブの状態・進捗・結果"""
+
+    def __init__(self, kind: str, total: int = 0):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = PENDING
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.message: Optional[str] = None
+        self.errors: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        # 結果（バイナリを返すジョブは content / media_type / filename、それ以外は result）
+        self.result: Any = None
+        self.content: Optional[bytes] = None
+        self.media_type: Optional[str] = None
+        self.filename: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def advance(self, ok: bool = True, error: Optional[Dict[str, Any]] = None) -> None:
+        """1単位の処理が終わったことを記録する"""
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+            if error:
+                self.errors.append(error)
+
+    def to_dict(self) -> Dict[str, Any]:
+        processed = self.completed + self.failed
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "progress": round(processed / self.total, 3) if self.total else (1.0 if self.done else 0.0),
+            "message": self.message,
+            "errors": self.errors,
+            "error": self.error,
+            "result": self.result,
+            "has_content": self.content is not None,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+_jobs: Dict[str, Job] = {}
+
+
+def _prune() -> None:
+    now = time.time()
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job.finished_at and now - job.finished_at > JOB_RETENTION_SECONDS
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+    # 上限を超えたら終了済みの古いものから捨てる
+    if len(_jobs) > MAX_JOBS:
+        finished = sorted((job for job in _jobs.values() if job.done), key=lambda job: job.created_at)
+        for job in finished[:len(_jobs) - MAX_JOBS]:
+            del _jobs[job.id]
+
+
+def error_message(e: Exception) -> str:
+    """例外を job.error に入れる文字列にする（HTTPException の構造化 detail は message だけ使う）"""
+    detail = getattr(e, "detail", None)
+    if isinstance(detail, dict):
+        detail = detail.get("message")
+    return str(detail or e)
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    return _jobs.get(job_id)
+
+
+def start_job(kind: str, runner: Callable[[Job], Awaitable[None]], total: int = 0) -> Job:
+    """ジョブを登録してバックグラウンドで runner(job) を実行する
+
+    runner は job.total / job.advance() で進捗を、job.content などで結果を設定する。
+    例外が出たらジョブは failed になる。
+    """
+    _prune()
+    job = Job(kind, total)
+    _jobs[job.id] = job
+
+    async def run() -> None:
+        job.status = RUNNING
+        try:
+            await runner(job)
+            job.status = SUCCEEDED
+        except Exception as e:
+            traceback.print_exc()
+            job.status = FAILED
+            job.error = error_message(e)
+        finally:
+            job.finished_at = time.time()
+
+    job._task = asyncio.create_task(run())
+    return job
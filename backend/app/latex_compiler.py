@@ -0,0 +1,319 @@
+# latex_compiler.py
+"""platex + dvipdfmx によるPDFコンパイルの共通パイプライン
+
+各段階の所要時間・出力サイズ・ページ数を計測してヒストグラムに記録し、
+失敗時は platex のログからエラー行（ファイル・行番号・メッセージ）を抽出して返す。
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+from pypdf import PdfReader
+
+from metrics import counter, histogram
+from singleflight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+
+COMPILE_TIMEOUT_SECONDS = 30
+# 同時に走らせる platex の数（TeX はCPUとメモリを食うのでコア数で抑える）
+COMPILE_POOL_SIZE = int(os.getenv("LATEX_COMPILE_WORKERS", str(os.cpu_count() or 2)))
+# ソースのハッシュをキーにしたPDFキャッシュの件数
+COMPILE_CACHE_SIZE = int(os.getenv("LATEX_COMPILE_CACHE_SIZE", "64"))
+MAX_DIAGNOSTICS = 20
+LOG_TAIL_LINES = 40
+
+STAGE_SECONDS = histogram(
+    "latex_compile_stage_seconds",
+    "LaTeXコンパイル各段階（platex / dvipdfmx / total）の所要時間（秒）",
+    buckets=[0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30],
+)
+OUTPUT_BYTES = histogram(
+    "latex_compile_output_bytes",
+    "生成されたPDFのサイズ（バイト）",
+    buckets=[10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000],
+)
+OUTPUT_PAGES = histogram(
+    "latex_compile_pages",
+    "生成されたPDFのページ数",
+    buckets=[1, 2, 5, 10, 20, 50, 100],
+)
+FAILURES = counter(
+    "latex_compile_failures_total",
+    "LaTeXコンパイル失敗回数（段階別）",
+)
+CACHE_LOOKUPS = counter(
+    "latex_compile_cache_total",
+    "コンパイル済みPDFキャッシュの参照回数（hit / miss）",
+)
+
+# -file-line-error 形式: ./document.tex:12: Undefined control sequence.
+_FILE_LINE_ERROR = re.compile(r"^(\.?/?[^\s:]+\.(?:tex|sty|cls|def|fd|clo|cfg)):(\d+): (.+)$")
+# 従来形式: "! メッセージ" の後に "l.12 ..." が続く
+_BANG_ERROR = re.compile(r"^! (.+)$")
+_LINE_MARKER = re.compile(r"^l\.(\d+)")
+_OUTPUT_WRITTEN = re.compile(r"Output written on \S+ \((\d+) pages?")
+
+# 同じソースのコンパイルが同時に来たら1回だけ走らせる
+_compiles = SingleFlight("latex_compile")
+
+
+class LatexDiagnostic(BaseModel):
+    """platex ログから抽出したエラー1件"""
+
+    file: Optional[str] = None
+    line: Optional[int] = None
+    message: str
+
+
+class CompileResult(BaseModel):
+    """コンパイル結果（PDF本体と計測値）"""
+
+    pdf: bytes
+    template: str
+    timings: Dict[str, float] = Field(default_factory=dict)
+    size: int = 0
+    page_count: Optional[int] = None
+
+    def server_timing(self) -> str:
+        """Server-Timing ヘッダー用の文字列（ミリ秒）"""
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.timings.items())
+
+
+class LatexCompileError(Exception):
+    """コンパイル失敗。どの段階で失敗したかと解析済みのエラー行を保持する"""
+
+    def __init__(
+        self,
+        message: str,
+        stage: str,
+        template: str,
+        diagnostics: Optional[List[LatexDiagnostic]] = None,
+        timings: Optional[Dict[str, float]] = None,
+        log_tail: str = "",
+        timed_out: bool = False,
+    ):
+        super().__init__(message)
+        self.message = message
+        self.stage = stage
+        self.template = template
+        self.diagnostics = diagnostics or []
+        self.timings = timings or {}
+        self.log_tail = log_tail
+        self.timed_out = timed_out
+
+    def to_detail(self) -> Dict[str, object]:
+        """HTTPException の detail にそのまま渡せる構造化エラー"""
+        return {
+            "message": self.message,
+            "stage": self.stage,
+            "template": self.template,
+            "timed_out": self.timed_out,
+            "errors": [d.dict() for d in self.diagnostics],
+            "timings": {stage: round(seconds, 4) for stage, seconds in self.timings.items()},
+            "log_tail": self.log_tail,
+        }
+
+
+def parse_latex_log(log: str) -> List[LatexDiagnostic]:
+    """platex の出力からエラー行を抽出する"""
+    diagnostics: List[LatexDiagnostic] = []
+    seen = set()
+    lines = log.splitlines()
+
+    for index, line in enumerate(lines):
+        match = _FILE_LINE_ERROR.match(line)
+        if match:
+            diagnostic = LatexDiagnostic(file=match.group(1), line=int(match.group(2)), message=match.group(3).strip())
+        else:
+            match = _BANG_ERROR.match(line)
+            if not match:
+                continue
+            line_number = None
+            for following in lines[index + 1:index + 15]:
+                marker = _LINE_MARKER.match(following)
+                if marker:
+                    line_number = int(marker.group(1))
+                    break
+            diagnostic = LatexDiagnostic(line=line_number, message=match.group(1).strip())
+
+        key = (diagnostic.line, diagnostic.message)
+        if key in seen:
+            continue
+        seen.add(key)
+        diagnostics.append(diagnostic)
+        if len(diagnostics) >= MAX_DIAGNOSTICS:
+            break
+
+    return diagnostics
+
+
+def _tail(text: str, lines: int = LOG_TAIL_LINES) -> str:
+    return "\n".join(text.splitlines()[-lines:])
+
+
+def _count_pages(pdf: bytes, platex_log: str) -> Optional[int]:
+    match = _OUTPUT_WRITTEN.search(platex_log)
+    if match:
+        return int(match.group(1))
+    try:
+        return len(PdfReader(io.BytesIO(pdf)).pages)
+    except Exception:
+        return None
+
+
+def _run_stage(stage: str, args: List[str], cwd: str, template: str, timings: Dict[str, float]) -> subprocess.CompletedProcess:
+    started = time.perf_counter()
+    try:
+        proc = subprocess.run(args, cwd=cwd, capture_output=True, timeout=COMPILE_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired as exc:
+        timings[stage] = time.perf_counter() - started
+        FAILURES.inc(template=template, stage=stage)
+        output = (exc.stdout or b"").decode("utf-8", errors="ignore")
+        raise LatexCompileError(
+            f"{stage} timed out after {COMPILE_TIMEOUT_SECONDS}s",
+            stage=stage,
+            template=template,
+            diagnostics=parse_latex_log(output),
+            timings=timings,
+            log_tail=_tail(output),
+            timed_out=True,
+        ) from exc
+    timings[stage] = time.perf_counter() - started
+    STAGE_SECONDS.observe(timings[stage], template=template, stage=stage)
+    return proc
+
+
+def compile_latex(latex_content: str, template: str = "raw") -> CompileResult:
+    """LaTeX文字列を platex → dvipdfmx でコンパイルし、計測値付きで返す
+
+    template はメトリクスのラベルで、どのテンプレートが遅いかを区別するために使う。
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir_path = Path(tmpdir)
+        (tmpdir_path / "document.tex").write_text(latex_content, encoding="utf-8")
+
+        # platex でコンパイル（日本語対応）
+        proc_compile = _run_stage(
+            "platex",
+            ["platex", "-interaction=nonstopmode", "-file-line-error", "document.tex"],
+            tmpdir,
+            template,
+            timings,
+        )
+        platex_log = proc_compile.stdout.decode("utf-8", errors="ignore")
+        if proc_compile.returncode != 0:
+            FAILURES.inc(template=template, stage="platex")
+            diagnostics = parse_latex_log(platex_log)
+            logger.warning(
+                "platex failed (template=%s): %s",
+                template,
+                "; ".join(f"{d.file or ''}:{d.line or '?'}: {d.message}" for d in diagnostics) or "no diagnostics",
+            )
+            raise LatexCompileError(
+                "LaTeX compilation failed",
+                stage="platex",
+                template=template,
+                diagnostics=diagnostics,
+                timings=timings,
+                log_tail=_tail(platex_log),
+            )
+
+        # dvipdfmx で PDF に変換
+        proc_pdf = _run_stage("dvipdfmx", ["dvipdfmx", "document.dvi"], tmpdir, template, timings)
+        if proc_pdf.returncode != 0:
+            FAILURES.inc(template=template, stage="dvipdfmx")
+            stderr = proc_pdf.stderr.decode("utf-8", errors="ignore")
+            raise LatexCompileError(
+                "PDF conversion failed",
+                stage="dvipdfmx",
+                template=template,
+                timings=timings,
+                log_tail=_tail(stderr),
+            )
+
+        pdf_file = tmpdir_path / "document.pdf"
+        if not pdf_file.exists():
+            FAILURES.inc(template=template, stage="output")
+            raise LatexCompileError("PDF file was not generated", stage="output", template=template, timings=timings)
+        pdf = pdf_file.read_bytes()
+
+    timings["total"] = time.perf_counter() - started
+    STAGE_SECONDS.observe(timings["total"], template=template, stage="total")
+
+    page_count = _count_pages(pdf, platex_log)
+    OUTPUT_BYTES.observe(len(pdf), template=template)
+    if page_count is not None:
+        OUTPUT_PAGES.observe(page_count, template=template)
+
+    return CompileResult(pdf=pdf, template=template, timings=timings, size=len(pdf), page_count=page_count)
+
+
+# =====================================================
+# コンパイルプールとキャッシュ
+# =====================================================
+_compile_pool = ThreadPoolExecutor(max_workers=COMPILE_POOL_SIZE, thread_name_prefix="latex")
+_cache: "OrderedDict[str, CompileResult]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_key(latex_content: str) -> str:
+    return hashlib.sha256(latex_content.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[CompileResult]:
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+        return result
+
+
+def _cache_put(key: str, result: CompileResult) -> None:
+    if COMPILE_CACHE_SIZE <= 0:
+        return
+    with _cache_lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > COMPILE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+async def compile_latex_async(latex_content: str, template: str = "raw", use_cache: bool = True) -> CompileResult:
+    """compile_latex をコンパイルプール上で実行する（イベントループを塞がない）
+
+    同じソースの結果はキャッシュから返し、同じソースのコンパイルが実行中ならその結果を待つ。
+    """
+    key = _cache_key(latex_content)
+    loop = asyncio.get_running_loop()
+    if not use_cache:
+        return await loop.run_in_executor(_compile_pool, compile_latex, latex_content, template)
+
+    cached = _cache_get(key)
+    if cached is not None:
+        CACHE_LOOKUPS.inc(template=template, result="hit")
+        return cached
+    CACHE_LOOKUPS.inc(template=template, result="miss")
+
+    async def compile_and_cache() -> CompileResult:
+        result = await loop.run_in_executor(_compile_pool, compile_latex, latex_content, template)
+        _cache_put(key, result)
+        return result
+
+    return await _compiles.do(key, compile_and_cache)
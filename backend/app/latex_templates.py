@@ -0,0 +1,269 @@
+# latex_templates.py
+"""LaTeX 文書のテンプレート層
+
+テンプレートは生成時に一度だけ「リテラル部分」と「差し込みフィールド」に分解しておき、
+描画時はそれを順に連結するだけにする。エスケープは変換テーブルによる1パスの str.translate。
+プログラム（発表順）とコンタクトタイム記録用紙の両方で使う。
+"""
+import re
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+_LATEX_ESCAPE_TABLE = str.maketrans({
+    '\\': r'\textbackslash{}',
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\textasciicircum{}',
+})
+
+# <<name>> はエスケープして、<<name|raw>> はそのまま差し込む
+_PLACEHOLDER = re.compile(r"<<(\w+)(\|raw)?>>")
+
+
+def escape_latex(text: Optional[str]) -> str:
+    """LaTeX特殊文字をエスケープ"""
+    if not text:
+        return ''
+    return text.translate(_LATEX_ESCAPE_TABLE)
+
+
+class LatexTemplate:
+    """<<name>> / <<name|raw>> 形式のプレースホルダーを持つコンパイル済みテンプレート"""
+
+    def __init__(self, source: str):
+        self.source = source
+        pieces = _PLACEHOLDER.split(source)
+        # split の結果は [リテラル, 名前, |raw, リテラル, 名前, |raw, ..., リテラル] の順
+        self._head = pieces[0]
+        self._fields: List[Tuple[str, bool, str]] = [
+            (pieces[i], pieces[i + 1] is None, pieces[i + 2])
+            for i in range(1, len(pieces), 3)
+        ]
+        self.fields = frozenset(name for name, _, _ in self._fields)
+
+    def render(self, **values: object) -> str:
+        parts = [self._head]
+        append = parts.append
+        for name, escape, literal in self._fields:
+            value = values[name]
+            if value is None:
+                text = ''
+            elif escape:
+                text = str(value).translate(_LATEX_ESCAPE_TABLE)
+            else:
+                text = str(value)
+            append(text)
+            append(literal)
+        return ''.join(parts)
+
+
+# =====================================================
+# プログラム（発表順）
+# =====================================================
+PROGRAM_DOCUMENT = LatexTemplate(r"""\documentclass[dvipdfmx,a4j]{jsarticle}
+\usepackage[top=20truemm,bottom=20truemm,left=25truemm,right=25truemm]{geometry}
+\begin{document}
+\title{{\normalsize <<course_name>>} \\
+{\LARGE <<event_name>>} \\
+{\Large <<event_theme>>}}
+\date{\empty}
+\maketitle
+\vspace{-1cm}
+\noindent
+\hspace{5cm} 日時:<<date_time>> \\
+\hspace{5cm} 会場:<<venue>>
+\vspace{1cm}
+<<sessions|raw>>
+\end{document}
+""")
+
+PROGRAM_SESSION = LatexTemplate(r"""
+\section*{Session <<session_number>>(<<start_time>>〜<<end_time>>){\normalsize 座長:<<chair>>、タイムキーパー:<<timekeeper>>} }
+\begin{tabular}{rlp{12cm}}
+<<presentations|raw>>
+\end{tabular}
+""")
+
+PROGRAM_BREAK = LatexTemplate(r"""\section*{Break(<<start_time>>〜<<end_time>>)}
+\vspace{0.5cm}""")
+
+PROGRAM_PRESENTATION = LatexTemplate(r"""  <<number>>. & <<student_name>> & <<theme>> \\""")
+
+PROGRAM_SESSION_SEPARATOR = '\n\\vspace{0.5cm}\n'
+
+
+# =====================================================
+# コンタクトタイム記録用紙
+# =====================================================
+CONTACT_TIME_ROWS_PER_PAGE = 30
+
+CONTACT_TIME_DOCUMENT = LatexTemplate(r"""
+\documentclass[a4j,11pt]{jarticle}
+\usepackage[a4paper,totalheight=265mm,textwidth=175mm]{geometry}
+\pagestyle{empty}
+\setlength{\unitlength}{1mm}
+\newcommand{\ysize}{192}
+\newcommand{\xline}{\line(1,0){175}}%
+\newcommand{\yline}{\line(0,1){\ysize}}%
+\newcount\x
+\newcount\y
+
+% --- フレーム描画コマンド ---
+\newcommand{\startFrame}{%
+ \begin{picture}(175,260)
+  \put(0,0){\makebox(175,260){}}
+
+  % --- メインの表 (上部) ---
+  \put(0,30){
+   \thicklines
+   \put(0,0){\framebox(175,192){}}
+   \put(0,186){\xline}
+
+   % 縦線
+   \thinlines
+   \put(16,0){\yline}% 日付
+   \put(33,0){\yline}% 開始
+   \put(50,0){\yline}% 終了
+   \put(66,0){\yline}% 除外
+   \put(90,0){\yline}% 実施時間
+
+   % 横罫線 (30行)
+   \multiput(0,6)(0,6){30}{\xline}
+
+   % ヘッダー文字
+   \put(0,186){
+    \put(0,0){\makebox(16,6){日付}}%
+    \put(16,0){\makebox(17,6){開始時刻}}%
+    \put(33,0){\makebox(17,6){終了時刻}}%
+    \put(50,0){\makebox(16,6){除外(分)}}%
+    \put(66,0){\makebox(24,6){実施時間(分)}}%
+    \put(90,0){\makebox(85,6){内容}}%
+   }
+
+   % 合計欄 (表の直下、実施時間の列)
+   \put(66,-6){\line(0,1){6}} % 縦線
+   \put(90,-6){\line(0,1){6}} % 縦線
+   \put(66,-6){\line(1,0){24}} % 下線
+   \put(66,-6){\makebox(24,6){<<current_total>>}}
+  }
+
+  % --- フッター集計表 (左下) ---
+  \put(0,0){
+   \thicklines
+   % 3行目 (今回の)
+   \put(0,12){\framebox(60,6){今回のコンタクトタイム}}
+   \put(60,12){\framebox(60,6){<<current_detail>>}}
+
+   % 2行目 (これまでの)
+   \put(0,6){\framebox(60,6){これまでのコンタクトタイム}}
+   \put(60,6){\framebox(60,6){<<previous_detail>>}}
+
+   % 1行目 (総)
+   \put(0,0){\framebox(60,6){総コンタクトタイム}}
+   \put(60,0){\framebox(60,6){<<grand_total_detail>>}}
+  }
+
+  % --- 教員印 (右下) ---
+  \put(155,0){\thicklines\framebox(20,20){}}
+  \put(134,0){\makebox(20,6)[r]{教員の印}}
+
+  \global\y=210
+}
+
+\newcommand{\nendoNumber}[3]{%
+ \put(0,236){\makebox(175,8){\Large\bf #1年度　#2研究　コンタクトタイム記録用紙}}%
+ \put(0,244){\makebox(175,6)[r]{No. #3}}%
+}
+
+% 学生番号と名前をスペース区切りで表示
+\newcommand{\courseLaboName}[3]{
+ \put(0,228){\makebox(175,6){%
+  #1 \hfil <<laboratory_name>> \hfil #3
+ }}%
+}
+
+\newcommand{\lastFrame}{
+ \end{picture}
+}
+
+\newcommand{\addLine}[6]{
+ \put(0,\y){%
+  \put(0,0){\makebox(16,6){#1}}%
+  \put(16,0){\makebox(17,6){#2}}%
+  \put(33,0){\makebox(17,6){#3}}%
+  \put(50,0){\makebox(16,6){#4}}%
+  \put(66,0){\makebox(24,6){#5}}%
+  \put(91,0){\makebox(83,6)[l]{\small #6}}%
+ }
+ \global\advance\y by -6
+}
+
+\begin{document}
+<<pages|raw>>
+\end{document}
+""")
+
+CONTACT_TIME_PAGE = LatexTemplate(r"""\startFrame
+\nendoNumber{<<year>>}{卒業}{<<page_number>>}
+\courseLaboName{<<course_name>>}{<<laboratory_name>>}{<<student_number>>~~<<student_name>>}
+<<lines|raw>>
+\lastFrame""")
+
+CONTACT_TIME_LINE = LatexTemplate(
+    r"""\addLine{<<date>>}{<<start_time>>}{<<end_time>>}{<<excluded>>}{<<duration>>}{<<content>>}"""
+)
+
+
+def format_duration_detail(minutes: int) -> str:
+    """分を「N分 (H時間 M分)」形式にする"""
+    return f"{minutes}分 ({minutes // 60}時間 {minutes % 60}分)"
+
+
+def render_contact_time_latex(
+    year: int,
+    laboratory_name: str,
+    student_number: object,
+    student_name: str,
+    rows: Iterable[Mapping[str, object]],
+    current_total: int,
+    grand_total: int,
+    course_name: str = "情報システム工学コース",
+) -> str:
+    """コンタクトタイム記録用紙のLaTeXを生成する
+
+    rows は date / start_time / end_time / excluded / duration / content を持つ行。
+    1ページ30行を超える分は No. を進めた次のページに送る。
+    """
+    lines = [CONTACT_TIME_LINE.render(**row) for row in rows]
+    chunks = [
+        lines[start:start + CONTACT_TIME_ROWS_PER_PAGE]
+        for start in range(0, len(lines), CONTACT_TIME_ROWS_PER_PAGE)
+    ] or [[]]
+
+    pages = '\n\\newpage\n'.join(
+        CONTACT_TIME_PAGE.render(
+            year=year,
+            page_number=page_number,
+            course_name=course_name,
+            laboratory_name=laboratory_name,
+            student_number=student_number,
+            student_name=student_name,
+            lines='\n'.join(chunk),
+        )
+        for page_number, chunk in enumerate(chunks, start=1)
+    )
+
+    previous_total = max(0, grand_total - current_total)
+    return CONTACT_TIME_DOCUMENT.render(
+        current_total=current_total,
+        current_detail=format_duration_detail(current_total),
+        previous_detail=format_duration_detail(previous_total),
+        grand_total_detail=format_duration_detail(grand_total),
+        laboratory_name=laboratory_name,
+        pages=pages,
+    )
@@ -1,22 +1,35 @@
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from database import init_db
 from notion_api import notion_router
+from notion_sync import notion_sync_router
+from notion_worker import NOTION_SYNC_IN_PROCESS, notion_worker_router, start_scheduler, stop_scheduler
 from papers import router as papers_router
 from pdf_generator import pdf_router
 from conference_api import conference_router
 from compile_api import router as compile_router
+from contact_time_api import contact_time_router
+from contact_time_stats import contact_time_stats_router
+from metrics import metrics_router
+from notion_http import NotionAPIError, close_notion_client
+from submission_events import submission_event_hub
 
 # --- FastAPI アプリ ---
 app = FastAPI()
 app.include_router(pdf_router, prefix="/pdf")
 app.include_router(compile_router, prefix="/pdf")
+app.include_router(contact_time_router, prefix="/pdf")
 
 app.include_router(notion_router, prefix="/notion")
+app.include_router(notion_sync_router, prefix="/notion")
+app.include_router(notion_worker_router, prefix="/notion")
+app.include_router(contact_time_stats_router, prefix="/notion")
 app.include_router(papers_router)
 app.include_router(conference_router)
+app.include_router(metrics_router)
 
 # --- CORS設定 ---
 # 環境変数 FRONTEND_URL をカンマ区切りで複数指定可能にする
@@ -32,9 +45,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ミラーの鮮度（最終同期時刻）をフロントエンドから読めるようにする
+    expose_headers=["X-Data-Synced-At", "X-Data-Age", "X-Data-Stale", "X-Data-Source"],
 )
 
+# --- Notion API エラー ---
+# サーキットブレーカーが開いているときは 503、タイムアウトは 504、それ以外の失敗は 502 として返す
+@app.exception_handler(NotionAPIError)
+async def handle_notion_error(request: Request, exc: NotionAPIError):
+    if exc.circuit_open:
+        headers = {"Retry-After": str(max(1, round(exc.retry_after or 1)))}
+        return JSONResponse(status_code=503, content={"detail": exc.message}, headers=headers)
+    status_code = 504 if exc.timed_out else 502
+    return JSONResponse(status_code=status_code, content={"detail": exc.message})
+
 # --- 起動時処理 ---
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    # 提出イベントの LISTEN は購読者がいなくても起動時から張っておく
+    submission_event_hub.start()
+    # NOTION_SYNC_IN_PROCESS=1 のときは API プロセス内で Notion を定期同期する
+    if NOTION_SYNC_IN_PROCESS:
+        start_scheduler()
+
+# --- 終了時処理 ---
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stop_scheduler()
+    await submission_event_hub.close()
+    await close_notion_client()
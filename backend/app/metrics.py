@@ -0,0 +1,108 @@
+# metrics.py
+"""プロセス内メトリクス（ヒストグラム・カウンタ）と /metrics エンドポイント"""
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from fastapi import APIRouter
+
+
+metrics_router = APIRouter(tags=["metrics"])
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Histogram:
+    """ラベルごとにバケット数・合計・件数を保持する累積ヒストグラム"""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float]):
+        self.name = name
+        self.description = description
+        self.buckets: List[float] = sorted(buckets)
+        self._series: Dict[LabelKey, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            series = []
+            for key, data in self._series.items():
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.buckets + [float("inf")], data["counts"]):
+                    cumulative += count
+                    buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+                series.append({
+                    "labels": dict(key),
+                    "count": data["count"],
+                    "sum": round(data["sum"], 6),
+                    "buckets": buckets,
+                })
+        return {"type": "histogram", "description": self.description, "series": series}
+
+
+class Counter:
+    """ラベルごとに単調増加する値を保持するカウンタ"""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            series = [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+        return {"type": "counter", "description": self.description, "series": series}
+
+
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name: str, description: str, buckets: Sequence[float]) -> Histogram:
+    """同名のヒストグラムがあればそれを返し、なければ登録する"""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = Histogram(name, description, buckets)
+            _registry[name] = metric
+        return metric
+
+
+def counter(name: str, description: str) -> Counter:
+    """同名のカウンタがあればそれを返し、なければ登録する"""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = Counter(name, description)
+            _registry[name] = metric
+        return metric
+
+
+@metrics_router.get("/metrics")
+async def get_metrics():
+    """登録済みメトリクスのスナップショットを返す"""
+    with _registry_lock:
+        metrics = dict(_registry)
+    return {name: metric.snapshot() for name, metric in metrics.items()}
@@ -0,0 +1,40 @@
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+async def migrate():
+    try:
+        async with engine.begin() as conn:
+            # students: Notion 学生DBのミラー用カラム
+            await conn.execute(text("ALTER TABLE students ALTER COLUMN student_number DROP NOT NULL;"))
+            await conn.execute(text("ALTER TABLE students ALTER COLUMN total_contact_time TYPE INTEGER USING NULLIF(total_contact_time, '')::integer;"))
+            await conn.execute(text("ALTER TABLE students ADD COLUMN IF NOT EXISTS notion_page_id UUID;"))
+            await conn.execute(text("ALTER TABLE students ADD COLUMN IF NOT EXISTS last_edited_time TIMESTAMPTZ;"))
+            await conn.execute(text("ALTER TABLE students ADD COLUMN IF NOT EXISTS synced_at TIMESTAMPTZ;"))
+            await conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS students_notion_page_id_key ON students (notion_page_id);"))
+
+            # contact_times: Notion 卒研作業タスクDBのミラー用カラム
+            await conn.execute(text("ALTER TABLE contact_times ALTER COLUMN date DROP NOT NULL;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS notion_page_id UUID;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS student_page_id UUID;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS student_name VARCHAR;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS start_time TIMESTAMPTZ;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS end_time TIMESTAMPTZ;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS excluded_time INTEGER;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS working_time INTEGER;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS summary TEXT;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS last_edited_time TIMESTAMPTZ;"))
+            await conn.execute(text("ALTER TABLE contact_times ADD COLUMN IF NOT EXISTS synced_at TIMESTAMPTZ;"))
+            await conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS contact_times_notion_page_id_key ON contact_times (notion_page_id);"))
+            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_contact_times_laboratory_name ON contact_times (laboratory_name);"))
+            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_contact_times_year ON contact_times (year);"))
+            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_contact_times_student_page_id ON contact_times (student_page_id);"))
+
+            # notion_sync_state は init_db (create_all) で作成される
+
+        print("Migration completed successfully.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,15 @@
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+async def migrate():
+    try:
+        async with engine.begin() as conn:
+            # 全件同期（Notion 側で消えたページをミラーから消す）の実行を区別する
+            await conn.execute(text("ALTER TABLE notion_sync_runs ADD COLUMN IF NOT EXISTS full_sync BOOLEAN NOT NULL DEFAULT FALSE;"))
+        print("Migration to add notion_sync_runs.full_sync completed successfully.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
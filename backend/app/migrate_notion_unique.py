@@ -0,0 +1,26 @@
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+async def migrate():
+    try:
+        async with engine.begin() as conn:
+            # reflesh のたびに積み増された重複行を、thesis_page_id ごとに最新の1行だけ残して削除する
+            await conn.execute(text("""
+                DELETE FROM notion a
+                USING notion b
+                WHERE a.thesis_page_id = b.thesis_page_id
+                  AND a.id < b.id;
+            """))
+            await conn.execute(text("DELETE FROM notion WHERE thesis_page_id IS NULL;"))
+
+            await conn.execute(text("ALTER TABLE notion ADD COLUMN IF NOT EXISTS last_edited_time TIMESTAMPTZ;"))
+            await conn.execute(text("ALTER TABLE notion ADD COLUMN IF NOT EXISTS synced_at TIMESTAMPTZ;"))
+            await conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS notion_thesis_page_id_key ON notion (thesis_page_id);"))
+            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_notion_laboratory_year ON notion (laboratory_name, year);"))
+        print("Migration to deduplicate notion rows completed successfully.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
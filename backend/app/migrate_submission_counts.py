@@ -0,0 +1,21 @@
+import asyncio
+from sqlalchemy import text
+from database import engine
+from reconcile_submission_counts import reconcile_submission_counts
+
+async def migrate():
+    try:
+        async with engine.begin() as conn:
+            # 提出数のカウンタキャッシュ（一覧で abstract_submissions を GROUP BY しないため）
+            for column in ("submission_count", "abstract_count", "paper_count", "presentation_count"):
+                await conn.execute(text(f"ALTER TABLE submission_threads ADD COLUMN IF NOT EXISTS {column} INTEGER NOT NULL DEFAULT 0;"))
+            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_submission_threads_created_at ON submission_threads (created_at);"))
+
+            # 既存の提出から初期値を埋める
+            filled = await reconcile_submission_counts(conn)
+        print(f"Migration to add submission counters completed successfully ({filled} thread(s) backfilled).")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,27 @@
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+async def migrate():
+    try:
+        async with engine.begin() as conn:
+            # 提出物ごとの提出日時（締切に対する遅れの判定用）
+            prefixes = ("pdf", "paper", "presentation")
+            for prefix in prefixes:
+                await conn.execute(text(f"ALTER TABLE abstract_submissions ADD COLUMN IF NOT EXISTS {prefix}_submitted_at TIMESTAMPTZ;"))
+            # submitted_at は提出のたびに更新されるので、提出物が1種類だけの行に限り既存の提出日時で埋める
+            # （それ以外は NULL のままにし、遅れの判定はしない）
+            single_kind = " + ".join(f"({prefix}_filename IS NOT NULL)::int" for prefix in prefixes) + " = 1"
+            for prefix in prefixes:
+                await conn.execute(text(f"""
+                    UPDATE abstract_submissions
+                    SET {prefix}_submitted_at = submitted_at
+                    WHERE {prefix}_filename IS NOT NULL AND {prefix}_submitted_at IS NULL AND {single_kind};
+                """))
+            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_abstract_submissions_thread_id ON abstract_submissions (thread_id);"))
+        print("Migration to add per-file submission timestamps completed successfully.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,34 @@
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+async def migrate():
+    try:
+        async with engine.begin() as conn:
+            # 同じスレッド・学生番号の提出が複数あると一意制約を張れないので、先に確認する
+            duplicates = (await conn.execute(text("""
+                SELECT thread_id, student_number, count(*) AS submissions
+                FROM abstract_submissions
+                GROUP BY thread_id, student_number
+                HAVING count(*) > 1;
+            """))).all()
+            if duplicates:
+                for thread_id, student_number, submissions in duplicates:
+                    print(f"Duplicate submissions: thread={thread_id} student_number={student_number} ({submissions} rows)")
+                raise RuntimeError("resolve the duplicate submissions above, then run reconcile_submission_counts.py and this migration again")
+
+            await conn.execute(text("""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_abstract_submissions_thread_student') THEN
+                        ALTER TABLE abstract_submissions
+                        ADD CONSTRAINT uq_abstract_submissions_thread_student UNIQUE (thread_id, student_number);
+                    END IF;
+                END $$;
+            """))
+        print("Migration to add a unique submission per student completed successfully.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
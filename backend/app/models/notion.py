@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, JSON
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Date, DateTime, JSON, Text, UniqueConstraint, Index, false, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from database import Base
@@ -21,33 +21,83 @@ class Laboratory(Base):
     
 
 class Student(Base):
+    """Notion の学生DBのミラー（notion_sync が同期する）"""
     __tablename__ = "students"
 
     id = Column(Integer, primary_key=True, index=True)
-    student_number = Column(Integer, nullable=False)
+    student_number = Column(Integer, nullable=True)
     student_name = Column(String, nullable=False)
     laboratory_name = Column(String, nullable=False)
     theme = Column(String, nullable=True)
-    total_contact_time = Column(String, nullable=True)
+    total_contact_time = Column(Integer, nullable=True)
     year = Column(Integer, nullable=True) 
+    notion_page_id = Column(UUID(as_uuid=True), unique=True, nullable=True)
+    last_edited_time = Column(DateTime(timezone=True), nullable=True)
+    synced_at = Column(DateTime(timezone=True), nullable=True)
 
 class ContactTime(Base):
+    """Notion の卒研作業タスクDBのミラー。data には API レスポンスと同じ形のタスク情報を保持する"""
     __tablename__ = "contact_times"
 
     id = Column(Integer, primary_key=True, index=True)
     data = Column(JSON, nullable=False)
+    laboratory_name = Column(String, nullable=False, index=True)
+    year = Column(Integer, nullable=True, index=True) 
+    date = Column(Date, nullable=True)
+    notion_page_id = Column(UUID(as_uuid=True), unique=True, nullable=True)
+    student_page_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+    student_name = Column(String, nullable=True)
+    start_time = Column(DateTime(timezone=True), nullable=True)
+    end_time = Column(DateTime(timezone=True), nullable=True)
+    excluded_time = Column(Integer, nullable=True)
+    working_time = Column(Integer, nullable=True)
+    summary = Column(Text, nullable=True)
+    last_edited_time = Column(DateTime(timezone=True), nullable=True)
+    synced_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class NotionSyncState(Base):
+    """研究室・年度・種類（students / tasks）ごとの最終同期時刻と差分取得の基準時刻"""
+    __tablename__ = "notion_sync_state"
+    __table_args__ = (UniqueConstraint("laboratory_name", "year", "kind", name="uq_notion_sync_state"),)
+
+    id = Column(Integer, primary_key=True)
     laboratory_name = Column(String, nullable=False)
-    year = Column(Integer, nullable=True) 
-    date = Column(Date, nullable=False)
+    year = Column(Integer, nullable=True)
+    kind = Column(String(20), nullable=False)
+    last_edited_cursor = Column(DateTime(timezone=True), nullable=True)
+    synced_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
 
 class Notion(Base):
     __tablename__ = "notion"
+    __table_args__ = (Index("ix_notion_laboratory_year", "laboratory_name", "year"),)
 
     id = Column(Integer, primary_key=True)
     laboratory_name = Column(String, nullable=False)
     title = Column(String, nullable=False)
     year = Column(Integer, nullable=True) 
-    thesis_page_id = Column(UUID(as_uuid=True))
+    thesis_page_id = Column(UUID(as_uuid=True), unique=True)
     student_page_id = Column(UUID(as_uuid=True))
-    task_page_id = Column(UUID(as_uuid=True))
\ No newline at end of file
+    task_page_id = Column(UUID(as_uuid=True))
+    # 年度ページの最終編集時刻（変わっていなければ reflesh で子ブロックをたどらない）
+    last_edited_time = Column(DateTime(timezone=True), nullable=True)
+    synced_at = Column(DateTime(timezone=True), nullable=True)
+
+class NotionSyncRun(Base):
+    """バックグラウンド同期（notion_worker）の実行履歴"""
+    __tablename__ = "notion_sync_runs"
+
+    id = Column(Integer, primary_key=True)
+    trigger = Column(String(20), nullable=False)
+    status = Column(String(20), nullable=False)
+    # 全件同期（Notion 側で消えたページをミラーから消す）だったか
+    full_sync = Column(Boolean, nullable=False, default=False, server_default=false())
+    started_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    laboratories = Column(Integer, nullable=True)
+    thesis_pages = Column(Integer, nullable=True)
+    synced_entries = Column(Integer, nullable=True)
+    failed_entries = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    details = Column(JSON, nullable=True)
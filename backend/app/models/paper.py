@@ -9,6 +9,7 @@ from sqlalchemy import (
     LargeBinary,
     String,
     Text,
+    UniqueConstraint,
     func,
 )
 from sqlalchemy.dialects.postgresql import JSONB, UUID as PGUUID
@@ -46,7 +47,13 @@ class SubmissionThread(Base):
     has_abstract = Column(Boolean, default=True)
     has_paper = Column(Boolean, default=False)
     has_presentation = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # 提出数のカウンタキャッシュ（提出の追加・削除と同じトランザクションで更新し、
+    # ずれたら reconcile_submission_counts.py で直す）
+    submission_count = Column(Integer, nullable=False, default=0, server_default="0")
+    abstract_count = Column(Integer, nullable=False, default=0, server_default="0")
+    paper_count = Column(Integer, nullable=False, default=0, server_default="0")
+    presentation_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
     updated_at = Column(
         DateTime(timezone=True),
         nullable=False,
@@ -59,9 +66,11 @@ class AbstractSubmission(Base):
     """Single submission belonging to a submission thread, containing up to 3 files."""
 
     __tablename__ = "abstract_submissions"
+    # 1スレッドにつき学生1件（同じ学生の同時提出を1行にまとめる）
+    __table_args__ = (UniqueConstraint("thread_id", "student_number", name="uq_abstract_submissions_thread_student"),)
 
     id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    thread_id = Column(PGUUID(as_uuid=True), ForeignKey("submission_threads.id", ondelete="CASCADE"), nullable=False)
+    thread_id = Column(PGUUID(as_uuid=True), ForeignKey("submission_threads.id", ondelete="CASCADE"), nullable=False, index=True)
     student_number = Column(String(32), nullable=False)
     student_name = Column(String(120), nullable=False)
     laboratory = Column(String(120), nullable=False)
@@ -73,18 +82,21 @@ class AbstractSubmission(Base):
     pdf_content_type = Column(String(120), nullable=True)
     pdf_size = Column(Integer, nullable=True)
     pdf_data = Column(LargeBinary, nullable=True)
+    pdf_submitted_at = Column(DateTime(timezone=True), nullable=True)
     
     # Paper
     paper_filename = Column(String(255), nullable=True)
     paper_content_type = Column(String(120), nullable=True)
     paper_size = Column(Integer, nullable=True)
     paper_data = Column(LargeBinary, nullable=True)
+    paper_submitted_at = Column(DateTime(timezone=True), nullable=True)
     
     # Presentation
     presentation_filename = Column(String(255), nullable=True)
     presentation_content_type = Column(String(120), nullable=True)
     presentation_size = Column(Integer, nullable=True)
     presentation_data = Column(LargeBinary, nullable=True)
+    presentation_submitted_at = Column(DateTime(timezone=True), nullable=True)
 
     submitted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
@@ -1,31 +1,51 @@
 # notion_api.py
-from fastapi import APIRouter, Query, Depends, HTTPException
-import requests
-import json
+from fastapi import APIRouter, Query, Depends, HTTPException, Request
+import asyncio
 import os
+import time
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from pdf_generator import pdf_router
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, distinct
+from sqlalchemy import JSON, select, distinct, delete, func, literal_column, or_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
 from database import get_db_session
 # from models.notion import Laboratory, Year, Notion, Student, ContactTime
 from models.notion import Notion
 import uuid
+from notion_http import NotionAPIError, get_notion_client, logger
+from response_cache import VersionedResponseCache
 
 
 # --- 🔑 Notion API 設定 ---
-NOTION_TOKEN = os.getenv("NOTION_TOKEN")
-HEADERS = {
-    "Authorization": f"Bearer {NOTION_TOKEN}",
-    "Notion-Version": "2022-06-28",
-    "Content-Type": "application/json"
-}
+# トークン・接続プール・タイムアウトは notion_http.NotionClient が管理する
+# reflesh のクロールで同時に投げる Notion リクエスト数（レート自体は NotionClient が制限する）
+NOTION_CRAWL_CONCURRENCY = int(os.getenv("NOTION_CRAWL_CONCURRENCY", "4"))
+# /years・/laboratory_name・/laboratories の応答をキャッシュする秒数（別プロセスの同期を反映するまでの上限）
+NOTION_INDEX_CACHE_SECONDS = float(os.getenv("NOTION_INDEX_CACHE_SECONDS", "60"))
+# 1文あたりの upsert 行数（asyncpg のバインドパラメータ上限 32767 に収める）
+UPSERT_CHUNK_SIZE = 500
 
 
 notion_router = APIRouter()
 
+# notion テーブルから作る一覧系の応答。reflesh のコミットでバージョンを上げる
+notion_index_cache = VersionedResponseCache("notion_index", max_age_seconds=NOTION_INDEX_CACHE_SECONDS)
+
+JST = timezone(timedelta(hours=9), "JST")
+
+
+def parse_notion_timestamp(value: Any) -> Optional[datetime]:
+    """Notion の日時文字列を aware な datetime にする（日付のみの値は JST の0時とみなす）"""
+    if not isinstance(value, str) or value == "Unknown":
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=JST)
+
 
 class StudentData(BaseModel):
     student_number: str
@@ -67,18 +87,6 @@ student = {
 
 
 
-def print_curl_debug(method, url, headers=None, json_payload=None):
-    curl_cmd = f"curl -X {method} '{url}'"
-    if headers:
-        for key, value in headers.items():
-            curl_cmd += f" \\\n  -H '{key}: {value}'"
-    if json_payload:
-        json_str = json.dumps(json_payload)
-        curl_cmd += f" \\\n  -d '{json_str}'"
-    curl_cmd += " | jq .\n"
-    print(curl_cmd)
-
-
 def extract_student_page_data(student_page):
     properties = student_page["properties"]
     student_name = properties["Name"]["title"][0]["text"]["content"] if properties["Name"]["title"] else "Unknown"
@@ -96,14 +104,60 @@ def extract_student_page_data(student_page):
     return student_page_data
 
 
-def extract_task_page_data(task_page):
+def _normalize_page_id(page_id) -> str:
+    return str(page_id).replace("-", "")
+
+
+def _page_title(page, property_name="Name") -> str:
+    title = page["properties"].get(property_name, {}).get("title") or []
+    return title[0]["plain_text"] if title else "Unknown"
+
+
+class StudentNameResolver:
+    """
+    学生ページID → 学生名の対応表。
+    学生DBを1回クエリして作り、表にないIDだけ retrieve_page で引いて覚えておく（同期1回分のメモ）。
+    """
+
+    def __init__(self, names: Optional[Dict[str, str]] = None):
+        self._names: Dict[str, str] = dict(names or {})
+        self.misses = 0
+
+    @classmethod
+    def from_pages(cls, student_pages) -> "StudentNameResolver":
+        return cls({_normalize_page_id(page["id"]): _page_title(page) for page in student_pages})
+
+    @classmethod
+    async def from_database(cls, student_page_id) -> "StudentNameResolver":
+        return cls.from_pages(await query_database(student_page_id))
+
+    async def resolve(self, page_id) -> str:
+        key = _normalize_page_id(page_id)
+        name = self._names.get(key)
+        if name is None:
+            self.misses += 1
+            name = _page_title(await retrieve_page(page_id))
+            self._names[key] = name
+        return name
+
+    def page_ids_for(self, student_name: str) -> List[str]:
+        """学生名に対応する学生ページIDの一覧（同名の学生が複数いればすべて）"""
+        return [str(uuid.UUID(key)) for key, name in self._names.items() if name == student_name]
+
+
+def student_relation_filter(student_page_ids: List[str], property_name: str = "名前") -> Dict[str, Any]:
+    """タスクDBを「名前」リレーションで絞り込む Notion のフィルター"""
+    filters = [{"property": property_name, "relation": {"contains": page_id}} for page_id in student_page_ids]
+    return filters[0] if len(filters) == 1 else {"or": filters}
+
+
+async def extract_task_page_data(task_page, resolver: Optional[StudentNameResolver] = None):
     properties = task_page["properties"]
     
     student_name = "Unknown"
     if "名前" in properties and properties["名前"]["type"] == "relation" and len(properties["名前"]["relation"]) > 0:
         rel_page_id = properties["名前"]["relation"][0]["id"]
-        rel_page = retrieve_page(rel_page_id)
-        student_name = rel_page["properties"]["Name"]["title"][0]["plain_text"]
+        student_name = await (resolver or StudentNameResolver()).resolve(rel_page_id)
 
     start_time = properties["開始時間"]["date"]["start"] if properties["開始時間"]["date"] else "Unknown"
     end_time = properties["終了時間"]["date"]["start"] if properties["終了時間"]["date"] else "Unknown"
@@ -136,69 +190,30 @@ def insert_db(laboratory_name, student_data, student_task_data, year):
 # =====================================================
 # 基本APIラッパー関数
 # =====================================================
-def query_database(database_id, filter_json=None):
-    url = f"https://api.notion.com/v1/databases/{database_id}/query"
-    
-    all_results = []
-    has_more = True
-    next_cursor = None
-
-    while has_more:
-        payload = {}
-        if filter_json:
-            payload["filter"] = filter_json
-        if next_cursor:
-            payload["start_cursor"] = next_cursor
-            
-        print_curl_debug("POST", url, headers=HEADERS, json_payload=payload)
-        res = requests.post(url, headers=HEADERS, json=payload)
-        res.raise_for_status()
-        data = res.json()
-        
-        results = data.get("results", [])
-        all_results.extend(results)
-        
-        has_more = data.get("has_more", False)
-        next_cursor = data.get("next_cursor")
-        
-        print(f"    📄 Query fetched {len(results)} items. has_more={has_more}")
+async def query_database(database_id, filter_json=None):
+    return await get_notion_client().query_database(str(database_id), filter_json)
 
-    return all_results
 
+def iter_query_database(database_id, filter_json=None) -> AsyncIterator[Dict[str, Any]]:
+    """データベースのページを取得しながら1件ずつ返す（大きなタスクDB向け）"""
+    return get_notion_client().iter_query_database(str(database_id), filter_json)
 
-def get_block_children(block_id):
-    url = f"https://api.notion.com/v1/blocks/{block_id}/children"
-    print_curl_debug("GET", url, headers=HEADERS)
-    res = requests.get(url, headers=HEADERS)
-    res.raise_for_status()
-    data = res.json()
-    print(f"    📡 [DEBUG] Response from Notion: {json.dumps(data, indent=2)}")
-    return res.json()["results"]
 
+async def get_block_children(block_id):
+    return await get_notion_client().get_block_children(str(block_id))
 
-def retrieve_page(page_id):
-    url = f"https://api.notion.com/v1/pages/{page_id}"
-    print_curl_debug("GET", url, headers=HEADERS)
-    res = requests.get(url, headers=HEADERS)
-    res.raise_for_status()
-    return res.json()
 
+def iter_block_children(block_id) -> AsyncIterator[Dict[str, Any]]:
+    """ブロックの子を取得しながら1件ずつ返す"""
+    return get_notion_client().iter_block_children(str(block_id))
 
-def find_toggle_by_text(blocks, keyword):
-    for block in blocks:
-        if block["type"] == "toggle":
-            rich_texts = block.get("toggle", {}).get("rich_text", [])
-            for text in rich_texts:
-                if text.get("type") == "text" and keyword in text["text"]["content"]:
-                    return block
-    return None
 
-def get_database_properties(database_id):
-    url = f"https://api.notion.com/v1/databases/{database_id}"
-    print_curl_debug("GET", url, headers=HEADERS)
-    res = requests.get(url, headers=HEADERS)
-    res.raise_for_status()
-    return res.json()
+async def retrieve_page(page_id):
+    return await get_notion_client().retrieve_page(str(page_id))
+
+
+async def get_database_properties(database_id):
+    return await get_notion_client().retrieve_database(str(database_id))
 
 def find_toggle_by_text(blocks, keyword):
     """
@@ -217,15 +232,15 @@ def find_toggle_by_text(blocks, keyword):
 # =====================================================
 # 研究室のnotion情報を取得
 # =====================================================
-def get_year_database_blocks(laboratory_page_id: str) -> List[Dict[str, Any]]:
+async def get_year_database_blocks(laboratory_page_id: str) -> List[Dict[str, Any]]:
     """研究室ページ配下の年度データベース(child_database)ブロックを取得"""
-    blocks = get_block_children(laboratory_page_id)
+    blocks = await get_block_children(laboratory_page_id)
     return [b for b in blocks if b["type"] == "child_database"]
 
 
-def get_thesis_pages(year_database_id: str) -> List[Dict[str, Any]]:
+async def get_thesis_pages(year_database_id: str) -> List[Dict[str, Any]]:
     """年度データベース内の年度ページ情報を取得"""
-    pages = query_database(year_database_id)
+    pages = await query_database(year_database_id)
     thesis_pages = []
     for p in pages:
         subpage_id = p["id"]
@@ -236,26 +251,27 @@ def get_thesis_pages(year_database_id: str) -> List[Dict[str, Any]]:
         thesis_pages.append({
             "title": title,
             "year": year,
-            "thesis_page_id": subpage_id
+            "thesis_page_id": subpage_id,
+            "last_edited_time": parse_notion_timestamp(p.get("last_edited_time")),
         })
     return thesis_pages
 
 
-def get_student_and_task_page_ids(thesis_page_id: str) -> Dict[str, Optional[str]]:
+async def get_student_and_task_page_ids(thesis_page_id: str) -> Dict[str, Optional[str]]:
     """年度ページ（thesis_page）内の「学生」「卒研作業タスク」DBのIDを取得"""
     student_page_id = None
     task_page_id = None
 
-    sub_blocks = get_block_children(thesis_page_id)
+    sub_blocks = await get_block_children(thesis_page_id)
     toggle = find_toggle_by_text(sub_blocks, "共通データベース")
     if not toggle:
-        print(f"⚠️ 共通データベーストグルが見つかりません ({thesis_page_id})")
+        logger.warning("共通データベーストグルが見つかりません (%s)", thesis_page_id)
         return {
             "student_page_id": None,
             "task_page_id": None
         }
 
-    toggle_children = get_block_children(toggle["id"])
+    toggle_children = await get_block_children(toggle["id"])
     for inner_block in toggle_children:
         if inner_block["type"] != "child_database":
             continue
@@ -263,141 +279,384 @@ def get_student_and_task_page_ids(thesis_page_id: str) -> Dict[str, Optional[str
         db_id = inner_block["id"]
         if db_title == "学生":
             student_page_id = db_id
-            print(f"👩‍🎓 学生DB ID: {db_id}")
+            logger.debug("学生DB ID: %s", db_id)
         elif db_title == "卒研作業タスク":
             task_page_id = db_id
-            print(f"🧩 卒研作業タスクDB ID: {db_id}")
+            logger.debug("卒研作業タスクDB ID: %s", db_id)
 
     return {
         "student_page_id": student_page_id,
         "task_page_id": task_page_id
     }
 
+# =====================================================
+# 研究室ツリーの並列クロール
+# =====================================================
+class CrawlProgress:
+    """reflesh のクロール進捗（研究室ごとの年度ページ数・処理済み数・エラー）"""
+
+    def __init__(self, root_database_id: str):
+        self.root_database_id = root_database_id
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.laboratories: Dict[str, Dict[str, Any]] = {}
+        # Notion API のエラーで取得しきれなかった年度ページ（削除対象から外す）
+        self.unresolved_thesis_page_ids: set = set()
+        # 研究室名を読めなかった研究室ページのID（どの行のものか分からないので、あれば削除しない）
+        self.unreadable_laboratory_page_ids: List[str] = []
+
+    @property
+    def failed_laboratories(self) -> List[str]:
+        return [name for name, lab in self.laboratories.items() if lab["status"] == "failed"]
+
+    def start_laboratory(self, laboratory_name: str) -> Dict[str, Any]:
+        lab = {"status": "running", "thesis_pages": 0, "completed": 0, "unchanged": 0, "errors": []}
+        self.laboratories[laboratory_name] = lab
+        return lab
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "root_database_id": self.root_database_id,
+            "status": "done" if self.finished_at else "running",
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round((self.finished_at or time.time()) - self.started_at, 3),
+            "laboratories": self.laboratories,
+            "unreadable_laboratory_page_ids": self.unreadable_laboratory_page_ids,
+        }
+
+
+_crawl_progress: Optional[CrawlProgress] = None
+
+
+async def crawl_notion_tree(
+    root_database_id: str,
+    progress: CrawlProgress,
+    known: Optional[Dict[str, Dict[str, Any]]] = None,
+    concurrency: int = NOTION_CRAWL_CONCURRENCY,
+) -> List[Dict[str, Any]]:
+    """
+    ルートDB → 研究室 → 年度DB → 年度ページ → 共通データベーストグル を階層ごとに並列にたどり、
+    年度ページごとの学生DB・タスクDBのIDを返す。同時リクエスト数は concurrency で抑える。
+    known（thesis_page_id → 保存済みの行）にあり last_edited_time が変わっていない年度ページは
+    子ブロックをたどらず保存済みのIDを使う。
+    """
+    known = known or {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(func, *args):
+        async with semaphore:
+            return await func(*args)
+
+    async def crawl_thesis_page(lab: Dict[str, Any], laboratory_name: str, page: Dict[str, Any]):
+        saved = known.get(_normalize_page_id(page["thesis_page_id"]))
+        if saved and page["last_edited_time"] and saved["last_edited_time"] == page["last_edited_time"]:
+            lab["unchanged"] += 1
+            lab["completed"] += 1
+            ids = {"student_page_id": saved["student_page_id"], "task_page_id": saved["task_page_id"]}
+        else:
+            try:
+                ids = await limited(get_student_and_task_page_ids, page["thesis_page_id"])
+            except NotionAPIError as e:
+                progress.unresolved_thesis_page_ids.add(uuid.UUID(page["thesis_page_id"]))
+                lab["errors"].append({"thesis_page_id": page["thesis_page_id"], "detail": e.message})
+                return None
+            finally:
+                lab["completed"] += 1
+
+        if not all([page["thesis_page_id"], ids.get("student_page_id"), ids.get("task_page_id")]):
+            logger.warning("データ不備: Thesis/Student/Task UUID が不正です (thesis_page_id=%s)", page.get("thesis_page_id"))
+            lab["errors"].append({"thesis_page_id": page["thesis_page_id"], "detail": "学生DBまたはタスクDBが見つかりません"})
+            return None
+
+        return {
+            "laboratory_name": laboratory_name,
+            "title": page.get("title", "No Title"),
+            "year": page.get("year"),
+            "thesis_page_id": page["thesis_page_id"],
+            "student_page_id": ids["student_page_id"],
+            "task_page_id": ids["task_page_id"],
+            "last_edited_time": page["last_edited_time"],
+        }
+
+    async def crawl_laboratory(lab_page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        title_prop = lab_page["properties"].get("名前", {}).get("title") or []
+        laboratory_name = title_prop[0]["text"]["content"] if title_prop else "Unknown"
+        if laboratory_name == "Unknown":
+            logger.warning("研究室名が取得できませんでした (id=%s)", lab_page["id"])
+            progress.unreadable_laboratory_page_ids.append(lab_page["id"])
+            return []
+
+        lab = progress.start_laboratory(laboratory_name)
+        try:
+            year_blocks = await limited(get_year_database_blocks, lab_page["id"])
+            page_lists = await asyncio.gather(*(limited(get_thesis_pages, block["id"]) for block in year_blocks))
+            thesis_pages = [page for pages in page_lists for page in pages]
+            lab["thesis_pages"] = len(thesis_pages)
+
+            entries = await asyncio.gather(
+                *(crawl_thesis_page(lab, laboratory_name, page) for page in thesis_pages)
+            )
+        except NotionAPIError as e:
+            logger.warning("研究室 %s の取得に失敗しました: %s", laboratory_name, e.message)
+            lab["status"] = "failed"
+            lab["errors"].append({"detail": e.message})
+            return []
+
+        lab["status"] = "done"
+        logger.info(
+            "研究室名: %s (%d/%d, 変更なし %d)", laboratory_name, lab["completed"], lab["thesis_pages"], lab["unchanged"]
+        )
+        return [entry for entry in entries if entry]
+
+    laboratory_pages = await limited(query_database, root_database_id)
+    results = await asyncio.gather(*(crawl_laboratory(lab_page) for lab_page in laboratory_pages))
+    return [entry for entries in results for entry in entries]
+
+
+async def fetch_student_directory(student_page_id: str) -> Tuple[List[Dict[str, Any]], StudentNameResolver]:
+    """
+    学生DBを1回だけクエリし、学生情報（学生番号順、「共通」ページは除外）と
+    タスクのリレーション解決用の StudentNameResolver を返す
+    """
+    student_pages = await query_database(student_page_id)
+    students = []
+    for student_page in student_pages:
+        student_data = extract_student_page_data(student_page)
+        if student_data.get("student_name") == "共通":
+            continue
+        students.append(student_data)
+
+    students_sorted = sorted(students, key=lambda x: x['student_number'])
+    return students_sorted, StudentNameResolver.from_pages(student_pages)
+
+
+async def fetch_students(student_page_id: str) -> List[Dict[str, Any]]:
+    """学生DBから学生情報を取得し、学生番号順に並べて返す（「共通」ページは除外）"""
+    students, _ = await fetch_student_directory(student_page_id)
+    return students
+
+
+async def fetch_tasks_by_student(
+    task_page_id,
+    student_name: Optional[str] = None,
+    resolver: Optional[StudentNameResolver] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    タスクDBから作業記録を取得し、学生ごとにまとめて作業時間の合計を付与する。
+    resolver を渡さない場合も、同じ学生ページは1回しか取得しない。
+    student_name の学生ページIDが resolver で分かれば、Notion 側のリレーションフィルターで
+    その学生のタスクだけを取得する。
+    """
+    student_tasks: Dict[str, List[Dict[str, Any]]] = {}
+    resolver = resolver or StudentNameResolver()
+
+    filter_json = None
+    if student_name:
+        student_page_ids = resolver.page_ids_for(student_name)
+        if student_page_ids:
+            filter_json = student_relation_filter(student_page_ids)
+
+    # タスクページは1ページ分ずつ取得しながら処理し、全件のレスポンスを溜め込まない
+    async for task_page in iter_query_database(task_page_id, filter_json):
+        task_data = await extract_task_page_data(task_page, resolver)
+
+        # student_nameが指定されている場合、フィルタリング
+        if student_name and task_data["student_name"] != student_name:
+            continue
+
+        # 学生ごとにタスク情報をまとめる
+        student_tasks.setdefault(task_data["student_name"], []).append(task_data)
+
+    # 学生ごとに作業時間合計を計算（作業時間が未計算（None / "Unknown"）のタスクは数えない）
+    for tasks in student_tasks.values():
+        total_working_time = sum(
+            task["working_time"] for task in tasks if isinstance(task["working_time"], (int, float))
+        )
+        for task in tasks:
+            task["total_working_time"] = total_working_time
+
+    return student_tasks
+
+
 # =====================================================
 # APIエンドポイント
 # =====================================================
 
+async def upsert_rows(db: AsyncSession, model, rows: List[Dict[str, Any]], key: str = "notion_page_id") -> None:
+    """rows を UPSERT_CHUNK_SIZE 件ずつ、key 列の衝突時は更新する upsert で書き込む"""
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+        stmt = pg_insert(model).values(chunk)
+        columns = [column for column in chunk[0] if column != key]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[getattr(model, key)],
+            set_={column: stmt.excluded[column] for column in columns},
+        )
+        await db.execute(stmt)
+
+
+async def _load_known_thesis_pages(db: AsyncSession) -> Dict[str, Dict[str, Any]]:
+    result = await db.execute(
+        select(Notion.thesis_page_id, Notion.student_page_id, Notion.task_page_id, Notion.last_edited_time)
+        .where(Notion.thesis_page_id.is_not(None))
+    )
+    return {
+        _normalize_page_id(row.thesis_page_id): {
+            "student_page_id": str(row.student_page_id),
+            "task_page_id": str(row.task_page_id),
+            "last_edited_time": row.last_edited_time,
+        }
+        for row in result.all()
+    }
+
+
+async def save_notion_entries(db: AsyncSession, entries: List[Dict[str, Any]], progress: CrawlProgress) -> int:
+    """
+    クロール結果を thesis_page_id をキーに一括 upsert し、Notion 側で消えた年度ページの行を削除する。
+    取得に失敗した研究室・年度ページの行は残す。削除した行数を返す。
+    研究室が1つも取れなかったとき（ルートDBが空・権限を失ったなど）や名前を読めない研究室があったときは、
+    消えたページを判断できないので削除しない。
+    """
+    synced_at = datetime.now(timezone.utc)
+    rows = [
+        {
+            "laboratory_name": entry["laboratory_name"],
+            "title": entry["title"],
+            "year": entry["year"],
+            "thesis_page_id": uuid.UUID(entry["thesis_page_id"]),
+            "student_page_id": uuid.UUID(entry["student_page_id"]),
+            "task_page_id": uuid.UUID(entry["task_page_id"]),
+            "last_edited_time": entry["last_edited_time"],
+            "synced_at": synced_at,
+        }
+        for entry in entries
+    ]
+    await upsert_rows(db, Notion, rows, key="thesis_page_id")
+
+    if not progress.laboratories or progress.unreadable_laboratory_page_ids:
+        logger.warning(
+            "研究室の一覧を確認できなかったため、年度ページの削除をスキップします (研究室 %d 件, 名前を読めない研究室 %d 件)",
+            len(progress.laboratories),
+            len(progress.unreadable_laboratory_page_ids),
+        )
+        return 0
+
+    keep = [row["thesis_page_id"] for row in rows] + list(progress.unresolved_thesis_page_ids)
+    stale = delete(Notion).where(
+        or_(Notion.thesis_page_id.is_(None), Notion.thesis_page_id.not_in(keep))
+    )
+    if progress.failed_laboratories:
+        stale = stale.where(Notion.laboratory_name.not_in(progress.failed_laboratories))
+    result = await db.execute(stale)
+    return result.rowcount or 0
+
+
 @notion_router.post("/laboratories/reflesh")
 async def update_laboratory_notion_data(
     root_database_id: str = Query(..., description="NotionのルートデータベースID"),
+    full: bool = Query(False, description="最終編集時刻が変わっていない年度ページも子ブロックまでたどり直す"),
     db: AsyncSession = Depends(get_db_session),
 ):
-    """Notionの最新研究室データをDBに保存するEP"""
-    laboratory_database = query_database(root_database_id)
+    """Notionの最新研究室データをDBに保存するEP（何度呼んでも重複しない）"""
+    global _crawl_progress
+    logger.info("Root Database: %s", root_database_id)
 
-    print(f"🟦 Root Database: {root_database_id}")
+    known = {} if full else await _load_known_thesis_pages(db)
+    progress = CrawlProgress(root_database_id)
+    _crawl_progress = progress
+    try:
+        entries = await crawl_notion_tree(root_database_id, progress, known)
+    finally:
+        progress.finished_at = time.time()
 
-    for lab_page in laboratory_database:
-        try:
-            # 研究室名を取得
-            title_prop = lab_page["properties"]["名前"]["title"]
-            laboratory_name = title_prop[0]["text"]["content"] if title_prop else "Unknown"
-            lab_page_id = lab_page["id"]
-            
-            if laboratory_name == "Unknown":
-                 print(f"⚠️ 研究室名が取得できませんでした (id={lab_page_id})")
-                 continue
-
-            print(f"研究室名: {laboratory_name}")
-
-            # 年度データベース(child_database)を取得
-            for year_block in get_year_database_blocks(lab_page_id):
-                year_database_id = year_block["id"]
-                print(f"  📘 年度DB ID: {year_database_id}")
-
-                # 年度ページ(卒研テーマページ)を取得
-                thesis_pages = get_thesis_pages(year_database_id)
-                for page in thesis_pages:
-                    # page から直接 title と year を取得
-                    title = page.get("title", "No Title")
-                    year = page.get("year", None)
-
-                    # 学生DBとタスクDBのIDを取得
-                    ids = get_student_and_task_page_ids(page["thesis_page_id"])
-
-                    # UUID チェック
-                    print(f"UUID チェック")
-                    if not all([page["thesis_page_id"], ids.get("student_page_id"), ids.get("task_page_id")]):
-                        raise ValueError(
-                            f"Thesis/Student/Task UUID が不正です (thesis_page_id={page.get('thesis_page_id')})"
-                        )
-
-                    # DBに保存
-                    notion_entry = Notion(
-                        laboratory_name=laboratory_name,
-                        title=title,
-                        year=year,
-                        thesis_page_id=uuid.UUID(page["thesis_page_id"]),
-                        student_page_id=uuid.UUID(ids["student_page_id"]),
-                        task_page_id=uuid.UUID(ids["task_page_id"]),
-                    )
-                    db.add(notion_entry)
-
-        except Exception as e:
-            # データ不備や KeyError はここでログ出力
-            print(f"⚠️ データ不備: {e}")
-            continue
+    # DBに保存
+    deleted = await save_notion_entries(db, entries, progress)
 
     # コミット
     await db.commit()
-    return {"message": "NotionデータをDBに保存しました"}
+    notion_index_cache.bump()
+    return {
+        "message": "NotionデータをDBに保存しました",
+        "count": len(entries),
+        "deleted": deleted,
+        "elapsed_seconds": progress.to_dict()["elapsed_seconds"],
+        "laboratories": progress.laboratories,
+    }
+
+
+@notion_router.get("/laboratories/reflesh/progress")
+async def get_laboratory_refresh_progress():
+    """実行中（または直近）の reflesh のクロール進捗を研究室ごとに返す"""
+    if _crawl_progress is None:
+        raise HTTPException(status_code=404, detail="クロールはまだ実行されていません")
+    return _crawl_progress.to_dict()
 
 
 @notion_router.get("/laboratories")
 async def get_laboratory_notion_data(
+    request: Request,
     root_database_id: str = Query(None, description="NotionのルートデータベースID"),
+    year: int | None = Query(None, description="年度でフィルター"),
     db: AsyncSession = Depends(get_db_session),
 ):
-    """DBに保存されたNotionデータを返す。なければNotion APIから取得。保存も行う"""
     """
-    指定された root_database_id から:
+    DBに保存された root_database_id 配下のNotionデータから:
       ・研究室名
-      ・年度データベースID
       ・各年度ページの情報（タイトル・年度・ID）
       ・各年度ページに紐づく「学生」DBと「卒研作業タスク」DBのID
-    を返すAPI
+    を研究室ごとにまとめて返すAPI（研究室名順、年度ページは新しい年度から）。
+    まとめる処理は Postgres の json_agg で行い、ORM オブジェクトは作らない。
+    まだ1件もなく root_database_id が指定されていれば、同期をバックグラウンドで開始して 404 を返す
+    （リクエスト内ではクロールしない）。
+    応答はキャッシュし、ETag が一致すれば 304 を返す。
     """
-    result = []
-
-    notion_entries = await db.execute(select(Notion))
-    notion_entries = notion_entries.scalars().all()
-
-    # root_database_id が指定されていない場合は最新情報取得をスキップ
-    if not notion_entries and root_database_id:
-        # データがなければNotion APIから取得してDBに保存
-        await update_laboratory_notion_data(root_database_id=root_database_id, db=db)
-        notion_entries = await db.execute(select(Notion))
-        notion_entries = notion_entries.scalars().all()
-
-    # データがない場合は 404
-    if not notion_entries:
-        raise HTTPException(status_code=404, detail="Notionデータが存在しません")
-
-    
-    lab_dict = {}
-    for entry in notion_entries:
-        lab_name = entry.laboratory_name or "不明"
-        if lab_name not in lab_dict:
-            lab_dict[lab_name] = []
-        lab_dict[lab_name].append({
-            "title": entry.title,
-            "year": entry.year,
-            "thesis_page_id": str(entry.thesis_page_id),
-            "student_page_id": str(entry.student_page_id),
-            "task_page_id": str(entry.task_page_id)
-        })
-
-    for lab_name, thesis_pages in lab_dict.items():
-        result.append({
-            "laboratory_name": lab_name,
-            "thesis_pages": thesis_pages
-        })
-
-    return {"count": len(result), "laboratories": result}
+    async def build():
+        # 名前のない研究室は '不明' にまとめる（SELECT と GROUP BY で同じ式になるようリテラルは埋め込む）
+        lab_name = func.coalesce(Notion.laboratory_name, literal_column("'不明'"))
+        thesis_page = func.json_build_object(
+            "title", Notion.title,
+            "year", Notion.year,
+            "thesis_page_id", Notion.thesis_page_id,
+            "student_page_id", Notion.student_page_id,
+            "task_page_id", Notion.task_page_id,
+        )
+        query = (
+            select(
+                lab_name.label("laboratory_name"),
+                func.json_agg(
+                    aggregate_order_by(thesis_page, Notion.year.desc().nulls_last(), Notion.title), type_=JSON
+                ).label("thesis_pages"),
+            )
+            .group_by(lab_name)
+            .order_by(lab_name)
+        )
+        if year is not None:
+            query = query.where(Notion.year == year)
+        rows = (await db.execute(query)).tuples().all()
+
+        if not rows:
+            if year is not None and await db.scalar(select(Notion.id).limit(1)) is not None:
+                raise HTTPException(status_code=404, detail="該当する研究室データが存在しません")
+            # データがない場合は 404（root_database_id があれば同期ワーカーに取得を任せる）
+            if root_database_id:
+                from notion_worker import trigger_sync
+                trigger_sync(root_database_id, trigger="initial")
+                raise HTTPException(status_code=404, detail="Notionデータが存在しません。同期を開始したので、しばらくしてから再度取得してください")
+            raise HTTPException(status_code=404, detail="Notionデータが存在しません")
+
+        result = [
+            {"laboratory_name": laboratory_name, "thesis_pages": thesis_pages}
+            for laboratory_name, thesis_pages in rows
+        ]
+        return {"count": len(result), "laboratories": result}
+
+    return await notion_index_cache.respond(request, build)
 
 
 @notion_router.get("/laboratory_name")
 async def get_laboratory_name(
+    request: Request,
     year: int | None = Query(None, description="年度でフィルター"),
     db: AsyncSession = Depends(get_db_session),
 ):
@@ -405,130 +664,50 @@ async def get_laboratory_name(
     研究室名を重複なしで取得する。
     year が指定されていればその年度の研究室のみ返す。
     """
-    query = select(distinct(Notion.laboratory_name))
-    if year is not None:
-        query = query.where(Notion.year == year)
+    async def build():
+        query = select(distinct(Notion.laboratory_name))
+        if year is not None:
+            query = query.where(Notion.year == year)
+
+        result = await db.execute(query)
+        laboratories = result.scalars().all()
 
-    result = await db.execute(query)
-    laboratories = result.scalars().all()
+        if not laboratories:
+            raise HTTPException(status_code=404, detail="該当する研究室データが存在しません")
 
-    if not laboratories:
-        raise HTTPException(status_code=404, detail="該当する研究室データが存在しません")
+        return {"count": len(laboratories), "laboratories": laboratories}
 
-    return {"count": len(laboratories), "laboratories": laboratories}
+    return await notion_index_cache.respond(request, build)
 
 
 @notion_router.get("/years")
 async def get_available_years(
+    request: Request,
     db: AsyncSession = Depends(get_db_session),
 ):
     """
     DBに保存されているデータの年度一覧を重複なしで取得する
     """
-    query = select(distinct(Notion.year)).order_by(Notion.year.desc())
-    result = await db.execute(query)
-    years = result.scalars().all()
-    
-    # Noneを除外してリスト化
-    valid_years = [y for y in years if y is not None]
-
-    if not valid_years:
-        # データがない場合はデフォルトで今年と来年を返すなどのフォールバックがあってもいいが
-        # ここでは空リストを返してフロントエンドで対処するか、404にするか。
-        # 一旦リストを返す。
-        return {"years": []}
-
-    return {"years": valid_years}
-
-
-@notion_router.get("/laboratory_students")
-async def get_students_by_lab_and_year(
-    laboratory_name: str = Query(..., description="研究室名"),
-    year: int = Query(..., description="年度"),
-    db: AsyncSession = Depends(get_db_session),
-):
-    """
-    年度と研究室名から student_page_id を取得し、そのDBの学生情報を返す
-    """
-    # DBから該当する student_page_id を取得
-    query = select(Notion.student_page_id).where(
-        Notion.laboratory_name == laboratory_name,
-        Notion.year == year
-    )
-    result = await db.execute(query)
-    student_page_id = result.scalar()
-
-    if not student_page_id:
-        raise HTTPException(status_code=404, detail="指定された研究室・年度の学生データが存在しません")
-
-    # student_page_id を使って Notion データ取得
-    student_pages = query_database(str(student_page_id))
-    students = []
-    for student_page in student_pages:
-        student_data = extract_student_page_data(student_page)
-        if student_data.get("student_name") == "共通":
-            continue
-        students.append(student_data)
-
-    students_sorted = sorted(students, key=lambda x: x['student_number'])
-
-    return {"students": students_sorted}
+    async def build():
+        query = select(distinct(Notion.year)).order_by(Notion.year.desc())
+        result = await db.execute(query)
+        years = result.scalars().all()
 
+        # Noneを除外してリスト化
+        valid_years = [y for y in years if y is not None]
 
+        if not valid_years:
+            # データがない場合はデフォルトで今年と来年を返すなどのフォールバックがあってもいいが
+            # ここでは空リストを返してフロントエンドで対処するか、404にするか。
+            # 一旦リストを返す。
+            return {"years": []}
 
+        return {"years": valid_years}
 
-@notion_router.get("/laboratory_tasks")
-async def get_tasks_by_lab_and_year(
-    laboratory_name: str = Query(..., description="研究室名"),
-    year: int = Query(..., description="年度"),
-    student_name: str = Query(None, description="学生名（任意）"),
-    db: AsyncSession = Depends(get_db_session),
-):
-    """
-    年度と研究室名から task_page_id を取得し、そのDBのコンタクトタイム情報を返す
-    """
-    # DBから該当する task_page_id を取得
-    query = select(Notion.task_page_id).where(
-        Notion.laboratory_name == laboratory_name,
-        Notion.year == year
-    )
-    result = await db.execute(query)
-    task_page_id = result.scalar()
+    return await notion_index_cache.respond(request, build)
 
-    task_pages = query_database(task_page_id)
-    student_tasks = {}
-
-    for task_page in task_pages:
-        task_data = extract_task_page_data(task_page)
-
-        # student_nameが指定されている場合、フィルタリング
-        if student_name and task_data["student_name"] != student_name:
-            continue
-        
-        # 学生ごとにタスク情報をまとめる
-        student_tasks.setdefault(task_data["student_name"], []).append(task_data)
-
-    # student_nameが指定されている場合、その学生のタスクだけ返す
-    if student_name:
-        # 指定された学生のタスク情報を返す
-        student_info = student_tasks.get(student_name, [])
-        # 学生ごとの作業時間合計を計算
-        total_working_time = sum(task["working_time"] for task in student_info)
-        for task in student_info:
-            task["total_working_time"] = total_working_time
-        
-        return {student_name: student_info}
-    
-    # student_nameが指定されていない場合、全学生のタスク情報をまとめて返す
-    else:
-        # 学生ごとに作業時間合計を計算
-        for student_name, tasks in student_tasks.items():
-            total_working_time = sum(task["working_time"] for task in tasks)
-            for task in tasks:
-                task["total_working_time"] = total_working_time
-        
-        return student_tasks
 
+# /laboratory_students と /laboratory_tasks はミラーから応答する notion_sync.notion_sync_router にある
 
 
 """
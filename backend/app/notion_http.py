@@ -0,0 +1,443 @@
+# notion_http.py
+"""Notion API 用の非同期HTTPクライアント
+
+httpx.AsyncClient を1つだけ作ってプロセス全体で使い回し、Keep-Alive の接続プールと
+タイムアウトを共通化する。ページネーションのあるエンドポイントは iter_results で1件ずつ
+（ページ単位で取得しながら）流すか、paginate で全件をリストにして取得する。
+Notion のレート制限（1インテグレーションあたり平均3リクエスト/秒）に合わせて全リクエストを
+トークンバケットに通し、429 / 5xx は Retry-After を尊重しつつ指数バックオフで再試行する。
+再試行しても失敗する呼び出しが続いたらサーキットブレーカーを開き、クールダウンの間は
+Notion を呼ばずにすぐ失敗させる（クールダウン後に1件だけ試して回復を確かめる）。
+
+ログは "notion" ロガーに出す（トークンやヘッダーは出さない）:
+  NOTION_LOG_LEVEL        ロガーのレベル（既定 INFO）
+  NOTION_LOG_SAMPLE_RATE  成功した呼び出しを INFO で記録する割合（既定 0.05）。
+                          遅い呼び出し・再試行・失敗は常に WARNING で記録する
+  NOTION_LOG_SLOW_SECONDS これ以上かかった呼び出しを遅いとみなす（既定 2 秒）
+  NOTION_LOG_PAYLOADS     1 のとき、リクエストとレスポンスの本文を DEBUG で記録する（既定 0）
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from metrics import counter, histogram
+
+
+NOTION_API_BASE_URL = os.getenv("NOTION_API_BASE_URL", "https://api.notion.com/v1").rstrip("/")
+NOTION_VERSION = "2022-06-28"
+NOTION_TIMEOUT_SECONDS = float(os.getenv("NOTION_TIMEOUT_SECONDS", "30"))
+NOTION_CONNECT_TIMEOUT_SECONDS = float(os.getenv("NOTION_CONNECT_TIMEOUT_SECONDS", "10"))
+NOTION_MAX_CONNECTIONS = int(os.getenv("NOTION_MAX_CONNECTIONS", "10"))
+NOTION_PAGE_SIZE = 100
+NOTION_RATE_LIMIT_PER_SECOND = float(os.getenv("NOTION_RATE_LIMIT_PER_SECOND", "3"))
+NOTION_RATE_LIMIT_BURST = int(os.getenv("NOTION_RATE_LIMIT_BURST", "3"))
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "5"))
+NOTION_RETRY_BASE_SECONDS = float(os.getenv("NOTION_RETRY_BASE_SECONDS", "0.5"))
+NOTION_RETRY_MAX_SECONDS = float(os.getenv("NOTION_RETRY_MAX_SECONDS", "30"))
+NOTION_LOG_LEVEL = os.getenv("NOTION_LOG_LEVEL", "INFO").upper()
+NOTION_LOG_SAMPLE_RATE = float(os.getenv("NOTION_LOG_SAMPLE_RATE", "0.05"))
+NOTION_LOG_SLOW_SECONDS = float(os.getenv("NOTION_LOG_SLOW_SECONDS", "2"))
+NOTION_LOG_PAYLOADS = os.getenv("NOTION_LOG_PAYLOADS", "0") == "1"
+NOTION_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("NOTION_CIRCUIT_FAILURE_THRESHOLD", "5"))
+NOTION_CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("NOTION_CIRCUIT_COOLDOWN_SECONDS", "30"))
+# ペイロードを記録するときの最大文字数
+NOTION_LOG_PAYLOAD_LIMIT = 2000
+
+# 再試行する HTTP ステータス（レート制限と一時的なサーバーエラー）
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger("notion")
+logger.setLevel(NOTION_LOG_LEVEL)
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+notion_request_seconds = histogram(
+    "notion_request_seconds",
+    "Notion API 1回の呼び出しにかかった時間（秒、再試行は別々に数える）",
+    [0.1, 0.25, 0.5, 1, 2, 5, 10, 30],
+)
+notion_throttled_total = counter(
+    "notion_requests_throttled_total", "Notion API から 429 (rate_limited) が返った回数"
+)
+notion_retried_total = counter(
+    "notion_requests_retried_total", "Notion API 呼び出しを再試行した回数（reason は status またはエラー種別）"
+)
+notion_circuit_rejected_total = counter(
+    "notion_circuit_rejected_total", "サーキットブレーカーが開いていて Notion を呼ばずに失敗させた回数"
+)
+notion_circuit_opened_total = counter(
+    "notion_circuit_opened_total", "サーキットブレーカーが開いた回数"
+)
+
+
+class NotionAPIError(Exception):
+    """Notion API の呼び出し失敗（HTTPエラー・タイムアウト・接続エラー）"""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        timed_out: bool = False,
+        circuit_open: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.timed_out = timed_out
+        self.circuit_open = circuit_open
+        self.retry_after = retry_after
+
+    @property
+    def unavailable(self) -> bool:
+        """Notion 側の障害（タイムアウト・接続失敗・429・5xx・ブレーカー開）によるエラーか"""
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+def _truncate_payload(payload: Any) -> str:
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+    if len(text) > NOTION_LOG_PAYLOAD_LIMIT:
+        return f"{text[:NOTION_LOG_PAYLOAD_LIMIT]}...({len(text)} chars)"
+    return text
+
+
+def _log_call(method: str, path: str, status: Any, elapsed: float, attempt: int) -> None:
+    """1回の呼び出しの結果を記録する（成功して速いものはサンプリングする）"""
+    message = "%s %s -> %s in %.0f ms (attempt %d)"
+    args = (method, path, status, elapsed * 1000, attempt + 1)
+    if not isinstance(status, int) or status >= 400 or elapsed >= NOTION_LOG_SLOW_SECONDS:
+        logger.warning(message, *args)
+    elif logger.isEnabledFor(logging.DEBUG) or random.random() < NOTION_LOG_SAMPLE_RATE:
+        logger.info(message, *args)
+
+
+class TokenBucket:
+    """rate 個/秒で補充され、最大 capacity 個まで貯まるトークンバケット（全コルーチンで共有する）"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # ロックを持ったまま待つので、待っているリクエストは到着順に1つずつ通る
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """429 を受けたときに、全リクエストを seconds 秒止めてトークンも空にする"""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = max(self._updated, self._blocked_until)
+
+
+def _retry_after_seconds(res: httpx.Response) -> Optional[float]:
+    """Retry-After ヘッダー（秒数または HTTP 日付）を秒に変換する"""
+    value = res.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _backoff_seconds(attempt: int) -> float:
+    """指数バックオフ（full jitter）"""
+    return random.uniform(0, min(NOTION_RETRY_MAX_SECONDS, NOTION_RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    連続 failure_threshold 回の失敗で開き、cooldown 秒の間は呼び出しを拒否する。
+    cooldown を過ぎたら1件だけ通し（half-open）、成功すれば閉じ、失敗すればまた開く。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def before_call(self) -> None:
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                notion_circuit_rejected_total.inc()
+                raise NotionAPIError(
+                    "Notion API is unavailable (circuit open)",
+                    circuit_open=True,
+                    retry_after=self.retry_after(),
+                )
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                notion_circuit_rejected_total.inc()
+                raise NotionAPIError(
+                    "Notion API is recovering (circuit half-open)",
+                    circuit_open=True,
+                    retry_after=1.0,
+                )
+            self._probing = True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.warning("Notion circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                notion_circuit_opened_total.inc()
+                logger.warning("Notion circuit opened after %d failures (cooldown %.0fs)", self.failures, self.cooldown)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """結果が分からないまま呼び出しが中断されたとき（キャンセルなど）"""
+        self._probing = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_after_seconds": round(self.retry_after(), 1) if self.state == self.OPEN else 0,
+        }
+
+
+class NotionClient:
+    """接続プールを持つ Notion API クライアント"""
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        base_url: str = NOTION_API_BASE_URL,
+        timeout: float = NOTION_TIMEOUT_SECONDS,
+        max_connections: int = NOTION_MAX_CONNECTIONS,
+        max_retries: int = NOTION_MAX_RETRIES,
+        limiter: Optional[TokenBucket] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.limiter = limiter or TokenBucket(NOTION_RATE_LIMIT_PER_SECOND, NOTION_RATE_LIMIT_BURST)
+        self.breaker = breaker or CircuitBreaker(NOTION_CIRCUIT_FAILURE_THRESHOLD, NOTION_CIRCUIT_COOLDOWN_SECONDS)
+        self.headers = {
+            "Authorization": f"Bearer {token if token is not None else os.getenv('NOTION_TOKEN')}",
+            "Notion-Version": NOTION_VERSION,
+            "Content-Type": "application/json",
+        }
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=self.headers,
+            timeout=httpx.Timeout(timeout, connect=NOTION_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=30,
+            ),
+        )
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        json_payload: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        self.breaker.before_call()
+        try:
+            data = await self._send(method, path, json_payload, params)
+        except NotionAPIError as e:
+            # 404 や 400 は Notion 自体は応答しているので失敗に数えない
+            if e.unavailable:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return data
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        json_payload: Optional[Dict[str, Any]],
+        params: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """レート制限と再試行つきで1つのリクエストを送る"""
+        if NOTION_LOG_PAYLOADS and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s %s request: params=%s body=%s", method, path, params, _truncate_payload(json_payload))
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            can_retry = attempt < self.max_retries
+            started = time.perf_counter()
+            try:
+                res = await self._client.request(method, path, json=json_payload, params=params)
+            except httpx.TimeoutException as e:
+                _log_call(method, path, "timeout", time.perf_counter() - started, attempt)
+                if not can_retry:
+                    raise NotionAPIError(f"Notion API timed out: {method} {path}", timed_out=True) from e
+                reason, delay = "timeout", _backoff_seconds(attempt)
+            except httpx.TransportError as e:
+                _log_call(method, path, type(e).__name__, time.perf_counter() - started, attempt)
+                if not can_retry:
+                    raise NotionAPIError(f"Notion API request failed: {method} {path}: {e}") from e
+                reason, delay = "connection", _backoff_seconds(attempt)
+            except httpx.HTTPError as e:
+                raise NotionAPIError(f"Notion API request failed: {method} {path}: {e}") from e
+            else:
+                elapsed = time.perf_counter() - started
+                notion_request_seconds.observe(elapsed, method=method, status=str(res.status_code))
+                _log_call(method, path, res.status_code, elapsed, attempt)
+                if NOTION_LOG_PAYLOADS and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("%s %s response: %s", method, path, _truncate_payload(res.text))
+                if res.status_code == 429:
+                    notion_throttled_total.inc()
+                if not res.is_error:
+                    return res.json()
+                if res.status_code not in RETRY_STATUS_CODES or not can_retry:
+                    raise NotionAPIError(
+                        f"Notion API returned {res.status_code}: {method} {path}: {res.text[:500]}",
+                        status_code=res.status_code,
+                    )
+                reason = str(res.status_code)
+                retry_after = _retry_after_seconds(res)
+                delay = retry_after if retry_after is not None else _backoff_seconds(attempt)
+                if res.status_code == 429:
+                    # 他のリクエストも同じだけ待たせる
+                    self.limiter.pause(delay)
+
+            notion_retried_total.inc(reason=reason)
+            logger.warning("%s %s: retry %d/%d (%s) in %.2fs", method, path, attempt + 1, self.max_retries, reason, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def iter_results(
+        self,
+        method: str,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """has_more / next_cursor をたどりながら results を1件ずつ返す（保持するのは1ページ分だけ）"""
+        next_cursor = None
+
+        while True:
+            # POST はボディ、GET はクエリパラメータでカーソルを渡す
+            body = dict(payload or {})
+            body.setdefault("page_size", NOTION_PAGE_SIZE)
+            if next_cursor:
+                body["start_cursor"] = next_cursor
+            if method == "GET":
+                data = await self.request(method, path, params=body or None)
+            else:
+                data = await self.request(method, path, body)
+
+            results = data.get("results", [])
+            logger.debug("%s %s: fetched %d items, has_more=%s", method, path, len(results), data.get("has_more", False))
+            for result in results:
+                yield result
+
+            if not data.get("has_more") or not data.get("next_cursor"):
+                break
+            next_cursor = data.get("next_cursor")
+
+    async def paginate(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """has_more / next_cursor をたどって results を全件取得する"""
+        return [result async for result in self.iter_results(method, path, payload)]
+
+    def iter_query_database(
+        self,
+        database_id: str,
+        filter_json: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        payload: Dict[str, Any] = {}
+        if filter_json:
+            payload["filter"] = filter_json
+        return self.iter_results("POST", f"/databases/{database_id}/query", payload)
+
+    async def query_database(self, database_id: str, filter_json: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return [page async for page in self.iter_query_database(database_id, filter_json)]
+
+    def iter_block_children(self, block_id: str) -> AsyncIterator[Dict[str, Any]]:
+        return self.iter_results("GET", f"/blocks/{block_id}/children")
+
+    async def get_block_children(self, block_id: str) -> List[Dict[str, Any]]:
+        """ブロックの子を全件取得する（100件を超える場合も next_cursor をたどる）"""
+        return [block async for block in self.iter_block_children(block_id)]
+
+    async def retrieve_page(self, page_id: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/pages/{page_id}")
+
+    async def retrieve_database(self, database_id: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/databases/{database_id}")
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_client: Optional[NotionClient] = None
+
+
+def get_notion_client() -> NotionClient:
+    """プロセス共通のクライアントを返す（初回呼び出し時に作成）"""
+    global _client
+    if _client is None:
+        _client = NotionClient()
+    return _client
+
+
+async def close_notion_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
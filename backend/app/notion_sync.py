@@ -0,0 +1,504 @@
+# notion_sync.py
+"""Notion の学生DB・卒研作業タスクDBを Postgres にミラーする同期エンジン
+
+初回（または full=True）は全件を取得して upsert し、Notion 側で消えたページを削除する。
+2回目以降は前回までに見た最大の last_edited_time 以降に編集されたページだけを
+Notion 側でフィルターして取得する。読み出し用のAPIはこのミラーから応答し、
+最終同期時刻を鮮度として返す。
+
+読み出し時にミラーが NOTION_MIRROR_TTL_SECONDS より古ければ、古いデータをそのまま返しつつ
+バックグラウンドで差分同期する（stale-while-revalidate）。Notion に接続できないときも
+同期済みのデータがあればそれを返す。
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import JSON, cast, delete, func, literal_column, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, get_db_session
+from models.notion import ContactTime, Notion, NotionSyncState, Student
+from notion_api import (
+    JST,
+    UPSERT_CHUNK_SIZE,
+    StudentNameResolver,
+    _normalize_page_id,
+    extract_student_page_data,
+    extract_task_page_data,
+    iter_query_database,
+    parse_notion_timestamp,
+    query_database,
+    upsert_rows,
+)
+from notion_http import CircuitBreaker, NotionAPIError, get_notion_client
+from singleflight import SingleFlight
+
+
+notion_sync_router = APIRouter(tags=["notion-sync"])
+
+# これより古いミラーは読み出し時にバックグラウンドで同期し直す
+NOTION_MIRROR_TTL_SECONDS = float(os.getenv("NOTION_MIRROR_TTL_SECONDS", "300"))
+
+SYNC_STUDENTS = "students"
+SYNC_TASKS = "tasks"
+
+# 学生DBにある全体用のページ（学生一覧には出さない）
+COMMON_STUDENT_NAME = "共通"
+
+
+# =====================================================
+# 値の変換
+# =====================================================
+def _number(value: Any) -> Optional[int]:
+    """Notion の数値プロパティ（未入力は "Unknown"）を整数にする"""
+    return round(value) if isinstance(value, (int, float)) else None
+
+
+def _unknown(value: Any) -> Any:
+    return "Unknown" if value is None else value
+
+
+def _relation_page_id(page: Dict[str, Any], property_name: str = "名前") -> Optional[uuid.UUID]:
+    prop = page["properties"].get(property_name) or {}
+    if prop.get("type") != "relation" or not prop.get("relation"):
+        return None
+    return uuid.UUID(prop["relation"][0]["id"])
+
+
+def _edited_since(cursor: Optional[datetime]) -> Optional[Dict[str, Any]]:
+    # last_edited_time は分単位で丸められるので on_or_after で取り、upsert で重複を吸収する
+    if cursor is None:
+        return None
+    return {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": cursor.isoformat()}}
+
+
+# =====================================================
+# 同期
+# =====================================================
+async def get_notion_entry(db: AsyncSession, laboratory_name: str, year: int) -> Notion:
+    """研究室名と年度に対応する Notion の学生DB・タスクDBの情報を取得する"""
+    result = await db.execute(
+        select(Notion).where(Notion.laboratory_name == laboratory_name, Notion.year == year)
+    )
+    entry = result.scalars().first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="指定された研究室・年度のNotionデータが存在しません")
+    return entry
+
+
+async def get_sync_state(db: AsyncSession, laboratory_name: str, year: int, kind: str) -> Optional[NotionSyncState]:
+    result = await db.execute(
+        select(NotionSyncState).where(
+            NotionSyncState.laboratory_name == laboratory_name,
+            NotionSyncState.year == year,
+            NotionSyncState.kind == kind,
+        )
+    )
+    return result.scalars().first()
+
+
+async def _save_sync_state(
+    db: AsyncSession,
+    entry: Notion,
+    kind: str,
+    cursor: Optional[datetime],
+    synced_at: datetime,
+) -> None:
+    stmt = pg_insert(NotionSyncState).values(
+        laboratory_name=entry.laboratory_name,
+        year=entry.year,
+        kind=kind,
+        last_edited_cursor=cursor,
+        synced_at=synced_at,
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_notion_sync_state",
+        set_={"last_edited_cursor": stmt.excluded.last_edited_cursor, "synced_at": stmt.excluded.synced_at},
+    )
+    await db.execute(stmt)
+
+
+def _max_edited(rows: List[Dict[str, Any]], cursor: Optional[datetime]) -> Optional[datetime]:
+    edited = [row["last_edited_time"] for row in rows if row["last_edited_time"]]
+    if cursor:
+        edited.append(cursor)
+    return max(edited) if edited else None
+
+
+async def sync_students(db: AsyncSession, entry: Notion, synced_at: datetime, full: bool = False) -> int:
+    """学生DBをミラーに反映し、取得したページ数を返す"""
+    state = None if full else await get_sync_state(db, entry.laboratory_name, entry.year, SYNC_STUDENTS)
+    cursor = state.last_edited_cursor if state else None
+    pages = await query_database(str(entry.student_page_id), _edited_since(cursor))
+
+    rows = []
+    for page in pages:
+        data = extract_student_page_data(page)
+        rows.append({
+            "notion_page_id": uuid.UUID(page["id"]),
+            "laboratory_name": entry.laboratory_name,
+            "year": entry.year,
+            "student_number": _number(data["student_number"]),
+            "student_name": data["student_name"],
+            "theme": None if data["theme"] == "Unknown" else data["theme"],
+            "total_contact_time": _number(data["total_contact_time"]),
+            "last_edited_time": parse_notion_timestamp(page.get("last_edited_time")),
+            "synced_at": synced_at,
+        })
+    await upsert_rows(db, Student, rows)
+
+    if rows:
+        # 名前が変わった学生のタスクの student_name を追従させる（data 内の student_name も書き換える）
+        await db.execute(
+            update(ContactTime)
+            .where(
+                ContactTime.student_page_id == Student.notion_page_id,
+                Student.notion_page_id.in_([row["notion_page_id"] for row in rows]),
+                ContactTime.student_name.is_distinct_from(Student.student_name),
+            )
+            .values(
+                student_name=Student.student_name,
+                data=cast(
+                    func.jsonb_set(
+                        cast(ContactTime.data, JSONB),
+                        literal_column("'{student_name}'::text[]"),
+                        func.to_jsonb(Student.student_name),
+                    ),
+                    JSON,
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    if state is None:
+        # 全件取得したときは Notion 側で削除・アーカイブされたページ（今回 upsert されなかった行）を消す
+        await db.execute(
+            delete(Student).where(
+                Student.laboratory_name == entry.laboratory_name,
+                Student.year == entry.year,
+                or_(Student.synced_at.is_(None), Student.synced_at < synced_at),
+            )
+        )
+
+    await _save_sync_state(db, entry, SYNC_STUDENTS, _max_edited(rows, cursor), synced_at)
+    return len(rows)
+
+
+async def _mirror_resolver(db: AsyncSession, entry: Notion) -> StudentNameResolver:
+    """ミラー済みの学生から名前解決の対応表を作る（載っていないIDだけ Notion に問い合わせる）"""
+    result = await db.execute(
+        select(Student.notion_page_id, Student.student_name).where(
+            Student.laboratory_name == entry.laboratory_name,
+            Student.year == entry.year,
+        )
+    )
+    return StudentNameResolver({_normalize_page_id(page_id): name for page_id, name in result.all()})
+
+
+async def sync_tasks(db: AsyncSession, entry: Notion, synced_at: datetime, full: bool = False) -> int:
+    """卒研作業タスクDBをミラーに反映し、取得したページ数を返す（学生の同期後に呼ぶ）"""
+    state = None if full else await get_sync_state(db, entry.laboratory_name, entry.year, SYNC_TASKS)
+    cursor = state.last_edited_cursor if state else None
+    resolver = await _mirror_resolver(db, entry)
+
+    # 取得しながら UPSERT_CHUNK_SIZE 件ずつ書き込み、手元には件数と最終編集時刻だけを残す
+    rows: List[Dict[str, Any]] = []
+    fetched = 0
+    max_edited = cursor
+    async for page in iter_query_database(str(entry.task_page_id), _edited_since(cursor)):
+        data = await extract_task_page_data(page, resolver)
+        start_time = parse_notion_timestamp(data["start_time"])
+        rows.append({
+            "notion_page_id": uuid.UUID(page["id"]),
+            "laboratory_name": entry.laboratory_name,
+            "year": entry.year,
+            "data": data,
+            "date": start_time.astimezone(JST).date() if start_time else None,
+            "student_page_id": _relation_page_id(page),
+            "student_name": data["student_name"],
+            "start_time": start_time,
+            "end_time": parse_notion_timestamp(data["end_time"]),
+            "excluded_time": _number(data["excluded_time"]),
+            "working_time": _number(data["working_time"]),
+            "summary": None if data["summary"] == "Unknown" else data["summary"],
+            "last_edited_time": parse_notion_timestamp(page.get("last_edited_time")),
+            "synced_at": synced_at,
+        })
+        if len(rows) >= UPSERT_CHUNK_SIZE:
+            max_edited = _max_edited(rows, max_edited)
+            fetched += len(rows)
+            await upsert_rows(db, ContactTime, rows)
+            rows = []
+
+    max_edited = _max_edited(rows, max_edited)
+    fetched += len(rows)
+    await upsert_rows(db, ContactTime, rows)
+
+    if state is None:
+        # 全件取得したときは、今回 upsert されなかった（synced_at が古い）行を消す
+        await db.execute(
+            delete(ContactTime).where(
+                ContactTime.laboratory_name == entry.laboratory_name,
+                ContactTime.year == entry.year,
+                or_(ContactTime.synced_at.is_(None), ContactTime.synced_at < synced_at),
+            )
+        )
+
+    await _save_sync_state(db, entry, SYNC_TASKS, max_edited, synced_at)
+    return fetched
+
+
+async def sync_laboratory(db: AsyncSession, entry: Notion, full: bool = False) -> Dict[str, Any]:
+    """研究室・年度1つ分の学生とタスクを同期してコミットする"""
+    synced_at = datetime.now(timezone.utc)
+    students = await sync_students(db, entry, synced_at, full)
+    tasks = await sync_tasks(db, entry, synced_at, full)
+    await db.commit()
+    print(f"🔄 Notion同期: {entry.laboratory_name} {entry.year}年度 students={students} tasks={tasks} full={full}")
+    return {"synced_at": synced_at, "students": students, "tasks": tasks}
+
+
+# 同じ研究室・年度の同期が同時に求められたら1回だけ Notion に取りに行く
+_laboratory_syncs = SingleFlight("notion_sync")
+
+
+async def sync_laboratory_now(laboratory_name: str, year: int, full: bool = False) -> Dict[str, Any]:
+    """
+    研究室・年度1つ分を同期する。同じ研究室・年度の同期が実行中ならその結果を待つ。
+    複数のリクエストで共有するため、呼び出し元のセッションではなく専用のセッションで行う。
+    """
+    async def run() -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            entry = await get_notion_entry(db, laboratory_name, year)
+            return await sync_laboratory(db, entry, full)
+
+    return await _laboratory_syncs.do((laboratory_name, year, full), run)
+
+
+_background_syncs: Dict[Tuple[str, int], asyncio.Task] = {}
+
+
+def refresh_in_background(laboratory_name: str, year: int) -> bool:
+    """
+    研究室・年度の差分同期をバックグラウンドで始める。同じ研究室・年度の同期が走っている場合と、
+    サーキットブレーカーが開いている場合は何もしない。
+    """
+    key = (laboratory_name, year)
+    running = _background_syncs.get(key)
+    if running is not None and not running.done():
+        return False
+    if get_notion_client().breaker.state == CircuitBreaker.OPEN:
+        return False
+
+    async def run() -> None:
+        try:
+            await sync_laboratory_now(laboratory_name, year)
+        except Exception as e:
+            print(f"⚠️ {laboratory_name} {year}年度 のバックグラウンド同期に失敗しました: {getattr(e, 'message', None) or e}")
+        finally:
+            _background_syncs.pop(key, None)
+
+    _background_syncs[key] = asyncio.create_task(run())
+    return True
+
+
+async def ensure_synced(
+    db: AsyncSession,
+    laboratory_name: str,
+    year: int,
+    refresh: bool = False,
+) -> Tuple[datetime, bool]:
+    """
+    ミラーの最終同期時刻と、それが古いかどうかを返す。
+
+    - まだ一度も同期していなければその場で全件同期する（Notion に接続できなければエラー）
+    - refresh=True ならその場で差分同期する。Notion に接続できなければ同期済みのデータを古いまま使う
+    - それ以外は TTL を過ぎていればバックグラウンドで同期を始め、今あるデータをすぐに返す
+
+    その場での同期は同じ研究室・年度のリクエスト間で1回にまとめる（sync_laboratory_now）。
+    """
+    state = await get_sync_state(db, laboratory_name, year, SYNC_TASKS)
+    if state is None:
+        result = await sync_laboratory_now(laboratory_name, year)
+        return result["synced_at"], False
+
+    synced_at = state.synced_at
+    if refresh:
+        try:
+            result = await sync_laboratory_now(laboratory_name, year)
+            return result["synced_at"], False
+        except NotionAPIError as e:
+            if not e.unavailable:
+                raise
+            print(f"⚠️ Notion に接続できないため同期済みのデータを返します: {e.message}")
+            return synced_at, True
+
+    stale = (datetime.now(timezone.utc) - synced_at).total_seconds() > NOTION_MIRROR_TTL_SECONDS
+    if stale:
+        refresh_in_background(laboratory_name, year)
+    return synced_at, stale
+
+
+async def load_mirrored_student(
+    db: AsyncSession,
+    laboratory_name: str,
+    year: int,
+    student_name: str,
+) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], Optional[datetime]]:
+    """
+    ミラーから学生1人分の学生情報とタスクを Notion から取得したときと同じ形で返す
+    （Notion に接続できないときの代替）。同期したことがなければ (None, [], None)。
+    """
+    state = await get_sync_state(db, laboratory_name, year, SYNC_TASKS)
+    if state is None:
+        return None, [], None
+
+    student = (
+        await db.execute(
+            select(Student).where(
+                Student.laboratory_name == laboratory_name,
+                Student.year == year,
+                Student.student_name == student_name,
+            )
+        )
+    ).scalars().first()
+    if student is None:
+        return None, [], state.synced_at
+
+    tasks = (
+        await db.execute(
+            select(ContactTime.data)
+            .where(
+                ContactTime.laboratory_name == laboratory_name,
+                ContactTime.year == year,
+                ContactTime.student_name == student_name,
+            )
+            .order_by(ContactTime.start_time.asc().nulls_last(), ContactTime.id)
+        )
+    ).scalars().all()
+    return _student_dict(student), [dict(task) for task in tasks], state.synced_at
+
+
+# =====================================================
+# APIエンドポイント
+# =====================================================
+def _student_dict(student: Student) -> Dict[str, Any]:
+    return {
+        "student_number": _unknown(student.student_number),
+        "student_name": student.student_name,
+        "theme": _unknown(student.theme),
+        "total_contact_time": _unknown(student.total_contact_time),
+    }
+
+
+def _freshness(synced_at: datetime, stale: bool) -> Dict[str, Any]:
+    age = max(0.0, (datetime.now(timezone.utc) - synced_at).total_seconds())
+    return {"synced_at": synced_at.isoformat(), "data_age_seconds": round(age, 1), "stale": stale}
+
+
+def _freshness_headers(synced_at: datetime, stale: bool = False) -> Dict[str, str]:
+    freshness = _freshness(synced_at, stale)
+    return {
+        "X-Data-Synced-At": freshness["synced_at"],
+        "X-Data-Age": str(int(freshness["data_age_seconds"])),
+        "X-Data-Stale": "1" if stale else "0",
+    }
+
+
+@notion_sync_router.post("/sync")
+async def sync_laboratory_data(
+    laboratory_name: str = Query(..., description="研究室名"),
+    year: int = Query(..., description="年度"),
+    full: bool = Query(False, description="全件を取り直し、Notion側で消えたページを削除する"),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """指定した研究室・年度の学生とタスクを Notion からミラーに同期する"""
+    await get_notion_entry(db, laboratory_name, year)
+    result = await sync_laboratory_now(laboratory_name, year, full)
+    return {**result, "synced_at": result["synced_at"].isoformat()}
+
+
+@notion_sync_router.get("/laboratory_students")
+async def get_students_by_lab_and_year(
+    laboratory_name: str = Query(..., description="研究室名"),
+    year: int = Query(..., description="年度"),
+    refresh: bool = Query(False, description="応答前に Notion と差分同期する"),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """
+    研究室・年度の学生情報をミラーから返す（学生番号順、「共通」ページは除外）
+    """
+    synced_at, stale = await ensure_synced(db, laboratory_name, year, refresh)
+
+    result = await db.execute(
+        select(Student)
+        .where(
+            Student.laboratory_name == laboratory_name,
+            Student.year == year,
+            Student.student_name != COMMON_STUDENT_NAME,
+        )
+        .order_by(Student.student_number.asc().nulls_last(), Student.student_name)
+    )
+    students = [_student_dict(student) for student in result.scalars().all()]
+
+    return JSONResponse(
+        content={"students": students, **_freshness(synced_at, stale)},
+        headers=_freshness_headers(synced_at, stale),
+    )
+
+
+@notion_sync_router.get("/laboratory_tasks")
+async def get_tasks_by_lab_and_year(
+    laboratory_name: str = Query(..., description="研究室名"),
+    year: int = Query(..., description="年度"),
+    student_name: str = Query(None, description="学生名（任意）"),
+    refresh: bool = Query(False, description="応答前に Notion と差分同期する"),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """
+    研究室・年度のコンタクトタイム情報をミラーから学生ごとにまとめて返す。
+    鮮度は X-Data-Synced-At / X-Data-Age / X-Data-Stale ヘッダーで返す（ボディのキーは学生名のため）。
+    """
+    synced_at, stale = await ensure_synced(db, laboratory_name, year, refresh)
+
+    # 学生ごとの合計はウィンドウ関数で求めて各タスクに付け（作業時間が未入力のタスクは合計に含めない）、
+    # 学生ごとのタスク一覧は json_agg でまとめる
+    name = func.coalesce(ContactTime.student_name, "Unknown")
+    total_working_time = func.coalesce(func.sum(ContactTime.working_time).over(partition_by=name), 0)
+    tasks = (
+        select(
+            name.label("student_name"),
+            cast(ContactTime.data, JSONB).op("||")(
+                func.jsonb_build_object("total_working_time", total_working_time)
+            ).label("task"),
+            ContactTime.start_time,
+            ContactTime.id,
+        )
+        .where(ContactTime.laboratory_name == laboratory_name, ContactTime.year == year)
+    )
+    if student_name:
+        tasks = tasks.where(ContactTime.student_name == student_name)
+    tasks = tasks.subquery()
+    query = (
+        select(
+            tasks.c.student_name,
+            func.json_agg(
+                aggregate_order_by(tasks.c.task, tasks.c.start_time.asc().nulls_last(), tasks.c.id), type_=JSON
+            ),
+        )
+        .group_by(tasks.c.student_name)
+        .order_by(func.min(tasks.c.start_time).asc().nulls_last())
+    )
+    student_tasks: Dict[str, List[Dict[str, Any]]] = dict((await db.execute(query)).tuples().all())
+
+    # student_nameが指定されている場合、その学生のタスクだけ返す
+    if student_name:
+        student_tasks = {student_name: student_tasks.get(student_name, [])}
+
+    return JSONResponse(content=student_tasks, headers=_freshness_headers(synced_at, stale))
@@ -0,0 +1,338 @@
+# notion_worker.py
+"""Notion の定期同期ワーカー
+
+研究室ツリー（notion テーブル）と、各研究室・年度の学生・タスクのミラーを一定間隔で更新する。
+API プロセス内で動かす（NOTION_SYNC_IN_PROCESS=1）か、別プロセスとして起動する:
+
+    python notion_worker.py          # NOTION_SYNC_INTERVAL_SECONDS ごとに同期し続ける
+    python notion_worker.py --once   # 1回だけ同期して終了する
+    python notion_worker.py --once --full   # 全件同期を1回だけ行う
+
+通常は差分同期で、差分同期では Notion 側で削除・アーカイブされたページを検出できないため、
+NOTION_FULL_SYNC_INTERVAL_SECONDS ごとに全件同期してミラーから消す。
+複数のプロセスが同時に同期しないよう、1回の同期は Postgres のアドバイザリロックの中で行う。
+実行結果は notion_sync_runs テーブルに残し、GET /notion/sync/status で参照できる。
+"""
+import argparse
+import asyncio
+import os
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, engine, get_db_session, init_db
+from models.notion import Notion, NotionSyncRun
+from notion_api import update_laboratory_notion_data
+from notion_http import close_notion_client, get_notion_client
+from notion_sync import sync_laboratory
+
+
+NOTION_ROOT_DATABASE_ID = os.getenv("NOTION_ROOT_DATABASE_ID")
+NOTION_SYNC_INTERVAL_SECONDS = float(os.getenv("NOTION_SYNC_INTERVAL_SECONDS", "900"))
+# 前回の全件同期からこれだけ経ったら、次の同期を全件同期にする
+NOTION_FULL_SYNC_INTERVAL_SECONDS = float(os.getenv("NOTION_FULL_SYNC_INTERVAL_SECONDS", "86400"))
+NOTION_SYNC_IN_PROCESS = os.getenv("NOTION_SYNC_IN_PROCESS", "0") == "1"
+
+# pg_try_advisory_lock のキー（このアプリの Notion 同期専用）
+NOTION_SYNC_LOCK_KEY = 0x4E4F5449
+
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+PARTIAL = "partial"
+FAILED = "failed"
+SKIPPED = "skipped"
+# ロックを取った時点で running のまま残っていた実行（プロセスが落ちたなど）
+ABANDONED = "abandoned"
+
+notion_worker_router = APIRouter(tags=["notion-sync"])
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def _finish_run(db: AsyncSession, run_id: int, **values: Any) -> None:
+    await db.execute(
+        update(NotionSyncRun).where(NotionSyncRun.id == run_id).values(finished_at=_now(), **values)
+    )
+    await db.commit()
+
+
+async def _abandon_stale_runs(db: AsyncSession) -> None:
+    """ロックを取った時点で running のまま残っている実行は、終了を記録できずに止まったもの"""
+    result = await db.execute(
+        update(NotionSyncRun)
+        .where(NotionSyncRun.status == RUNNING)
+        .values(status=ABANDONED, finished_at=_now(), error="終了を記録できずに中断されました")
+    )
+    if result.rowcount:
+        print(f"⚠️ 中断されたNotion同期を {result.rowcount} 件 abandoned にしました")
+
+
+async def _full_sync_due(db: AsyncSession) -> bool:
+    """最後に完了した全件同期から NOTION_FULL_SYNC_INTERVAL_SECONDS 以上経っていれば True"""
+    last_full = await db.scalar(
+        select(func.max(NotionSyncRun.started_at)).where(
+            NotionSyncRun.full_sync.is_(True),
+            NotionSyncRun.status.in_([SUCCEEDED, PARTIAL]),
+        )
+    )
+    return last_full is None or (_now() - last_full).total_seconds() >= NOTION_FULL_SYNC_INTERVAL_SECONDS
+
+
+async def _sync_all(db: AsyncSession, run_id: int, root_database_id: str, full: bool) -> Dict[str, Any]:
+    """研究室ツリーと各研究室・年度のミラーを同期し、結果を run_id の実行に記録する"""
+    try:
+        # 1. 研究室ツリー（差分同期では変更のない年度ページの子ブロックをたどらない）
+        structure = await update_laboratory_notion_data(root_database_id=root_database_id, full=full, db=db)
+
+        # 2. 研究室・年度ごとの学生・タスク。1つのセッションを使い回すので順番に行う
+        #    全件同期では Notion 側で削除・アーカイブされたページをミラーから消す
+        entries = (await db.execute(select(Notion).order_by(Notion.laboratory_name, Notion.year))).scalars().all()
+        # 途中の rollback で属性が失効しないようセッションから切り離しておく
+        for entry in entries:
+            db.expunge(entry)
+        synced = 0
+        failures: List[Dict[str, Any]] = []
+        for entry in entries:
+            label = {"laboratory_name": entry.laboratory_name, "year": entry.year}
+            try:
+                await sync_laboratory(db, entry, full=full)
+                synced += 1
+            except Exception as e:
+                await db.rollback()
+                print(f"⚠️ {entry.laboratory_name} {entry.year}年度 の同期に失敗しました: {e}")
+                failures.append({**label, "detail": getattr(e, "message", None) or str(e)})
+    except Exception as e:
+        traceback.print_exc()
+        await db.rollback()
+        await _finish_run(db, run_id, status=FAILED, error=getattr(e, "message", None) or str(e))
+        return {"run_id": run_id, "status": FAILED}
+
+    status = PARTIAL if failures else SUCCEEDED
+    await _finish_run(
+        db,
+        run_id,
+        status=status,
+        laboratories=len(structure["laboratories"]),
+        thesis_pages=structure["count"],
+        synced_entries=synced,
+        failed_entries=len(failures),
+        details={"deleted_thesis_pages": structure["deleted"], "failures": failures},
+    )
+    print(f"✅ Notion同期が完了しました (run={run_id}, status={status}, entries={synced}, failed={len(failures)})")
+    return {"run_id": run_id, "status": status}
+
+
+async def _run_locked(root_database_id: str, trigger: str, full: Optional[bool]) -> Dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        await _abandon_stale_runs(db)
+        if full is None:
+            full = await _full_sync_due(db)
+        run = NotionSyncRun(trigger=trigger, status=RUNNING, full_sync=full, started_at=_now())
+        db.add(run)
+        await db.commit()
+        run_id = run.id
+        print(f"🔁 Notion同期を開始します (run={run_id}, trigger={trigger}, full={full})")
+
+        completed = False
+        try:
+            result = await _sync_all(db, run_id, root_database_id, full)
+            completed = True
+            return result
+        finally:
+            if not completed:
+                # キャンセル（シャットダウンなど）で抜けたときも running のまま残さない
+                async with AsyncSessionLocal() as cleanup_db:
+                    await _finish_run(cleanup_db, run_id, status=FAILED, error="同期が途中で中断されました")
+
+
+async def run_notion_sync(
+    root_database_id: Optional[str] = None,
+    trigger: str = "schedule",
+    full: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    研究室ツリーと全研究室・年度のミラーを1回同期する。
+    full を省略すると、前回の全件同期から NOTION_FULL_SYNC_INTERVAL_SECONDS 経っていれば全件同期にする。
+    他のプロセスが同期中（アドバイザリロックを取れない）ならスキップする。
+    """
+    root_database_id = root_database_id or NOTION_ROOT_DATABASE_ID
+    if not root_database_id:
+        raise ValueError("NOTION_ROOT_DATABASE_ID が設定されていません")
+
+    # ロックはセッション単位なので、同期が終わるまでこの接続を持ち続ける
+    async with engine.connect() as lock_conn:
+        locked = await lock_conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": NOTION_SYNC_LOCK_KEY})
+        if not locked:
+            print("⏭️ 他のワーカーが同期中のためスキップします")
+            return {"status": SKIPPED}
+        try:
+            return await _run_locked(root_database_id, trigger, full)
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": NOTION_SYNC_LOCK_KEY})
+
+
+# =====================================================
+# プロセス内スケジューラー
+# =====================================================
+_scheduler_task: Optional[asyncio.Task] = None
+_manual_task: Optional[asyncio.Task] = None
+
+
+async def _scheduler_loop(root_database_id: str, interval: float) -> None:
+    while True:
+        try:
+            await run_notion_sync(root_database_id, trigger="schedule")
+        except Exception:
+            traceback.print_exc()
+        await asyncio.sleep(interval)
+
+
+def start_scheduler(
+    root_database_id: Optional[str] = None,
+    interval: float = NOTION_SYNC_INTERVAL_SECONDS,
+) -> bool:
+    """API プロセス内で定期同期を始める（ルートDBが未設定なら何もしない）"""
+    global _scheduler_task
+    root_database_id = root_database_id or NOTION_ROOT_DATABASE_ID
+    if not root_database_id or _scheduler_task is not None:
+        return False
+    _scheduler_task = asyncio.create_task(_scheduler_loop(root_database_id, interval))
+    print(f"⏰ Notion定期同期を開始しました (interval={interval:.0f}s)")
+    return True
+
+
+async def stop_scheduler() -> None:
+    global _scheduler_task
+    for task in (_scheduler_task, _manual_task):
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+    _scheduler_task = None
+
+
+def trigger_sync(root_database_id: Optional[str] = None, trigger: str = "manual", full: Optional[bool] = None) -> bool:
+    """
+    同期をバックグラウンドで1回走らせる。このプロセスですでに走っていれば False を返す
+    （別プロセスとの排他はアドバイザリロックで行う）。
+    """
+    global _manual_task
+    if _manual_task is not None and not _manual_task.done():
+        return False
+
+    async def run() -> None:
+        try:
+            await run_notion_sync(root_database_id, trigger=trigger, full=full)
+        except Exception:
+            traceback.print_exc()
+
+    _manual_task = asyncio.create_task(run())
+    return True
+
+
+# =====================================================
+# APIエンドポイント
+# =====================================================
+def _run_to_dict(run: Optional[NotionSyncRun]) -> Optional[Dict[str, Any]]:
+    if run is None:
+        return None
+    return {
+        "id": run.id,
+        "trigger": run.trigger,
+        "status": run.status,
+        "full_sync": run.full_sync,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "laboratories": run.laboratories,
+        "thesis_pages": run.thesis_pages,
+        "synced_entries": run.synced_entries,
+        "failed_entries": run.failed_entries,
+        "error": run.error,
+        "details": run.details,
+    }
+
+
+@notion_worker_router.get("/sync/status")
+async def get_notion_sync_status(db: AsyncSession = Depends(get_db_session)):
+    """定期同期の設定、Notion のサーキットブレーカーの状態、直近の実行・直近の成功した実行の結果を返す"""
+    last_run = (
+        await db.execute(select(NotionSyncRun).order_by(NotionSyncRun.started_at.desc()).limit(1))
+    ).scalars().first()
+    last_success = (
+        await db.execute(
+            select(NotionSyncRun)
+            .where(NotionSyncRun.status.in_([SUCCEEDED, PARTIAL]))
+            .order_by(NotionSyncRun.started_at.desc())
+            .limit(1)
+        )
+    ).scalars().first()
+
+    # running は実行履歴ではなくロックで判定する（プロセスが落ちた実行は running のまま残るため）
+    running = await db.scalar(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_locks"
+            " WHERE locktype = 'advisory' AND classid = 0 AND objid = :key AND objsubid = 1 AND granted)"
+        ),
+        {"key": NOTION_SYNC_LOCK_KEY},
+    )
+
+    return {
+        "scheduler": {
+            "in_process": _scheduler_task is not None and not _scheduler_task.done(),
+            "interval_seconds": NOTION_SYNC_INTERVAL_SECONDS,
+            "full_interval_seconds": NOTION_FULL_SYNC_INTERVAL_SECONDS,
+            "root_database_id": NOTION_ROOT_DATABASE_ID,
+        },
+        "circuit": get_notion_client().breaker.to_dict(),
+        "running": bool(running),
+        "last_run": _run_to_dict(last_run),
+        "last_success": _run_to_dict(last_success),
+    }
+
+
+@notion_worker_router.post("/sync/run", status_code=202)
+async def run_notion_sync_now(
+    root_database_id: str = Query(None, description="NotionのルートデータベースID（省略時は NOTION_ROOT_DATABASE_ID）"),
+    full: Optional[bool] = Query(None, description="全件同期するか（省略時は前回の全件同期からの経過時間で決める）"),
+):
+    """同期をバックグラウンドで今すぐ1回実行する"""
+    if not (root_database_id or NOTION_ROOT_DATABASE_ID):
+        raise HTTPException(status_code=400, detail="root_database_id を指定してください")
+    if not trigger_sync(root_database_id, trigger="manual", full=full):
+        raise HTTPException(status_code=409, detail="同期はすでに実行中です")
+    return JSONResponse(status_code=202, content={"message": "Notion同期を開始しました"})
+
+
+# =====================================================
+# CLI
+# =====================================================
+async def _main(once: bool, root_database_id: Optional[str], interval: float, full: Optional[bool]) -> None:
+    await init_db()
+    try:
+        if once:
+            result = await run_notion_sync(root_database_id, trigger="cli", full=full)
+            print(result)
+            return
+        await _scheduler_loop(root_database_id, interval)
+    finally:
+        await close_notion_client()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Notion の研究室データと学生・タスクを定期同期する")
+    parser.add_argument("--once", action="store_true", help="1回だけ同期して終了する")
+    parser.add_argument("--root-database-id", default=NOTION_ROOT_DATABASE_ID, help="NotionのルートデータベースID")
+    parser.add_argument("--full", action="store_true", default=None, help="--once で全件同期する（省略時は経過時間で決める）")
+    parser.add_argument("--interval", type=float, default=NOTION_SYNC_INTERVAL_SECONDS, help="同期間隔（秒）")
+    args = parser.parse_args()
+    asyncio.run(_main(args.once, args.root_database_id, args.interval, args.full))
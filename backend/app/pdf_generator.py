@@ -1,11 +1,25 @@
 # pdf_generator.py
-from fastapi import APIRouter, HTTPException
+import hashlib
+import json
+from abc import ABC, abstractmethod
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import Response
 from pydantic import BaseModel
-from typing import List, Optional, Literal
-import tempfile
-import subprocess
-from pathlib import Path
+from typing import Dict, List, Optional, Literal
+
+from latex_compiler import LatexCompileError, compile_latex, compile_latex_async
+from latex_templates import (
+    PROGRAM_BREAK,
+    PROGRAM_DOCUMENT,
+    PROGRAM_PRESENTATION,
+    PROGRAM_SESSION,
+    PROGRAM_SESSION_SEPARATOR,
+    escape_latex,
+)
+from simple_pdf import MM, SimplePdfDocument
+from singleflight import SingleFlight
 
 pdf_router = APIRouter()
 
@@ -34,155 +48,235 @@ class ScheduleData(BaseModel):
     venue: str
     sessions: List[Session]
 
-def escape_latex(text: str) -> str:
-    """LaTeX特殊文字をエスケープ"""
-    if not text:
-        return ''
-    
-    # バックスラッシュを最初に処理
-    text = text.replace('\\', '\\textbackslash{}')
-    
-    # 特殊文字をエスケープ
-    special_chars = {
-        '&': '\\&',
-        '%': '\\%',
-        '$': '\\$',
-        '#': '\\#',
-        '_': '\\_',
-        '{': '\\{',
-        '}': '\\}',
-        '~': '\\textasciitilde{}',
-        '^': '\\textasciicircum{}'
-    }
-    
-    for char, escaped in special_chars.items():
-        text = text.replace(char, escaped)
-    
-    return text
-
 def generate_latex(data: ScheduleData) -> str:
     """スケジュールデータからLaTeX文字列を生成"""
     presentation_counter = 1
+    session_number = 0
     sessions_latex_parts = []
-    
-    for index, session in enumerate(data.sessions):
-        session_title = f"{escape_latex(session.startTime)}〜{escape_latex(session.endTime)}"
-        
+
+    for session in data.sessions:
         if session.type == 'break':
             sessions_latex_parts.append(
-                f"\\section*{{Break({session_title})}}\n\\vspace{{0.5cm}}"
+                PROGRAM_BREAK.render(start_time=session.startTime, end_time=session.endTime)
             )
-        else:
-            # セッション番号を計算
-            session_number = sum(1 for i, s in enumerate(data.sessions) 
-                                if s.type == 'session' and i <= index)
-            
-            chair = escape_latex(session.chair or '')
-            timekeeper = escape_latex(session.timekeeper or '')
-            
-            # プレゼンテーションのリストを生成
-            presentations_lines = []
-            if session.presentations:
-                for p in session.presentations:
-                    line = f"  {presentation_counter}. & {escape_latex(p.student_name)} & {escape_latex(p.theme)} \\\\"
-                    presentations_lines.append(line)
-                    presentation_counter += 1
-            
-            presentations_latex = '\n'.join(presentations_lines)
-            
-            session_latex = f"""
-\\section*{{Session {session_number}({session_title}){{\\normalsize 座長:{chair}、タイムキーパー:{timekeeper}}} }}
-\\begin{{tabular}}{{rlp{{12cm}}}}
-{presentations_latex}
-\\end{{tabular}}
-"""
-            sessions_latex_parts.append(session_latex)
-    
-    sessions_latex = '\n\\vspace{0.5cm}\n'.join(sessions_latex_parts)
-    
-    # 完全なLaTeX文書を生成
-    latex_content = f"""\\documentclass[dvipdfmx,a4j]{{jsarticle}}
-\\usepackage[top=20truemm,bottom=20truemm,left=25truemm,right=25truemm]{{geometry}}
-\\begin{{document}}
-\\title{{{{\\normalsize {escape_latex(data.courseName)}}} \\\\
-{{\\LARGE {escape_latex(data.eventName)}}} \\\\
-{{\\Large {escape_latex(data.eventTheme)}}}}}
-\\date{{\\empty}}
-\\maketitle
-\\vspace{{-1cm}}
-\\noindent
-\\hspace{{5cm}} 日時:{escape_latex(data.dateTime)} \\\\
-\\hspace{{5cm}} 会場:{escape_latex(data.venue)}
-\\vspace{{1cm}}
-{sessions_latex}
-\\end{{document}}
-"""
-    
-    return latex_content
+            continue
 
-def compile_latex_to_pdf(latex_content: str) -> bytes:
-    """LaTeX文字列をコンパイルしてPDFバイナリを返す"""
-    
-    # 一時ディレクトリを作成
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmpdir_path = Path(tmpdir)
-        tex_file = tmpdir_path / "document.tex"
-        
-        # LaTeXファイルを書き込み
-        tex_file.write_text(latex_content, encoding='utf-8')
-        
-        try:
-            # platex でコンパイル（日本語対応）
-            subprocess.run(
-                ['platex', '-interaction=nonstopmode', 'document.tex'],
-                cwd=tmpdir,
-                check=True,
-                capture_output=True,
-                timeout=30
-            )
-            
-            # dvipdfmx で PDF に変換
-            subprocess.run(
-                ['dvipdfmx', 'document.dvi'],
-                cwd=tmpdir,
-                check=True,
-                capture_output=True,
-                timeout=30
-            )
-            
-            # PDFファイルを読み込み
-            pdf_file = tmpdir_path / "document.pdf"
-            if not pdf_file.exists():
-                raise FileNotFoundError("PDF file was not generated")
-            
-            return pdf_file.read_bytes()
-            
-        except subprocess.CalledProcessError as e:
-            error_msg = e.stderr.decode('utf-8', errors='ignore') if e.stderr else str(e)
-            raise HTTPException(
-                status_code=500,
-                detail=f"LaTeX compilation failed: {error_msg}"
+        session_number += 1
+
+        # プレゼンテーションのリストを生成
+        presentations_lines = []
+        for p in session.presentations or []:
+            presentations_lines.append(
+                PROGRAM_PRESENTATION.render(
+                    number=presentation_counter,
+                    student_name=p.student_name,
+                    theme=p.theme,
+                )
             )
-        except subprocess.TimeoutExpired:
-            raise HTTPException(
-                status_code=500,
-                detail="LaTeX compilation timed out"
+            presentation_counter += 1
+
+        sessions_latex_parts.append(
+            PROGRAM_SESSION.render(
+                session_number=session_number,
+                start_time=session.startTime,
+                end_time=session.endTime,
+                chair=session.chair,
+                timekeeper=session.timekeeper,
+                presentations='\n'.join(presentations_lines),
             )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Unexpected error during PDF generation: {str(e)}"
+        )
+
+    # 完全なLaTeX文書を生成
+    return PROGRAM_DOCUMENT.render(
+        course_name=data.courseName,
+        event_name=data.eventName,
+        event_theme=data.eventTheme,
+        date_time=data.dateTime,
+        venue=data.venue,
+        sessions=PROGRAM_SESSION_SEPARATOR.join(sessions_latex_parts),
+    )
+
+def compile_latex_to_pdf(latex_content: str, template: str = "program") -> bytes:
+    """LaTeX文字列をコンパイルしてPDFバイナリを返す"""
+    try:
+        return compile_latex(latex_content, template=template).pdf
+    except LatexCompileError as e:
+        raise HTTPException(status_code=500, detail=e.to_detail())
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Unexpected error during PDF generation: {str(e)}"
+        )
+
+async def compile_latex_to_pdf_async(latex_content: str, template: str = "program") -> bytes:
+    """compile_latex_to_pdf をコンパイルプール上で実行する（イベントループを塞がない）"""
+    try:
+        return (await compile_latex_async(latex_content, template=template)).pdf
+    except LatexCompileError as e:
+        raise HTTPException(status_code=500, detail=e.to_detail())
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Unexpected error during PDF generation: {str(e)}"
+        )
+
+# =====================================================
+# プログラムPDFのレンダラー
+# =====================================================
+class ProgramRenderer(ABC):
+    """ScheduleData からプログラムPDFを生成するレンダラーの共通インターフェース"""
+
+    name: str = ""
+
+    @abstractmethod
+    def render(self, data: ScheduleData) -> bytes:
+        ...
+
+    async def render_async(self, data: ScheduleData) -> bytes:
+        """render をイベントループの外で実行する"""
+        return await run_in_threadpool(self.render, data)
+
+
+class LatexProgramRenderer(ProgramRenderer):
+    """platex + dvipdfmx による従来のレンダラー（組版品質優先・既定）"""
+
+    name = "latex"
+
+    def render(self, data: ScheduleData) -> bytes:
+        return compile_latex_to_pdf(generate_latex(data))
+
+    async def render_async(self, data: ScheduleData) -> bytes:
+        return await compile_latex_to_pdf_async(generate_latex(data))
+
+
+class FastProgramRenderer(ProgramRenderer):
+    """TeX を使わずに simple_pdf で直接描画する高速レンダラー
+
+    レイアウトは generate_latex の出力（jsarticle, 余白 上下20mm・左右25mm）に合わせている。
+    """
+
+    name = "fast"
+
+    BODY_SIZE = 10
+    LEADING = 16
+    SECTION_SIZE = 14
+    MARGIN_X = 25 * MM
+    MARGIN_Y = 20 * MM
+    THEME_WIDTH = 120 * MM
+    COLUMN_GAP = 6
+
+    def render(self, data: ScheduleData) -> bytes:
+        doc = SimplePdfDocument()
+        top = doc.page_height - self.MARGIN_Y
+        bottom = self.MARGIN_Y
+        y = top
+
+        def ensure_space(height: float) -> float:
+            if y - height < bottom:
+                doc.new_page()
+                return top
+            return y
+
+        # タイトルブロック
+        y -= 24
+        doc.text_center(y, data.courseName, size=self.BODY_SIZE)
+        y -= 28
+        doc.text_center(y, data.eventName, size=20.74)
+        y -= 24
+        doc.text_center(y, data.eventTheme, size=17.28)
+        y -= 30
+        doc.text(self.MARGIN_X + 50 * MM, y, f"日時:{data.dateTime}", size=self.BODY_SIZE)
+        y -= self.LEADING
+        doc.text(self.MARGIN_X + 50 * MM, y, f"会場:{data.venue}", size=self.BODY_SIZE)
+        y -= 10 * MM
+
+        # 番号列・氏名列の幅は tabular の r / l 列と同じく最大幅に合わせる
+        presentations = [p for s in data.sessions for p in (s.presentations or [])]
+        number_width = doc.text_width(f"{max(len(presentations), 1)}.", self.BODY_SIZE)
+        name_width = max((doc.text_width(p.student_name, self.BODY_SIZE) for p in presentations), default=0)
+        number_right = self.MARGIN_X + self.COLUMN_GAP + number_width
+        name_x = number_right + 2 * self.COLUMN_GAP
+        theme_x = name_x + name_width + 2 * self.COLUMN_GAP
+
+        presentation_counter = 1
+        session_number = 0
+        for session in data.sessions:
+            session_title = f"{session.startTime}〜{session.endTime}"
+            y = ensure_space(self.SECTION_SIZE + 2 * self.LEADING)
+            y -= self.SECTION_SIZE + 8
+
+            if session.type == 'break':
+                doc.text(self.MARGIN_X, y, f"Break({session_title})", size=self.SECTION_SIZE, font="gothic")
+                y -= 5 * MM
+                continue
+
+            session_number += 1
+            heading = f"Session {session_number}({session_title})"
+            doc.text(self.MARGIN_X, y, heading, size=self.SECTION_SIZE, font="gothic")
+            doc.text(
+                self.MARGIN_X + doc.text_width(heading, self.SECTION_SIZE) + 4,
+                y,
+                f"座長:{session.chair or ''}、タイムキーパー:{session.timekeeper or ''}",
+                size=self.BODY_SIZE,
+                font="gothic",
             )
+            y -= self.LEADING + 4
+
+            for p in session.presentations or []:
+                theme_lines = doc.wrap(p.theme, self.BODY_SIZE, self.THEME_WIDTH)
+                y = ensure_space(self.LEADING * len(theme_lines))
+                doc.text_right(number_right, y, f"{presentation_counter}.", size=self.BODY_SIZE)
+                doc.text(name_x, y, p.student_name, size=self.BODY_SIZE)
+                for line in theme_lines:
+                    doc.text(theme_x, y, line, size=self.BODY_SIZE)
+                    y -= self.LEADING
+                presentation_counter += 1
+            y -= 5 * MM
+
+        return doc.to_bytes()
+
+
+PROGRAM_RENDERERS: Dict[str, ProgramRenderer] = {
+    renderer.name: renderer for renderer in (LatexProgramRenderer(), FastProgramRenderer())
+}
+DEFAULT_PROGRAM_RENDERER = LatexProgramRenderer.name
+
+
+def get_program_renderer(name: Optional[str]) -> ProgramRenderer:
+    """レンダラー名から実装を取得する。未指定なら既定（latex）"""
+    renderer = PROGRAM_RENDERERS.get(name or DEFAULT_PROGRAM_RENDERER)
+    if renderer is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown renderer: {name} (available: {', '.join(PROGRAM_RENDERERS)})"
+        )
+    return renderer
+
+
+def render_program_pdf(data: ScheduleData, renderer: Optional[str] = None) -> bytes:
+    """指定されたレンダラーでプログラムPDFを生成する"""
+    return get_program_renderer(renderer).render(data)
+
+
+# 同じスケジュール・レンダラーの生成が同時に来たら1回だけ行う（fast レンダラーも含む）
+_program_renders = SingleFlight("program_render")
+
+
+async def render_program_pdf_async(data: ScheduleData, renderer: Optional[str] = None) -> bytes:
+    """render_program_pdf の非同期版（LaTeX はコンパイルプール、それ以外はスレッドプールで実行する）"""
+    program_renderer = get_program_renderer(renderer)
+    payload = json.dumps(data.dict(), sort_keys=True, ensure_ascii=False)
+    key = (program_renderer.name, hashlib.sha256(payload.encode("utf-8")).hexdigest())
+    return await _program_renders.do(key, lambda: program_renderer.render_async(data))
 
 @pdf_router.post("/generate-pdf")
-async def generate_pdf(data: ScheduleData):
-    """スケジュールデータを受け取ってPDFを生成"""
+async def generate_pdf(
+    data: ScheduleData,
+    renderer: str = Query(DEFAULT_PROGRAM_RENDERER, description="latex（既定）または fast"),
+):
+    """スケジュールデータを受け取ってPDFを生成（コンパイルはイベントループの外で行う）"""
     try:
-        # LaTeXを生成
-        latex_content = generate_latex(data)
-        
-        # PDFにコンパイル
-        pdf_bytes = compile_latex_to_pdf(latex_content)
+        pdf_bytes = await render_program_pdf_async(data, renderer)
         
         # PDFを返す
         return Response(
@@ -0,0 +1,55 @@
+"""submission_threads の提出数カウンタを abstract_submissions から数え直す
+
+通常は提出の追加・削除と同じトランザクションで更新されるが、手作業でのデータ修正などでずれた場合に実行する。
+ずれていたスレッドだけを更新し、その件数を表示する（定期実行しても書き込みは発生しない）。
+
+    python reconcile_submission_counts.py
+"""
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database import engine
+
+
+RECONCILE_SQL = """
+    UPDATE submission_threads t
+    SET submission_count = c.submission_count,
+        abstract_count = c.abstract_count,
+        paper_count = c.paper_count,
+        presentation_count = c.presentation_count
+    FROM (
+        SELECT
+            t2.id AS thread_id,
+            count(s.id) AS submission_count,
+            count(s.pdf_filename) AS abstract_count,
+            count(s.paper_filename) AS paper_count,
+            count(s.presentation_filename) AS presentation_count
+        FROM submission_threads t2
+        LEFT JOIN abstract_submissions s ON s.thread_id = t2.id
+        GROUP BY t2.id
+    ) c
+    WHERE t.id = c.thread_id
+      AND (t.submission_count, t.abstract_count, t.paper_count, t.presentation_count)
+          IS DISTINCT FROM (c.submission_count, c.abstract_count, c.paper_count, c.presentation_count)
+"""
+
+
+async def reconcile_submission_counts(conn: AsyncConnection) -> int:
+    """カウンタがずれているスレッドを数え直し、更新したスレッド数を返す"""
+    result = await conn.execute(text(RECONCILE_SQL))
+    return result.rowcount or 0
+
+
+async def reconcile():
+    try:
+        async with engine.begin() as conn:
+            repaired = await reconcile_submission_counts(conn)
+        print(f"Reconciled submission counts: {repaired} thread(s) repaired.")
+    except Exception as e:
+        print(f"Reconciliation failed: {e}")
+
+
+if __name__ == "__main__":
+    asyncio.run(reconcile())
@@ -0,0 +1,113 @@
+# response_cache.py
+"""変更の少ないGETエンドポイント用のバージョン付きレスポンスキャッシュ
+
+レスポンス本文をパスとクエリ文字列をキーにしてメモリに保持し、ETag を付けて返す。
+If-None-Match が一致すれば本文を返さず 304 にする。
+元データを書き換えてコミットしたら bump() でバージョンを上げ、古いバージョンのエントリは使わない。
+別プロセス（notion_worker.py など）での更新はこのプロセスからは分からないので、
+エントリは max_age_seconds を過ぎたら作り直す。
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from metrics import counter
+
+
+CACHE_LOOKUPS = counter(
+    "response_cache_total",
+    "レスポンスキャッシュの参照回数（hit / miss / not_modified は ETag が一致して 304 を返した回数）",
+)
+
+CacheKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class _Entry:
+    def __init__(self, version: int, body: bytes):
+        self.version = version
+        self.body = body
+        # 本文のハッシュなので、バージョンが上がっても内容が同じなら 304 を返せる
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.created_at = time.monotonic()
+
+
+class VersionedResponseCache:
+    """JSON レスポンスをバージョンごとに保持するキャッシュ"""
+
+    def __init__(self, name: str, max_entries: int = 128, max_age_seconds: float = 60):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.version = 0
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bump(self) -> int:
+        """元データが変わったときに呼ぶ。それまでのエントリはすべて使われなくなる"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            return self.version
+
+    def _get(self, key: CacheKey) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != self.version or time.monotonic() - entry.created_at > self.max_age_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: CacheKey, version: int, body: bytes) -> _Entry:
+        entry = _Entry(version, body)
+        with self._lock:
+            # 作っている間に bump された結果は保持しない（ETag は付けて返す）
+            if version != self.version:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _key(request: Request) -> CacheKey:
+        return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+    @staticmethod
+    def _not_modified(request: Request, entry: _Entry) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag in tags or f"W/{entry.etag}" in tags
+
+    async def respond(self, request: Request, build: Callable[[], Awaitable[Any]]) -> Response:
+        """
+        キャッシュがあればそれを、なければ build() の結果を JSON にして返す。
+        build() が例外（HTTPException など）を投げた場合はキャッシュしない。
+        """
+        key = self._key(request)
+        entry = self._get(key)
+        cached = entry is not None
+        if entry is None:
+            version = self.version
+            content = await build()
+            body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            entry = self._put(key, version, body)
+
+        headers: Dict[str, str] = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if self._not_modified(request, entry):
+            CACHE_LOOKUPS.inc(cache=self.name, result="not_modified")
+            return Response(status_code=304, headers=headers)
+        CACHE_LOOKUPS.inc(cache=self.name, result="hit" if cached else "miss")
+        return Response(content=entry.body, media_type="application/json", headers=headers)
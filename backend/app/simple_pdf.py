@@ -0,0 +1,175 @@
+# simple_pdf.py
+"""TeX を使わずに PDF を直接書き出す最小限のライター
+
+フォントは PDF ビューア側が持つ日本語標準 CID フォント（HeiseiMin-W3 / HeiseiKakuGo-W5）を
+埋め込みなしで参照するため、外部ライブラリやフォントファイルは不要。
+エンコーディングは UniJIS-UCS2-HW-H（ASCII を半角グリフに割り当てる）を使う。
+"""
+import zlib
+from typing import Dict, List, Tuple
+
+MM = 72 / 25.4
+A4_WIDTH = 595.28
+A4_HEIGHT = 841.89
+
+# フォント名 → (BaseFont, FontDescriptor の値)
+_FONTS: Dict[str, Tuple[str, str]] = {
+    "mincho": (
+        "HeiseiMin-W3",
+        "/Flags 6 /FontBBox [-123 -257 1001 910] /ItalicAngle 0 /Ascent 723 /Descent -241 /CapHeight 709 /StemV 69",
+    ),
+    "gothic": (
+        "HeiseiKakuGo-W5",
+        "/Flags 4 /FontBBox [-92 -250 1010 922] /ItalicAngle 0 /Ascent 752 /Descent -221 /CapHeight 737 /StemV 114",
+    ),
+}
+_FONT_RESOURCE_NAMES = {name: f"F{index}" for index, name in enumerate(_FONTS, start=1)}
+
+# Adobe-Japan1 の半角グリフ（CID 231-632）は幅 500、それ以外は既定幅 1000
+_CID_WIDTHS = "[231 632 500]"
+_REPLACEMENT_CHAR = "〓"
+
+
+def char_width(char: str) -> int:
+    """1文字の幅（1000分率）"""
+    code = ord(char)
+    if code < 0x7F or 0xFF61 <= code <= 0xFF9F:
+        return 500
+    return 1000
+
+
+def _encode_text(text: str) -> str:
+    """UCS-2 (BE) の16進文字列に変換する。BMP外の文字は〓に置き換える"""
+    chars = []
+    for char in text:
+        code = ord(char)
+        if code > 0xFFFF or code < 0x20:
+            char = _REPLACEMENT_CHAR
+        chars.append(char)
+    return "".join(chars).encode("utf-16-be").hex()
+
+
+class SimplePdfDocument:
+    """ページ単位でテキストと罫線を描き、PDF バイト列を生成する"""
+
+    def __init__(self, page_width: float = A4_WIDTH, page_height: float = A4_HEIGHT, compress: bool = True):
+        self.page_width = page_width
+        self.page_height = page_height
+        self.compress = compress
+        self._pages: List[List[str]] = []
+        self.new_page()
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def new_page(self) -> None:
+        self._pages.append([])
+
+    def text_width(self, text: str, size: float) -> float:
+        return sum(char_width(c) for c in text) * size / 1000
+
+    def wrap(self, text: str, size: float, max_width: float) -> List[str]:
+        """max_width に収まるように文字単位で折り返す（日本語は単語区切りがないため）"""
+        lines: List[str] = []
+        limit = max_width * 1000 / size
+        current: List[str] = []
+        width = 0
+        for char in text:
+            if char == "\n":
+                lines.append("".join(current))
+                current, width = [], 0
+                continue
+            w = char_width(char)
+            if current and width + w > limit:
+                lines.append("".join(current))
+                current, width = [], 0
+            current.append(char)
+            width += w
+        if current or not lines:
+            lines.append("".join(current))
+        return lines
+
+    def text(self, x: float, y: float, text: str, size: float = 10, font: str = "mincho") -> None:
+        """ベースライン (x, y) から文字列を描く。y はページ下端からの距離"""
+        if not text:
+            return
+        resource = _FONT_RESOURCE_NAMES[font]
+        self._pages[-1].append(f"BT /{resource} {size:.2f} Tf {x:.2f} {y:.2f} Td <{_encode_text(text)}> Tj ET")
+
+    def text_right(self, x_right: float, y: float, text: str, size: float = 10, font: str = "mincho") -> None:
+        self.text(x_right - self.text_width(text, size), y, text, size, font)
+
+    def text_center(self, y: float, text: str, size: float = 10, font: str = "mincho") -> None:
+        self.text((self.page_width - self.text_width(text, size)) / 2, y, text, size, font)
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, width: float = 0.4) -> None:
+        self._pages[-1].append(f"{width:.2f} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S")
+
+    def to_bytes(self) -> bytes:
+        objects: List[bytes] = []
+
+        def add(body: bytes) -> int:
+            objects.append(body)
+            return len(objects)
+
+        catalog_id = add(b"")
+        pages_id = add(b"")
+
+        font_refs = []
+        for name, (base_font, descriptor) in _FONTS.items():
+            descriptor_id = add(f"<< /Type /FontDescriptor /FontName /{base_font} {descriptor} >>".encode("ascii"))
+            cid_font_id = add(
+                (
+                    f"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /{base_font} "
+                    f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Japan1) /Supplement 2 >> "
+                    f"/FontDescriptor {descriptor_id} 0 R /DW 1000 /W {_CID_WIDTHS} >>"
+                ).encode("ascii")
+            )
+            font_id = add(
+                (
+                    f"<< /Type /Font /Subtype /Type0 /BaseFont /{base_font}-UniJIS-UCS2-HW-H "
+                    f"/Encoding /UniJIS-UCS2-HW-H /DescendantFonts [{cid_font_id} 0 R] >>"
+                ).encode("ascii")
+            )
+            font_refs.append(f"/{_FONT_RESOURCE_NAMES[name]} {font_id} 0 R")
+        resources = f"<< /Font << {' '.join(font_refs)} >> >>"
+
+        page_ids = []
+        for operations in self._pages:
+            content = "\n".join(operations).encode("ascii")
+            if self.compress:
+                content = zlib.compress(content)
+                header = f"<< /Length {len(content)} /Filter /FlateDecode >>"
+            else:
+                header = f"<< /Length {len(content)} >>"
+            content_id = add(header.encode("ascii") + b"\nstream\n" + content + b"\nendstream")
+            page_ids.append(
+                add(
+                    (
+                        f"<< /Type /Page /Parent {pages_id} 0 R "
+                        f"/MediaBox [0 0 {self.page_width:.2f} {self.page_height:.2f}] "
+                        f"/Resources {resources} /Contents {content_id} 0 R >>"
+                    ).encode("ascii")
+                )
+            )
+
+        objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode("ascii")
+        kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+        objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("ascii")
+
+        output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+
+        xref_offset = len(output)
+        output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+        for offset in offsets:
+            output += f"{offset:010d} 00000 n \n".encode("ascii")
+        output += (
+            f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n"
+        ).encode("ascii")
+        return bytes(output)
@@ -0,0 +1,50 @@
+# singleflight.py
+"""同じ処理の同時実行をまとめる（single-flight）
+
+同じキーの呼び出しが実行中なら、新しく実行せずにその結果（または例外）を待って共有する。
+実行が終わればキーは忘れるので、結果をキャッシュするものではない。
+結果は複数の呼び出し元に同じオブジェクトが返るため、呼び出し元で書き換えないこと。
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from metrics import counter
+
+
+T = TypeVar("T")
+
+SINGLEFLIGHT_CALLS = counter(
+    "singleflight_calls_total",
+    "single-flight の呼び出し数（result=leader は実際に実行、shared は実行中の結果を共有）",
+)
+
+
+class SingleFlight:
+    """キーごとに実行中の処理を1つに絞る"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 待っている呼び出し元が全員キャンセルされていても例外を未回収のままにしない
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        key の処理が実行中ならその結果を待ち、なければ func() を実行する。
+        呼び出し元がキャンセルされても、ほかに待っている呼び出し元のために処理は続ける。
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            SINGLEFLIGHT_CALLS.inc(group=self.name, result="leader")
+        else:
+            SINGLEFLIGHT_CALLS.inc(group=self.name, result="shared")
+        return await asyncio.shield(task)
+
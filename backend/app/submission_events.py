@@ -0,0 +1,198 @@
+# submission_events.py
+"""提出の作成・更新・削除（とプログラム生成ジョブの完了）を Server-Sent Events で配信する
+
+提出を書き換えるトランザクションの中で pg_notify し（コミットされたときだけ届く）、
+各バックエンドプロセスは起動時から専用の接続1本で LISTEN して、そのプロセスの購読者に配る。
+そのため複数ワーカーで動かしても、どのワーカーにつないだクライアントにも届く。
+LISTEN 接続が切れていた間のイベントは届かないので、（再）接続のたびに全購読者へ resync を送り、
+クライアントに一覧を取り直させる。スレッドが削除されたら thread.deleted を送ってストリームを閉じる。
+購読者数は SUBMISSION_EVENTS_MAX_SUBSCRIBERS で抑え、上限を超えた接続は 503 にする。
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from uuid import UUID
+
+import asyncpg
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import DATABASE_URL
+from metrics import counter
+
+
+CHANNEL = "submission_events"
+MAX_SUBSCRIBERS = int(os.getenv("SUBMISSION_EVENTS_MAX_SUBSCRIBERS", "200"))
+# 購読者ごとに溜める未送信イベントの上限（超えたら接続を切り、クライアントに取り直させる）
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+RECONNECT_SECONDS = 3
+
+SUBMISSION_CREATED = "submission.created"
+SUBMISSION_UPDATED = "submission.updated"
+SUBMISSION_DELETED = "submission.deleted"
+THREAD_DELETED = "thread.deleted"
+PROGRAM_CREATED = "program.created"
+PROGRAM_FAILED = "program.failed"
+# LISTEN 接続を張り直したときに送る（切れていた間のイベントは失われているため）
+RESYNC = "resync"
+
+EVENTS_TOTAL = counter(
+    "submission_events_total",
+    "提出イベントの数（result=delivered は購読者に配った数、dropped はキューあふれで切断した数）",
+)
+
+
+async def notify_submission_event(
+    session: AsyncSession,
+    event: str,
+    thread_id: UUID,
+    submission: Optional[Any] = None,
+    **fields: Any,
+) -> None:
+    """
+    スレッドのイベントを通知する。呼び出し元のトランザクション内で実行し、コミットされたときだけ配信される。
+    ペイロードはメタデータと fields だけにする（NOTIFY の上限は 8000 バイト）。
+    """
+    payload: Dict[str, Any] = {
+        "type": event,
+        "thread_id": str(thread_id),
+        "at": datetime.now(timezone.utc).isoformat(),
+    }
+    if submission is not None:
+        payload.update({
+            "submission_id": str(submission.id),
+            "student_number": submission.student_number,
+            "student_name": submission.student_name,
+            "laboratory": submission.laboratory,
+        })
+    payload.update(fields)
+    await session.execute(select(func.pg_notify(CHANNEL, json.dumps(payload, ensure_ascii=False))))
+
+
+class _Subscriber:
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+
+class SubmissionEventHub:
+    """このプロセスの LISTEN 接続と、スレッドごとの購読者"""
+
+    def __init__(self, max_subscribers: int = MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[str, Set[_Subscriber]] = {}
+        self._count = 0
+        self._listener: Optional[asyncio.Task] = None
+        self._connection: Optional[asyncpg.Connection] = None
+
+    @staticmethod
+    def _dsn() -> str:
+        # SQLAlchemy の URL（postgresql+asyncpg://）を asyncpg の DSN にする
+        return DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+    def _deliver(self, subscriber: _Subscriber, event: Dict[str, Any]) -> None:
+        try:
+            subscriber.queue.put_nowait(event)
+            EVENTS_TOTAL.inc(result="delivered")
+        except asyncio.QueueFull:
+            # 読み出しが追いつかない購読者は切断する（再接続時に一覧を取り直してもらう）
+            EVENTS_TOTAL.inc(result="dropped")
+            self._remove(subscriber)
+            subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+    def _dispatch(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        for subscriber in list(self._subscribers.get(event.get("thread_id"), ())):
+            self._deliver(subscriber, event)
+
+    def _resync_all(self) -> None:
+        at = datetime.now(timezone.utc).isoformat()
+        for thread_id, subscribers in list(self._subscribers.items()):
+            for subscriber in list(subscribers):
+                self._deliver(subscriber, {"type": RESYNC, "thread_id": thread_id, "at": at})
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                self._connection = await asyncpg.connect(self._dsn())
+                await self._connection.add_listener(CHANNEL, lambda _conn, _pid, _channel, payload: self._dispatch(payload))
+                print(f"📡 {CHANNEL} を LISTEN しています")
+                # LISTEN していなかった間のイベントは届かないので、今の購読者には取り直してもらう
+                self._resync_all()
+                # 接続が切れるまで待つ
+                closed = asyncio.get_running_loop().create_future()
+                self._connection.add_termination_listener(lambda _conn: closed.done() or closed.set_result(None))
+                await closed
+                print(f"⚠️ {CHANNEL} の LISTEN 接続が切れました。再接続します")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ {CHANNEL} の LISTEN に失敗しました: {e}")
+            finally:
+                if self._connection is not None and not self._connection.is_closed():
+                    await self._connection.close()
+                self._connection = None
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def start(self) -> None:
+        """LISTEN を始める（アプリの起動時に呼ぶ。接続に失敗しても再接続し続ける）"""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    def _remove(self, subscriber: _Subscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.thread_id)
+        if subscribers and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            self._count -= 1
+            if not subscribers:
+                del self._subscribers[subscriber.thread_id]
+
+    def ensure_capacity(self) -> None:
+        """購読者数が上限に達していれば 503 にする（ストリームを返す前に呼ぶ）"""
+        if self._count >= self.max_subscribers:
+            raise HTTPException(status_code=503, detail="接続数が上限に達しています。しばらくしてから再接続してください。")
+
+    async def stream(self, thread_id: UUID) -> AsyncIterator[str]:
+        """
+        スレッドのイベントを SSE の形式で返し続ける。
+        購読はレスポンスを送り始めたときに登録し、クライアントが切断したら解除する。
+        """
+        self.start()
+        subscriber = _Subscriber(str(thread_id))
+        self._subscribers.setdefault(subscriber.thread_id, set()).add(subscriber)
+        self._count += 1
+        try:
+            yield f"retry: {RECONNECT_SECONDS * 1000}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                if event["type"] == THREAD_DELETED:
+                    return
+        finally:
+            self._remove(subscriber)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
+
+submission_event_hub = SubmissionEventHub()
@@ -14,26 +14,6 @@ interface Student {
   total_contact_time?: number; // Added field
 }
 
-// APIから実際に返ってくるタスクデータを型
-interface ApiTask {
-  student_name: string;
-  start_time: string | "Unknown";
-  end_time: string | "Unknown";
-  working_time: number | "Unknown";
-  summary: string | "Unknown";
-  excluded_time: number | string;
-}
-
-// LaTeX生成用に整形した後の型
-interface LatexTask {
-  date: string;
-  start_time: string;
-  end_time: string;
-  duration: number;
-  content: string;
-  excluded: number;
-}
-
 const GenerateContactTimePage: React.FC = () => {
   // --- State管理 ---
   const [labs, setLabs] = useState<string[]>([]);
@@ -48,6 +28,8 @@ const GenerateContactTimePage: React.FC = () => {
   const [selectedYear, setSelectedYear] = useState<number>(new Date().getFullYear());
 
   const [isGenerating, setIsGenerating] = useState(false);
+  // 研究室一括生成の進捗（例: "12 / 40"）
+  const [batchProgress, setBatchProgress] = useState<string | null>(null);
 
   // 0. 年度一覧の取得 (New)
   useEffect(() => {
@@ -148,89 +130,32 @@ const GenerateContactTimePage: React.FC = () => {
     fetchStudents();
   }, [selectedLabName, selectedYear]);
 
-  // --- データの整形用ヘルパー関数 ---
-  const formatIsoDate = (isoString: string | "Unknown"): string => {
-    if (!isoString || isoString === "Unknown") return "";
-    try {
-      const d = new Date(isoString);
-      if (isNaN(d.getTime())) return "";
-      return `${(d.getMonth() + 1)}月 ${d.getDate()}日`;
-    } catch { return ""; }
-  };
-
-  const formatIsoTime = (isoString: string | "Unknown"): string => {
-    if (!isoString || isoString === "Unknown") return "";
-    try {
-      const d = new Date(isoString);
-      if (isNaN(d.getTime())) return "";
-      return `${d.getHours().toString().padStart(2, '0')}:${d.getMinutes().toString().padStart(2, '0')}`;
-    } catch { return ""; }
-  };
-
-  const formatDurationDetail = (minutes: number): string => {
-    const h = Math.floor(minutes / 60);
-    const m = minutes % 60;
-    return `${minutes}分 (${h}時間 ${m}分)`;
-  };
-
-
   // --- PDF生成のメイン処理 ---
   const generatePdf = async () => {
     if (!selectedLabName || !selectedStudent) return;
     setIsGenerating(true);
 
     try {
-      // 1. Notionからタスクデータを取得
+      // Notionからの取得・集計・LaTeX生成・コンパイルはバックエンドで一括して行う
       const params = new URLSearchParams({
         laboratory_name: selectedLabName,
         year: selectedYear.toString(),
+        student_name: selectedStudent.student_name,
       });
 
-      const res = await fetch(`${API_BASE_URL}/notion/laboratory_tasks?${params}`);
-      if (!res.ok) throw new Error('Failed to fetch tasks');
+      const pdfRes = await fetch(`${API_BASE_URL}/pdf/contact-time?${params}`);
 
-      const data: Record<string, ApiTask[]> = await res.json();
-
-      const targetName = selectedStudent.student_name;
-      const rawTasks = data[targetName] || [];
-
-      if (rawTasks.length === 0) {
-        alert(`${targetName} さんのコンタクトタイム記録が見つかりませんでした。`);
-        setIsGenerating(false);
+      if (pdfRes.status === 404) {
+        alert(`${selectedStudent.student_name} さんのコンタクトタイム記録が見つかりませんでした。`);
         return;
       }
 
-      // 2. データをLaTeX用に整形
-      const latexTasks: LatexTask[] = rawTasks
-        .filter(t => t.start_time !== "Unknown" && t.summary !== "Unknown")
-        .map(t => ({
-          date: formatIsoDate(t.start_time),
-          start_time: formatIsoTime(t.start_time),
-          end_time: formatIsoTime(t.end_time),
-          duration: typeof t.working_time === 'number' ? t.working_time : 0,
-          content: t.summary === "Unknown" ? "" : t.summary,
-          excluded: (t.excluded_time === "Unknown" || typeof t.excluded_time !== 'number') ? 0 : t.excluded_time
-        }));
-
-      // 3. LaTeXのソースコードを作成
-      const latexSource = createLatexString(latexTasks, selectedLabName, selectedStudent);
-
-      console.log("PDF生成を開始します...");
-
-      // 4. バックエンドのAPIに送信
-      const pdfRes = await fetch(`${API_BASE_URL}/pdf/compile`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ source: latexSource }),
-      });
-
       if (!pdfRes.ok) {
         const errorText = await pdfRes.text();
         console.error("PDF生成エラー詳細:", errorText);
         throw new Error('PDFの生成に失敗しました。');
       }
 
-      // 5. PDFをダウンロード
       const pdfBlob = await pdfRes.blob();
       downloadPdfBlob(pdfBlob, `contact_time_${selectedStudent.student_name}.pdf`);
 
@@ -242,6 +167,52 @@ const GenerateContactTimePage: React.FC = () => {
     }
   };
 
+  // --- 研究室全員分の一括生成 ---
+  const generateBatch = async () => {
+    if (!selectedLabName) return;
+    setIsGenerating(true);
+    setBatchProgress('準備中...');
+
+    try {
+      const startRes = await fetch(`${API_BASE_URL}/pdf/contact-time/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ laboratory_name: selectedLabName, year: selectedYear, format: 'zip' }),
+      });
+      if (!startRes.ok) throw new Error('Failed to start batch');
+      let job = await startRes.json();
+
+      // 完了するまで進捗をポーリング
+      while (job.status === 'pending' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const statusRes = await fetch(`${API_BASE_URL}/pdf/contact-time/batch/${job.job_id}`);
+        if (!statusRes.ok) throw new Error('Failed to fetch batch status');
+        job = await statusRes.json();
+        setBatchProgress(job.total ? `${job.completed + job.failed} / ${job.total}` : (job.message ?? '準備中...'));
+      }
+
+      if (job.status !== 'succeeded') {
+        console.error("一括生成エラー詳細:", job.error);
+        throw new Error('Batch failed');
+      }
+      if (job.failed > 0) {
+        console.warn("生成できなかった学生:", job.errors);
+      }
+
+      const zipRes = await fetch(`${API_BASE_URL}/pdf/contact-time/batch/${job.job_id}/download`);
+      if (!zipRes.ok) throw new Error('Failed to download batch result');
+      const zipBlob = await zipRes.blob();
+      downloadPdfBlob(zipBlob, `contact_time_${selectedLabName}_${selectedYear}.zip`);
+
+    } catch (error) {
+      console.error("一括生成エラー:", error);
+      alert("一括生成に失敗しました。");
+    } finally {
+      setIsGenerating(false);
+      setBatchProgress(null);
+    }
+  };
+
   const downloadPdfBlob = (blob: Blob, filename: string) => {
     const url = URL.createObjectURL(blob);
     const a = document.createElement('a');
@@ -253,136 +224,6 @@ const GenerateContactTimePage: React.FC = () => {
     URL.revokeObjectURL(url);
   };
 
-  const createLatexString = (tasks: LatexTask[], labName: string, student: Student) => {
-    // 時間計算
-    const currentTotal = tasks.reduce((acc, t) => acc + t.duration, 0);
-    // grandTotal (Notion上の総計) があれば使い、なければ今回の合計を総計とする
-    const grandTotal = (student.total_contact_time && typeof student.total_contact_time === 'number')
-      ? student.total_contact_time
-      : currentTotal;
-
-    // 前回までの合計 = 総計 - 今回
-    const previousTotal = grandTotal - currentTotal;
-
-    const currentStr = formatDurationDetail(currentTotal);
-    const previousStr = formatDurationDetail(Math.max(0, previousTotal));
-    const grandTotalStr = formatDurationDetail(grandTotal);
-
-    const contactTimeLines = tasks.map(t =>
-      `\\addLine{${t.date}}{${t.start_time}}{${t.end_time}}{${t.excluded}}{${t.duration}}{${t.content}}`
-    ).join('\n');
-
-    return `
-\\documentclass[a4j,11pt]{jarticle}
-\\usepackage[a4paper,totalheight=265mm,textwidth=175mm]{geometry}
-\\pagestyle{empty}
-\\setlength{\\unitlength}{1mm}
-\\newcommand{\\ysize}{192}
-\\newcommand{\\xline}{\\line(1,0){175}}%
-\\newcommand{\\yline}{\\line(0,1){\\ysize}}%
-\\newcount\\x
-\\newcount\\y
-
-% --- フレーム描画コマンド ---
-\\newcommand{\\startFrame}{%
- \\begin{picture}(175,260)
-  \\put(0,0){\\makebox(175,260){}} 
-
-  % --- メインの表 (上部) ---
-  \\put(0,30){
-   \\thicklines
-   \\put(0,0){\\framebox(175,192){}}
-   \\put(0,186){\\xline} 
-   
-   % 縦線
-   \\thinlines
-   \\put(16,0){\\yline}% 日付
-   \\put(33,0){\\yline}% 開始
-   \\put(50,0){\\yline}% 終了
-   \\put(66,0){\\yline}% 除外
-   \\put(90,0){\\yline}% 実施時間
-   
-   % 横罫線 (30行)
-   \\multiput(0,6)(0,6){30}{\\xline}
-
-   % ヘッダー文字
-   \\put(0,186){
-    \\put(0,0){\\makebox(16,6){日付}}%
-    \\put(16,0){\\makebox(17,6){開始時刻}}%
-    \\put(33,0){\\makebox(17,6){終了時刻}}%
-    \\put(50,0){\\makebox(16,6){除外(分)}}%
-    \\put(66,0){\\makebox(24,6){実施時間(分)}}%
-    \\put(90,0){\\makebox(85,6){内容}}%
-   }
-
-   % 合計欄 (表の直下、実施時間の列)
-   \\put(66,-6){\\line(0,1){6}} % 縦線
-   \\put(90,-6){\\line(0,1){6}} % 縦線
-   \\put(66,-6){\\line(1,0){24}} % 下線
-   \\put(66,-6){\\makebox(24,6){${currentTotal}}} 
-  }
-
-  % --- フッター集計表 (左下) ---
-  \\put(0,0){
-   \\thicklines
-   % 3行目 (今回の)
-   \\put(0,12){\\framebox(60,6){今回のコンタクトタイム}}
-   \\put(60,12){\\framebox(60,6){${currentStr}}}
-
-   % 2行目 (これまでの)
-   \\put(0,6){\\framebox(60,6){これまでのコンタクトタイム}}
-   \\put(60,6){\\framebox(60,6){${previousStr}}}
-
-   % 1行目 (総)
-   \\put(0,0){\\framebox(60,6){総コンタクトタイム}}
-   \\put(60,0){\\framebox(60,6){${grandTotalStr}}}
-  }
-
-  % --- 教員印 (右下) ---
-  \\put(155,0){\\thicklines\\framebox(20,20){}}
-  \\put(134,0){\\makebox(20,6)[r]{教員の印}} 
-
-  \\global\\y=210 
-}
-
-\\newcommand{\\nendoNumber}[3]{%
- \\put(0,236){\\makebox(175,8){\\Large\\bf #1年度　#2研究　コンタクトタイム記録用紙}}%
- \\put(0,244){\\makebox(175,6)[r]{No. #3}}%
-}
-
-% 学生番号と名前をスペース区切りで表示
-\\newcommand{\\courseLaboName}[3]{
- \\put(0,228){\\makebox(175,6){%
-  #1 \\hfil ${labName} \\hfil #3
- }}%
-}
-
-\\newcommand{\\lastFrame}{
- \\end{picture}
-}
-
-\\newcommand{\\addLine}[6]{
- \\put(0,\\y){%
-  \\put(0,0){\\makebox(16,6){#1}}%
-  \\put(16,0){\\makebox(17,6){#2}}%
-  \\put(33,0){\\makebox(17,6){#3}}%
-  \\put(50,0){\\makebox(16,6){#4}}%
-  \\put(66,0){\\makebox(24,6){#5}}%
-  \\put(91,0){\\makebox(83,6)[l]{\\small #6}}%
- }
- \\global\\advance\\y by -6
-}
-
-\\begin{document}
-\\startFrame
-\\nendoNumber{${selectedYear}}{卒業}{1}
-\\courseLaboName{情報システム工学コース}{${labName}}{${student.student_number}~~${student.student_name}}
-${contactTimeLines}
-\\lastFrame
-\\end{document}
-    `;
-  };
-
   // --- データ更新用ハンドラ ---
   const handleRefresh = async () => {
     if (!confirm("Notionから最新のデータを取得してデータベースを更新しますか？\n（少し時間がかかります）")) return;
@@ -484,7 +325,16 @@ ${contactTimeLines}
         )}
 
         {/* 生成ボタン */}
-        <div className="pt-4 border-t border-slate-100 flex justify-end">
+        <div className="pt-4 border-t border-slate-100 flex flex-col-reverse sm:flex-row justify-end gap-3">
+          <Button
+            onClick={generateBatch}
+            variant="outline"
+            size="lg"
+            disabled={!selectedLabName || isGenerating}
+            className="w-full sm:w-auto"
+          >
+            {batchProgress ? `一括生成中 (${batchProgress})` : '研究室全員分を一括生成'}
+          </Button>
           <Button
             onClick={generatePdf}
             variant="primary"
@@ -1,10 +1,10 @@
 import React, { useEffect, useMemo, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import Select from '../components/Select';
-import { SubmissionThreadSummary, SubmissionThreadDetail, ThreadSubmission } from '../types';
+import { SubmissionThreadSummary, SubmissionThreadStatus, SubmissionFileStatus } from '../types';
 import {
   fetchSubmissionThreads,
-  fetchSubmissionThreadDetail,
+  fetchSubmissionThreadStatus,
   getSubmissionDownloadUrl,
 } from '../utils/api';
 import { ArrowDownTrayIcon, DocumentTextIcon, ArrowPathIcon } from '../components/icons';
@@ -22,7 +22,7 @@ const SubmissionStatusPage: React.FC = () => {
   const navigate = useNavigate();
   const [threads, setThreads] = useState<SubmissionThreadSummary[]>([]);
   const [selectedThreadId, setSelectedThreadId] = useState('');
-  const [threadDetail, setThreadDetail] = useState<SubmissionThreadDetail | null>(null);
+  const [threadStatus, setThreadStatus] = useState<SubmissionThreadStatus | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
@@ -32,9 +32,9 @@ const SubmissionStatusPage: React.FC = () => {
 
   useEffect(() => {
     if (selectedThreadId) {
-      loadThreadDetail(selectedThreadId);
+      loadThreadStatus(selectedThreadId);
     } else {
-      setThreadDetail(null);
+      setThreadStatus(null);
     }
   }, [selectedThreadId]);
 
@@ -51,12 +51,12 @@ const SubmissionStatusPage: React.FC = () => {
     }
   };
 
-  const loadThreadDetail = async (threadId: string) => {
+  const loadThreadStatus = async (threadId: string) => {
     setIsLoading(true);
     setError(null);
     try {
-      const data = await fetchSubmissionThreadDetail(threadId);
-      setThreadDetail(data);
+      const data = await fetchSubmissionThreadStatus(threadId);
+      setThreadStatus(data);
     } catch (err) {
       console.error(err);
       setError('提出状況の取得に失敗しました。');
@@ -71,26 +71,26 @@ const SubmissionStatusPage: React.FC = () => {
   ], [threads]);
 
   const sortedSubmissions = useMemo(() => {
-    if (!threadDetail) return [];
-    return threadDetail.submissions.slice().sort((a, b) => {
+    if (!threadStatus) return [];
+    return threadStatus.students.slice().sort((a, b) => {
         // Sort by student number roughly (assuming numeric string)
         return a.studentNumber.localeCompare(b.studentNumber, undefined, { numeric: true });
     });
-  }, [threadDetail]);
+  }, [threadStatus]);
 
-  const renderStatusIcon = (filename: string | undefined, hasType: boolean, downloadUrl?: string) => {
-    if (!hasType) return <span className="text-slate-300">-</span>;
-    if (filename) {
+  const renderStatusIcon = (file: SubmissionFileStatus, downloadUrl?: string) => {
+    if (file.submitted) {
       return (
         <a 
           href={downloadUrl} 
           className="inline-flex items-center text-green-600 hover:text-green-800 transition-colors"
-          title={filename}
+          title={file.submittedAt ? dateFormatter.format(new Date(file.submittedAt)) : undefined}
         >
           <div className="w-6 h-6 rounded-full bg-green-100 flex items-center justify-center mr-1.5">
             <ArrowDownTrayIcon className="h-4 w-4" />
           </div>
           <span className="text-xs font-medium">提出済</span>
+          {file.late && <span className="ml-1.5 text-xs font-medium text-amber-600">（締切後）</span>}
         </a>
       );
     }
@@ -111,7 +111,7 @@ const SubmissionStatusPage: React.FC = () => {
           <h1 className="text-3xl font-bold text-slate-900 tracking-tight">提出状況確認</h1>
           <p className="mt-2 text-slate-500">各学生の提出状況を一覧で確認できます</p>
         </div>
-        <Button variant="ghost" onClick={() => selectedThreadId && loadThreadDetail(selectedThreadId)} disabled={isLoading || !selectedThreadId}>
+        <Button variant="ghost" onClick={() => selectedThreadId && loadThreadStatus(selectedThreadId)} disabled={isLoading || !selectedThreadId}>
             <ArrowPathIcon className={`h-5 w-5 mr-2 ${isLoading ? 'animate-spin' : ''}`} />
             再読み込み
         </Button>
@@ -134,7 +134,7 @@ const SubmissionStatusPage: React.FC = () => {
         </div>
       </div>
 
-      {threadDetail && (
+      {threadStatus && (
         <div className="bg-white rounded-2xl shadow-sm border border-slate-200 overflow-hidden">
             <div className="p-6 border-b border-slate-100 bg-slate-50/50 flex justify-between items-center">
                 <h2 className="text-lg font-bold text-slate-800">
@@ -152,9 +152,9 @@ const SubmissionStatusPage: React.FC = () => {
                             <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">学生番号</th>
                             <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">氏名</th>
                             <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">研究室</th>
-                            {threadDetail.hasAbstract && <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">抄録</th>}
-                            {threadDetail.hasPaper && <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">論文</th>}
-                            {threadDetail.hasPresentation && <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">発表資料</th>}
+                            {threadStatus.hasAbstract && <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">抄録</th>}
+                            {threadStatus.hasPaper && <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">論文</th>}
+                            {threadStatus.hasPresentation && <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">発表資料</th>}
                             <th scope="col" className="px-6 py-3 text-left text-xs font-medium text-slate-500 uppercase tracking-wider">最終提出日時</th>
                         </tr>
                     </thead>
@@ -167,24 +167,24 @@ const SubmissionStatusPage: React.FC = () => {
                             </tr>
                         ) : (
                             sortedSubmissions.map((sub) => (
-                                <tr key={sub.id} className="hover:bg-slate-50 transition-colors">
+                                <tr key={sub.submissionId} className="hover:bg-slate-50 transition-colors">
                                     <td className="px-6 py-4 whitespace-nowrap text-sm font-medium text-indigo-600">{sub.studentNumber}</td>
                                     <td className="px-6 py-4 whitespace-nowrap text-sm text-slate-900">{sub.studentName}</td>
                                     <td className="px-6 py-4 whitespace-nowrap text-sm text-slate-600">{sub.laboratory}</td>
                                     
-                                    {threadDetail.hasAbstract && (
+                                    {threadStatus.hasAbstract && (
                                         <td className="px-6 py-4 whitespace-nowrap">
-                                            {renderStatusIcon(sub.abstractFilename, true, getSubmissionDownloadUrl(sub.threadId, sub.id, 'abstract'))}
+                                            {renderStatusIcon(sub.abstract, getSubmissionDownloadUrl(threadStatus.threadId, sub.submissionId, 'abstract'))}
                                         </td>
                                     )}
-                                    {threadDetail.hasPaper && (
+                                    {threadStatus.hasPaper && (
                                         <td className="px-6 py-4 whitespace-nowrap">
-                                            {renderStatusIcon(sub.paperFilename, true, getSubmissionDownloadUrl(sub.threadId, sub.id, 'paper'))}
+                                            {renderStatusIcon(sub.paper, getSubmissionDownloadUrl(threadStatus.threadId, sub.submissionId, 'paper'))}
                                         </td>
                                     )}
-                                    {threadDetail.hasPresentation && (
+                                    {threadStatus.hasPresentation && (
                                         <td className="px-6 py-4 whitespace-nowrap">
-                                            {renderStatusIcon(sub.presentationFilename, true, getSubmissionDownloadUrl(sub.threadId, sub.id, 'presentation'))}
+                                            {renderStatusIcon(sub.presentation, getSubmissionDownloadUrl(threadStatus.threadId, sub.submissionId, 'presentation'))}
                                         </td>
                                     )}
                                     
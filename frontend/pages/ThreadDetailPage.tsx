@@ -16,6 +16,7 @@ import {
 import {
   fetchSubmissionThreadDetail,
   getSubmissionDownloadUrl,
+  getThreadEventsUrl,
   submitFiles,
   deleteSubmission,
 } from '../utils/api';
@@ -67,6 +68,29 @@ const ThreadDetailPage: React.FC = () => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [threadId]);
 
+  // 提出の作成・更新・削除はサーバーから通知されるので、そのときだけ取り直す
+  useEffect(() => {
+    if (!threadId) return;
+    const source = new EventSource(getThreadEventsUrl(threadId));
+    const reload = () => {
+      loadDetail();
+    };
+    // 接続（再接続）したときは、最初の読み込みから購読を始めるまで・切れていた間の変更を取り込む
+    source.onopen = reload;
+    // resync はサーバー側の通知が途切れていたときに送られる
+    ['submission.created', 'submission.updated', 'submission.deleted', 'resync'].forEach((type) =>
+      source.addEventListener(type, reload),
+    );
+    source.addEventListener('thread.deleted', () => {
+      // サーバーはこのイベントでストリームを閉じるので、再接続させない
+      source.close();
+      setThread(null);
+      setError('この提出スレッドは削除されました。');
+    });
+    return () => source.close();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [threadId]);
+
   const submissions = useMemo<ThreadSubmission[]>(
     () => (thread ? thread.submissions.slice().sort((a, b) => a.submittedAt.localeCompare(b.submittedAt)) : []),
     [thread],
@@ -61,6 +61,36 @@ export interface ThreadSubmission {
   submittedAt: string;
 }
 
+// GET /conference/threads/{id}/status の提出状況（ファイル本体の情報は含まない）
+export interface SubmissionFileStatus {
+  submitted: boolean;
+  size?: number;
+  submittedAt?: string;
+  late: boolean;
+  overdue: boolean;
+}
+
+export interface StudentSubmissionStatus {
+  submissionId: string;
+  studentNumber: string;
+  studentName: string;
+  laboratory: string;
+  title: string;
+  submittedAt: string;
+  abstract: SubmissionFileStatus;
+  paper: SubmissionFileStatus;
+  presentation: SubmissionFileStatus;
+}
+
+export interface SubmissionThreadStatus {
+  threadId: string;
+  name: string;
+  hasAbstract: boolean;
+  hasPaper: boolean;
+  hasPresentation: boolean;
+  students: StudentSubmissionStatus[];
+}
+
 export interface ProgramSessionDefinition {
   type: 'session' | 'break';
   startTime: string;
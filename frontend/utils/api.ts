@@ -3,6 +3,8 @@ import {
   SubmissionThreadSummary,
   SubmissionThreadDetail,
   ThreadSubmission,
+  SubmissionFileStatus,
+  SubmissionThreadStatus,
   ProgramSessionDefinition,
   ProgramRecord,
 } from '../types';
@@ -144,6 +146,38 @@ interface SubmissionApiModel {
   submitted_at: string;
 }
 
+interface FileStatusApiModel {
+  submitted: boolean;
+  size?: number | null;
+  submitted_at?: string | null;
+  late: boolean;
+  overdue: boolean;
+}
+
+interface StudentStatusApiModel {
+  submission_id: string;
+  student_number: string;
+  student_name: string;
+  title: string;
+  submitted_at: string;
+  abstract: FileStatusApiModel;
+  paper: FileStatusApiModel;
+  presentation: FileStatusApiModel;
+}
+
+interface ThreadStatusApiModel {
+  thread_id: string;
+  name: string;
+  has_abstract: boolean;
+  has_paper: boolean;
+  has_presentation: boolean;
+  laboratories: Array<{
+    laboratory: string;
+    laboratory_id: number;
+    students: StudentStatusApiModel[];
+  }>;
+}
+
 interface ProgramRecordApiModel {
   id: string;
   thread_id?: string | null;
@@ -197,6 +231,33 @@ const mapThreadDetail = (thread: ThreadDetailApiModel): SubmissionThreadDetail =
   submissions: thread.submissions.map(mapSubmission),
 });
 
+const mapFileStatus = (file: FileStatusApiModel): SubmissionFileStatus => ({
+  submitted: file.submitted,
+  size: file.size ?? undefined,
+  submittedAt: file.submitted_at ?? undefined,
+  late: file.late,
+  overdue: file.overdue,
+});
+
+const mapThreadStatus = (status: ThreadStatusApiModel): SubmissionThreadStatus => ({
+  threadId: status.thread_id,
+  name: status.name,
+  hasAbstract: status.has_abstract,
+  hasPaper: status.has_paper,
+  hasPresentation: status.has_presentation,
+  students: status.laboratories.flatMap(lab => lab.students.map(student => ({
+    submissionId: student.submission_id,
+    studentNumber: student.student_number,
+    studentName: student.student_name,
+    laboratory: lab.laboratory,
+    title: student.title,
+    submittedAt: student.submitted_at,
+    abstract: mapFileStatus(student.abstract),
+    paper: mapFileStatus(student.paper),
+    presentation: mapFileStatus(student.presentation),
+  }))),
+});
+
 const mapProgramRecord = (program: ProgramRecordApiModel): ProgramRecord => ({
   id: program.id,
   threadId: program.thread_id ?? undefined,
@@ -420,6 +481,20 @@ export const fetchSubmissionThreadDetail = async (threadId: string): Promise<Sub
   return mapThreadDetail(payload);
 };
 
+// 研究室・学生ごとの提出状況（提出一覧より軽い集計済みの応答）
+export const fetchSubmissionThreadStatus = async (threadId: string): Promise<SubmissionThreadStatus> => {
+  const response = await fetch(`${API_BASE_URL}/conference/threads/${threadId}/status`);
+  if (!response.ok) {
+    throw new Error(await extractErrorMessage(response));
+  }
+  const payload: ThreadStatusApiModel = await response.json();
+  return mapThreadStatus(payload);
+};
+
+// 提出の作成・更新・削除を受け取る Server-Sent Events のURL
+export const getThreadEventsUrl = (threadId: string): string =>
+  `${API_BASE_URL}/conference/threads/${threadId}/events`;
+
 interface SubmitFilesPayload {
   threadId: string;
   studentNumber: string;
@@ -481,7 +556,8 @@ interface CreateProgramPayload {
 }
 
 export const createProgram = async (payload: CreateProgramPayload): Promise<ProgramRecord> => {
-  const response = await fetch(`${API_BASE_URL}/conference/programs`, {
+  // 発表順の決定と PDF の生成はバックグラウンドのジョブで行い、完了するまでポーリングする
+  const response = await fetch(`${API_BASE_URL}/conference/programs/jobs`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -504,7 +580,21 @@ export const createProgram = async (payload: CreateProgramPayload): Promise<Prog
     throw new Error(await extractErrorMessage(response));
   }
 
-  const data: ProgramRecordApiModel = await response.json();
+  let job = await response.json();
+  while (job.status === 'pending' || job.status === 'running') {
+    await new Promise(resolve => setTimeout(resolve, 1000));
+    const statusResponse = await fetch(`${API_BASE_URL}/conference/programs/jobs/${job.job_id}`);
+    if (!statusResponse.ok) {
+      throw new Error(await extractErrorMessage(statusResponse));
+    }
+    job = await statusResponse.json();
+  }
+
+  if (job.status !== 'succeeded') {
+    throw new Error(job.error || 'プログラムの生成に失敗しました');
+  }
+
+  const data: ProgramRecordApiModel = job.result;
   return mapProgramRecord(data);
 };
 